@@ -0,0 +1,125 @@
+import argparse
+import json
+import logging
+import sys
+
+from config import LOG_FORMAT
+from benchmarks.generate import generate
+from benchmarks.importtime import IMPORT_BUDGETS_MS, run_import_benchmarks
+from benchmarks.run import run_benchmarks, compare
+from benchmarks.webhook import run_webhook_harness
+
+
+def cmd_generate(args) -> int:
+    try:
+        totals = generate(args.db, args.users, args.habits, args.days, seed=args.seed)
+    except FileExistsError:
+        print(f"Файл {args.db} вже існує - видаліть його або вкажіть інший --db")
+        return 1
+    print(f"Згенеровано: {totals['users']} користувачів, {totals['habits']} звичок, {totals['logs']} записів")
+    return 0
+
+
+def cmd_run(args) -> int:
+    report = run_benchmarks(args.db, args.iterations, args.warmup, args.cache, args.seed)
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
+
+
+def cmd_importtime(args) -> int:
+    budgets = dict(IMPORT_BUDGETS_MS)
+    for item in args.budget:
+        module, _, budget = item.partition('=')
+        budgets[module] = float(budget)
+
+    report = run_import_benchmarks(budgets, args.runs)
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    print(output)
+    for line in report['over_budget']:
+        print(f"Перевищено бюджет: {line}")
+    return 1 if report['over_budget'] else 0
+
+
+def cmd_webhook(args) -> int:
+    report = run_webhook_harness(args.users, args.updates, args.concurrency, args.max_delay, args.seed, args.flood)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    for line in report['problems']:
+        print(f"Порушення: {line}")
+    if not report['problems']:
+        print("Порядок оновлень кожного користувача збережено")
+    return 1 if report['problems'] else 0
+
+
+def cmd_compare(args) -> int:
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+
+    regressions = compare(old, new, args.threshold)
+    for line in regressions:
+        print(f"Регресія: {line}")
+    if not regressions:
+        print("Регресій не знайдено")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(format=LOG_FORMAT, level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    gen = subparsers.add_parser('generate', help='Згенерувати синтетичну базу')
+    gen.add_argument('--db', default='bench.db')
+    gen.add_argument('--users', type=int, default=1000)
+    gen.add_argument('--habits', type=int, default=3, help='Звичок на користувача в середньому')
+    gen.add_argument('--days', type=int, default=365, help='Найдовша історія звички в днях')
+    gen.add_argument('--seed', type=int, default=1)
+    gen.set_defaults(func=cmd_generate)
+
+    run = subparsers.add_parser('run', help='Заміряти гарячі шляхи (змінює базу: пише записи)')
+    run.add_argument('--db', default='bench.db')
+    run.add_argument('--iterations', type=int, default=1000)
+    run.add_argument('--warmup', type=int, default=50)
+    run.add_argument('--cache', action='store_true', help='Не вимикати кеш читання')
+    run.add_argument('--seed', type=int, default=1)
+    run.add_argument('--output', help='Зберегти JSON у файл')
+    run.set_defaults(func=cmd_run)
+
+    imports = subparsers.add_parser('importtime', help='Заміряти час імпорту (-X importtime) проти бюджету')
+    imports.add_argument('--runs', type=int, default=7)
+    imports.add_argument('--budget', action='append', default=[], metavar='MODULE=MS',
+                         help='Бюджет для модуля, можна кілька разів')
+    imports.add_argument('--output', help='Зберегти JSON у файл')
+    imports.set_defaults(func=cmd_importtime)
+
+    hook = subparsers.add_parser('webhook', help='Прогнати webhook із PerUserUpdateProcessor проти заглушки Bot API')
+    hook.add_argument('--users', type=int, default=20)
+    hook.add_argument('--updates', type=int, default=10, help='Оновлень на користувача')
+    hook.add_argument('--concurrency', type=int, default=64)
+    hook.add_argument('--max-delay', type=float, default=0.02, help='Найбільша затримка обробника, с')
+    hook.add_argument('--seed', type=int, default=1)
+    hook.add_argument('--flood', type=int, help='Оновлень від одного користувача поверх решти '
+                                                '(за замовчуванням 2 x --concurrency, 0 - без нього)')
+    hook.set_defaults(func=cmd_webhook)
+
+    cmp = subparsers.add_parser('compare', help='Порівняти два JSON-звіти')
+    cmp.add_argument('old')
+    cmp.add_argument('new')
+    cmp.add_argument('--threshold', type=float, default=25, help='Допустиме погіршення, %%')
+    cmp.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import os
+import random
+from datetime import date
+
+from database import achievements
+from database import goals
+from database import stats as habit_stats
+from database.database import connection, init_database
+from database.pool import configure_pool
+
+HABIT_NAMES = ['Куріння', 'Алкоголь', 'Солодощі', 'Фастфуд', 'Соцмережі', 'Кава', 'Азартні ігри', 'Енергетики']
+TIMEZONES = ['Europe/Kiev', 'Europe/Warsaw', 'Europe/London', 'America/New_York', 'Asia/Tokyo']
+
+
+def generate(path: str, users: int, habits_per_user: int = 3, days: int = 365,
+             relapse_rate: float = 0.2, skip_rate: float = 0.1, seed: int = 1,
+             chunk_size: int = 1000) -> dict:
+    if os.path.exists(path):
+        raise FileExistsError(path)
+
+    configure_pool(path)
+    init_database()
+
+    rng = random.Random(seed)
+    today = date.today().toordinal()
+    totals = {'users': 0, 'habits': 0, 'logs': 0}
+    habit_id = 0
+
+    for first_user in range(1, users + 1, chunk_size):
+        user_rows, habit_rows, log_rows, stats_rows = [], [], [], []
+
+        for user_id in range(first_user, min(first_user + chunk_size, users + 1)):
+            user_rows.append((user_id, f'user{user_id}', rng.choice(TIMEZONES)))
+
+            # У середньому habits_per_user звичок, але з розкидом
+            for _ in range(rng.randint(1, max(1, habits_per_user * 2 - 1))):
+                habit_id += 1
+                history = rng.randint(1, days)
+                first_day = today - history
+                habit_rows.append((
+                    habit_id, user_id, rng.choice(HABIT_NAMES), rng.choice([0, 20, 50, 100, 150]),
+                    rng.randint(1, 20), f'{date.fromordinal(first_day).isoformat()} 12:00:00'
+                ))
+
+                logs = [
+                    (date.fromordinal(day).isoformat(), rng.random() < relapse_rate)
+                    for day in range(first_day, today + 1)
+                    if rng.random() >= skip_rate
+                ]
+                log_rows.extend((habit_id, user_id, log_date, did_habit) for log_date, did_habit in logs)
+
+                stats = habit_stats.compute_stats(logs)
+                stats_rows.append((habit_id, user_id, *(stats[column] for column in habit_stats.STATS_COLUMNS)))
+
+        with connection(immediate=True) as conn:
+            cursor = conn.cursor()
+            cursor.executemany('INSERT INTO users (id, username, timezone) VALUES (?, ?, ?)', user_rows)
+            cursor.executemany('''
+                INSERT INTO habits (id, user_id, name, cost_per_day, frequency_per_day, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', habit_rows)
+            cursor.executemany('''
+                INSERT INTO habit_logs (habit_id, user_id, date, did_habit) VALUES (?, ?, ?, ?)
+            ''', log_rows)
+            cursor.executemany(f'''
+                INSERT INTO habit_stats (habit_id, user_id, {', '.join(habit_stats.STATS_COLUMNS)})
+                VALUES (?, ?, {', '.join('?' * len(habit_stats.STATS_COLUMNS))})
+            ''', stats_rows)
+
+        totals['users'] += len(user_rows)
+        totals['habits'] += len(habit_rows)
+        totals['logs'] += len(log_rows)
+
+    with connection(immediate=True) as conn:
+        cursor = conn.cursor()
+        habit_stats.rebuild_daily_rollup(cursor)
+        achievements.backfill(cursor)
+        goals.backfill(cursor)
+
+    with connection() as conn:
+        conn.execute('ANALYZE')
+
+    return totals
@@ -0,0 +1,79 @@
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+from benchmarks.run import _git_commit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_MODULES = ('main', 'bot', 'config', 'database', 'handlers', 'utils')
+
+# Бюджет холодного імпорту, мс: main лише обирає режим запуску, utils.cluster -
+# це все, що потрібно фронтенду шардів, bot - процес бота з обробниками та базою
+IMPORT_BUDGETS_MS = {
+    'main': 100,
+    'utils.cluster': 450,
+    'bot': 700,
+}
+
+
+def parse_importtime(stderr: str) -> Dict[str, tuple]:
+    # Рядки "import time: власний час (мкс) | разом із вкладеними | модуль"
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if self_us.strip().isdigit():
+            timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure_import(module: str, runs: int = 7) -> dict:
+    command = [sys.executable, '-X', 'importtime', '-c', f'import {module}']
+    # Байткод має бути закешований, як у бота після першого запуску
+    env = {key: value for key, value in os.environ.items() if key != 'PYTHONDONTWRITEBYTECODE'}
+    subprocess.run(command, cwd=ROOT, env=env, capture_output=True, check=True)
+
+    totals = []
+    own: Dict[str, List[float]] = {}
+    for _ in range(runs):
+        result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        timings = parse_importtime(result.stderr)
+        totals.append(timings[module][1] / 1000)
+        for name, (self_us, _) in timings.items():
+            if name.split('.')[0] in PROJECT_MODULES:
+                own.setdefault(name, []).append(self_us / 1000)
+
+    slowest = sorted(((statistics.median(samples), name) for name, samples in own.items()), reverse=True)
+    return {
+        'calls': runs,
+        'p50_ms': round(statistics.median(totals), 2),
+        'p99_ms': round(max(totals), 2),
+        'mean_ms': round(statistics.fmean(totals), 2),
+        'slowest_own_ms': {name: round(elapsed, 2) for elapsed, name in slowest[:10]}
+    }
+
+
+def run_import_benchmarks(budgets: Dict[str, float] = None, runs: int = 7) -> dict:
+    budgets = budgets or IMPORT_BUDGETS_MS
+    results = {}
+    over_budget = []
+    for module, budget in budgets.items():
+        result = measure_import(module, runs)
+        result['budget_ms'] = budget
+        results[f'import {module}'] = result
+        if result['p50_ms'] > budget:
+            over_budget.append(f"import {module}: {result['p50_ms']} мс при бюджеті {budget} мс")
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'runs': runs
+        },
+        'results': results,
+        'over_budget': over_budget
+    }
@@ -0,0 +1,159 @@
+import asyncio
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import time
+from typing import Callable, Dict, List
+
+from database import database as db
+from database.cache import read_cache
+from database.pool import configure_pool
+from handlers.stats import show_progress
+
+
+BATCH_SIZE = 32
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement: str):
+        self.count += 1
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.first_name = f'user{user_id}'
+
+
+class FakeMessage:
+    async def reply_text(self, text, **kwargs):
+        return None
+
+
+class FakeUpdate:
+    def __init__(self, user_id: int):
+        self.effective_user = FakeUser(user_id)
+        self.message = FakeMessage()
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summary(samples: List[float], queries: int) -> dict:
+    return {
+        'calls': len(samples),
+        'p50_ms': round(_percentile(samples, 50) * 1000, 4),
+        'p99_ms': round(_percentile(samples, 99) * 1000, 4),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 4),
+        'queries_per_call': round(queries / len(samples), 2)
+    }
+
+
+def _sample_habits(count: int, rng: random.Random) -> List[tuple]:
+    with db.connection() as conn:
+        max_id = conn.execute('SELECT MAX(id) FROM habits').fetchone()[0] or 0
+        samples = []
+        while len(samples) < count and max_id:
+            row = conn.execute(
+                'SELECT id, user_id FROM habits WHERE id = ?', (rng.randint(1, max_id),)
+            ).fetchone()
+            if row:
+                samples.append(row)
+    if not samples:
+        raise RuntimeError("У базі немає звичок - спершу згенеруйте її")
+    return samples
+
+
+def _time_calls(call: Callable, samples: List[tuple], counter: QueryCounter, warmup: int) -> dict:
+    for habit_id, user_id in samples[:warmup]:
+        call(habit_id, user_id)
+
+    timings = []
+    counter.count = 0
+    for habit_id, user_id in samples:
+        started = time.perf_counter()
+        call(habit_id, user_id)
+        timings.append(time.perf_counter() - started)
+    return _summary(timings, counter.count)
+
+
+async def _time_handler(samples: List[tuple], counter: QueryCounter, warmup: int) -> dict:
+    for _, user_id in samples[:warmup]:
+        await show_progress(FakeUpdate(user_id), None)
+
+    timings = []
+    counter.count = 0
+    for _, user_id in samples:
+        started = time.perf_counter()
+        await show_progress(FakeUpdate(user_id), None)
+        timings.append(time.perf_counter() - started)
+    return _summary(timings, counter.count)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(path: str, iterations: int = 1000, warmup: int = 50,
+                   cache: bool = False, seed: int = 1) -> dict:
+    pool = configure_pool(path)
+    read_cache.set_enabled(cache)
+    counter = QueryCounter()
+    pool.set_trace_callback(counter)
+
+    rng = random.Random(seed)
+    samples = _sample_habits(iterations, rng)
+
+    benchmarks: Dict[str, Callable] = {
+        'get_user_habits': lambda habit_id, user_id: db.get_user_habits(user_id),
+        'get_habit_stats': lambda habit_id, user_id: db.get_habit_stats(habit_id),
+        'get_user_total_stats': lambda habit_id, user_id: db.get_user_total_stats(user_id),
+        'log_habit_activity': lambda habit_id, user_id: db.log_habit_activity(habit_id, user_id, rng.random() < 0.2),
+        # Один пакет буфера відміток: BATCH_SIZE натискань різних користувачів, один коміт
+        'log_habit_activity_batch': lambda habit_id, user_id: db.log_habit_activity_batch([
+            (sample_habit, sample_user, rng.random() < 0.2) for sample_habit, sample_user in rng.sample(samples, BATCH_SIZE)
+        ]),
+    }
+
+    results = {}
+    for name, call in benchmarks.items():
+        results[name] = _time_calls(call, samples, counter, warmup)
+    results['show_progress'] = asyncio.run(_time_handler(samples, counter, warmup))
+
+    pool.set_trace_callback(None)
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'database': path,
+            'iterations': len(samples),
+            'cache': cache
+        },
+        'results': results
+    }
+
+
+def compare(old: dict, new: dict, threshold: float) -> List[str]:
+    regressions = []
+    for name, result in new['results'].items():
+        previous = old['results'].get(name)
+        if previous is None:
+            continue
+        for metric in ('p50_ms', 'p99_ms'):
+            if previous[metric] and (result[metric] - previous[metric]) / previous[metric] * 100 > threshold:
+                regressions.append(f"{name} {metric}: {previous[metric]} -> {result[metric]}")
+    return regressions
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import random
+import socket
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import tornado.web
+from telegram import Update
+from telegram.ext import Application, ContextTypes, MessageHandler, filters
+
+from utils.update_processor import PerUserUpdateProcessor
+
+TOKEN = '123456:harness'
+SECRET_TOKEN = 'harness-secret'
+WEBHOOK_PATH = 'webhook'
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class StubBotApi(tornado.web.RequestHandler):
+    """Мінімальний Bot API: відповідає на службові виклики й запам'ятовує
+    надіслані повідомлення в порядку надходження."""
+
+    def initialize(self, sent: List[dict]):
+        self.sent = sent
+
+    def post(self, token: str, method: str):
+        body = self.request.body
+        if body.startswith(b'{'):
+            data = json.loads(body)
+        else:
+            data = {key: values[0].decode() for key, values in self.request.body_arguments.items()}
+
+        if method == 'getMe':
+            result = {'id': 123456, 'is_bot': True, 'first_name': 'Harness', 'username': 'harness_bot'}
+        elif method == 'sendMessage':
+            self.sent.append({'chat_id': int(data['chat_id']), 'text': data['text']})
+            result = {
+                'message_id': len(self.sent),
+                'date': int(time.time()),
+                'chat': {'id': int(data['chat_id']), 'type': 'private'},
+                'text': data['text']
+            }
+        else:
+            result = True
+        self.write({'ok': True, 'result': result})
+
+
+def _message_update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+            'text': text
+        }
+    }
+
+
+def build_probe_application(api_port: int, concurrency: int, max_delay: float, state: dict) -> Application:
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(f'http://127.0.0.1:{api_port}/bot')
+        .concurrent_updates(PerUserUpdateProcessor(concurrency))
+        .build()
+    )
+    rng = random.Random(state['seed'])
+
+    # Випадкова затримка перемішує завершення: без упорядкування пізніше
+    # оновлення користувача часто відповідало б раніше за попереднє
+    async def probe(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user_id = update.effective_user.id
+        if user_id in state['active']:
+            state['overlaps'].append(user_id)
+        state['active'].add(user_id)
+        state['max_active'] = max(state['max_active'], len(state['active']))
+        try:
+            if user_id == state['flood_user']:
+                # Оновлення флудера тримають своє місце, доки решта не закінчить
+                await state['release'].wait()
+            await asyncio.sleep(rng.uniform(0, max_delay))
+            await update.message.reply_text(update.message.text)
+        finally:
+            state['active'].discard(user_id)
+            state['done'] += 1
+
+    application.add_handler(MessageHandler(filters.TEXT, probe))
+    return application
+
+
+async def _run_harness(users: int, updates: int, concurrency: int, max_delay: float, seed: int,
+                       flood: int) -> dict:
+    api_port = _free_port()
+    webhook_port = _free_port()
+    sent: List[dict] = []
+    api_server = tornado.web.Application([(r'/bot([^/]+)/(\w+)', StubBotApi, {'sent': sent})]).listen(
+        api_port, address='127.0.0.1'
+    )
+
+    # Один користувач надсилає більше оновлень, ніж місць для обробки, і перше
+    # з них не завершується, поки не впораються всі інші: якщо його черга
+    # займає спільні місця, решта так і не дочекається обробки
+    flood_user = users + 1 if flood else None
+    state = {'seed': seed, 'active': set(), 'overlaps': [], 'max_active': 0, 'done': 0,
+             'flood_user': flood_user, 'release': asyncio.Event()}
+    application = build_probe_application(api_port, concurrency, max_delay, state)
+    expected: Dict[int, List[str]] = {user_id: [] for user_id in range(1, users + 1)}
+    if flood:
+        expected[flood_user] = []
+
+    await application.initialize()
+    await application.updater.start_webhook(
+        listen='127.0.0.1',
+        port=webhook_port,
+        url_path=WEBHOOK_PATH,
+        webhook_url=f'http://127.0.0.1:{webhook_port}/{WEBHOOK_PATH}',
+        secret_token=SECRET_TOKEN
+    )
+    await application.start()
+    started = time.perf_counter()
+    try:
+        # Оновлення користувачів перемежовані, як у реальному потоці від Telegram
+        async with httpx.AsyncClient() as client:
+            update_id = 0
+            for index in range(flood):
+                update_id += 1
+                text = f'{flood_user}:{index}'
+                expected[flood_user].append(text)
+                response = await client.post(
+                    f'http://127.0.0.1:{webhook_port}/{WEBHOOK_PATH}',
+                    json=_message_update(update_id, flood_user, text),
+                    headers={'X-Telegram-Bot-Api-Secret-Token': SECRET_TOKEN}
+                )
+                response.raise_for_status()
+
+            for index in range(updates):
+                for user_id in range(1, users + 1):
+                    update_id += 1
+                    text = f'{user_id}:{index}'
+                    expected[user_id].append(text)
+                    response = await client.post(
+                        f'http://127.0.0.1:{webhook_port}/{WEBHOOK_PATH}',
+                        json=_message_update(update_id, user_id, text),
+                        headers={'X-Telegram-Bot-Api-Secret-Token': SECRET_TOKEN}
+                    )
+                    response.raise_for_status()
+
+            rejected = await client.post(
+                f'http://127.0.0.1:{webhook_port}/{WEBHOOK_PATH}',
+                json=_message_update(update_id + 1, 1, 'bad secret'),
+                headers={'X-Telegram-Bot-Api-Secret-Token': 'wrong'}
+            )
+
+        others = users * updates
+        deadline = time.monotonic() + 5 + others * max_delay
+        while state['done'] < others and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        others_done = state['done'] >= others
+        others_elapsed = time.perf_counter() - started
+        state['release'].set()
+
+        total = others + flood
+        deadline = time.monotonic() + 30 + total * max_delay
+        while state['done'] < total and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+    finally:
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        api_server.stop()
+
+    received: Dict[int, List[str]] = {user_id: [] for user_id in expected}
+    for message in sent:
+        received.setdefault(message['chat_id'], []).append(message['text'])
+
+    problems = []
+    for user_id, texts in expected.items():
+        if received[user_id] != texts:
+            problems.append(f"Користувач {user_id}: очікувано {texts}, отримано {received[user_id]}")
+    if state['overlaps']:
+        problems.append(f"Оновлення одного користувача оброблялися одночасно: {sorted(set(state['overlaps']))}")
+    if not others_done:
+        problems.append(
+            f"Інші користувачі не дочекалися обробки, поки черга користувача {flood_user} "
+            f"з {flood} оновлень займала місця"
+        )
+    if rejected.status_code != 403:
+        problems.append(f"Запит з неправильним секретом отримав {rejected.status_code} замість 403")
+
+    return {
+        'users': users,
+        'updates_per_user': updates,
+        'concurrency': concurrency,
+        'processed': state['done'],
+        'flood_updates': flood,
+        'others_done_s': round(others_elapsed, 3) if others_done else None,
+        'max_parallel_users': state['max_active'],
+        'elapsed_s': round(elapsed, 3),
+        'problems': problems
+    }
+
+
+def run_webhook_harness(users: int = 20, updates: int = 10, concurrency: int = 64,
+                        max_delay: float = 0.02, seed: int = 1, flood: Optional[int] = None) -> dict:
+    flood = 2 * concurrency if flood is None else flood
+    return asyncio.run(_run_harness(users, updates, concurrency, max_delay, seed, flood))
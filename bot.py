@@ -0,0 +1,95 @@
+import logging
+
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ConversationHandler, MessageHandler, filters
+
+import config
+from database.pool import close_pool
+from database.shards import current_shard
+from database.repository import close_backend, configure_backend, initialize_backend, shutdown_executor
+from handlers import start, habits, stats, reminders
+from utils.charts import shutdown_chart_pool
+from utils.dispatcher import start_dispatcher, stop_dispatcher
+from utils.metrics import (
+    InstrumentedRequest, install_db_hooks, instrument_application, log_summary, start_metrics_server
+)
+from utils.persistence import SQLitePersistence
+from utils.update_processor import PerUserUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+async def post_init(application: Application):
+    configure_backend(config.DATABASE_URL)
+    await initialize_backend()
+    # Ліміт Telegram спільний для бота, тож процеси шардів ділять його між собою
+    await start_dispatcher(application.bot, global_rate=config.DISPATCHER_GLOBAL_RATE / config.SHARD_COUNT)
+    if config.METRICS_ENABLED and config.METRICS_PORT:
+        application.bot_data['metrics_server'] = await start_metrics_server(port=config.METRICS_PORT + current_shard())
+
+
+async def post_shutdown(application: Application):
+    metrics_server = application.bot_data.pop('metrics_server', None)
+    if metrics_server is not None:
+        metrics_server.close()
+    await stop_dispatcher()
+    await close_backend()
+    shutdown_chart_pool()
+    shutdown_executor()
+    close_pool()
+
+
+def register_handlers(application: Application):
+    application.add_handler(CommandHandler("start", start.start_command))
+    application.add_handler(CommandHandler("help", start.help_command))
+    application.add_handler(CommandHandler("habits", habits.show_habits))
+    application.add_handler(CommandHandler("progress", stats.show_progress))
+    application.add_handler(CommandHandler("stats", stats.show_detailed_stats))
+    application.add_handler(CommandHandler("goals", habits.set_goals))
+    application.add_handler(CommandHandler("timezone", start.timezone_command))
+    application.add_handler(CommandHandler("backfill", habits.backfill_command))
+    add_habit_conv = ConversationHandler(
+        entry_points=[CommandHandler("add_habit", habits.add_habit_start)],
+        states={
+            habits.HABIT_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, habits.get_habit_name)],
+            habits.HABIT_COST: [MessageHandler(filters.TEXT & ~filters.COMMAND, habits.get_habit_cost)],
+            habits.HABIT_FREQUENCY: [MessageHandler(filters.TEXT & ~filters.COMMAND, habits.get_habit_frequency)],
+        },
+        fallbacks=[CommandHandler("cancel", habits.cancel_add_habit)],
+        name="add_habit",
+        persistent=True,
+    )
+    application.add_handler(add_habit_conv)
+    application.add_handler(CallbackQueryHandler(start.handle_main_menu, pattern="^main_"))
+    application.add_handler(CallbackQueryHandler(habits.handle_habit_action, pattern="^habit_"))
+    application.add_handler(CallbackQueryHandler(stats.handle_stats_action, pattern="^stats_"))
+
+
+def build_application(token: str, updater: bool = True) -> Application:
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(PerUserUpdateProcessor(config.CONCURRENT_UPDATES))
+        .persistence(SQLitePersistence())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if not updater:
+        builder.updater(None)
+    if config.METRICS_ENABLED:
+        builder.request(InstrumentedRequest(connection_pool_size=256))
+    application = builder.build()
+    register_handlers(application)
+
+    if config.METRICS_ENABLED:
+        instrument_application(application)
+        install_db_hooks()
+
+    if application.job_queue:
+        reminders.schedule_reminders(application.job_queue)
+        habits.schedule_goal_checks(application.job_queue)
+        if config.METRICS_ENABLED and config.METRICS_LOG_INTERVAL:
+            application.job_queue.run_repeating(log_summary, interval=config.METRICS_LOG_INTERVAL, name="metrics")
+    else:
+        logger.warning("JobQueue недоступна - встановіть python-telegram-bot[job-queue]")
+
+    return application
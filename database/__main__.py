@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import logging
+import sys
+
+from config import LOG_FORMAT, LOG_LEVEL, SHARD_COUNT
+from database.database import init_database, check_indexes, rebuild_habit_stats, verify_habit_stats
+from database.resharding import reshard
+from database.shards import use_shard
+
+
+def cmd_rebuild_stats(args) -> int:
+    if args.check:
+        mismatched = verify_habit_stats()
+        if mismatched:
+            print(f"Розбіжності у habit_stats для звичок: {', '.join(map(str, mismatched))}")
+            return 1
+        print("habit_stats відповідає habit_logs")
+        return 0
+
+    count = rebuild_habit_stats(args.habit)
+    print(f"Перераховано статистику для {count} звичок")
+    return 0
+
+
+def cmd_migrate(args) -> int:
+    print("Схему бази даних оновлено")
+    return 0
+
+
+def cmd_check_indexes(args) -> int:
+    problems = check_indexes()
+    for query, detail in problems:
+        print(f"{detail}: {query}")
+    if not problems:
+        print("Усі гарячі запити використовують індекси")
+    return 1 if problems else 0
+
+
+def cmd_reshard(args) -> int:
+    try:
+        copied = reshard(args.source, args.shards)
+    except FileNotFoundError as e:
+        print(f"Немає файлів бази: {e}")
+        return 1
+    except FileExistsError as e:
+        print(f"Файли нових шардів уже існують: {e}")
+        return 1
+    for table, count in copied.items():
+        print(f"{table}: {count}")
+    print(f"Дані розкладено на {args.shards} шардів. Запускайте бота з SHARD_COUNT={args.shards}")
+    return 0
+
+
+def cmd_pg_compare(args) -> int:
+    # Імпорт тут: asyncpg потрібен лише цій команді
+    from database.pg_compare import compare_backends
+
+    try:
+        differences = asyncio.run(compare_backends(args.url, args.pg_bin))
+    except (FileNotFoundError, RuntimeError) as e:
+        print(e)
+        return 1
+    for difference in differences:
+        print(f"Розбіжність у {difference}")
+    if not differences:
+        print("PostgreSQL повертає те саме, що й SQLite")
+    return 1 if differences else 0
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(format=LOG_FORMAT, level=LOG_LEVEL)
+
+    parser = argparse.ArgumentParser(prog='python -m database')
+    parser.add_argument('--shard', type=int, help='Лише один шард (за замовчуванням усі)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate = subparsers.add_parser('migrate', help='Застосувати міграції схеми')
+    migrate.set_defaults(func=cmd_migrate)
+
+    check = subparsers.add_parser('check-indexes', help='Перевірити плани гарячих запитів')
+    check.set_defaults(func=cmd_check_indexes)
+
+    rebuild = subparsers.add_parser('rebuild-stats', help='Перерахувати habit_stats з habit_logs')
+    rebuild.add_argument('--habit', type=int, help='Лише для однієї звички')
+    rebuild.add_argument('--check', action='store_true', help='Лише перевірити, без запису')
+    rebuild.set_defaults(func=cmd_rebuild_stats)
+
+    resharding = subparsers.add_parser('reshard', help='Розкласти базу на іншу кількість шардів')
+    resharding.add_argument('shards', type=int, help='Нова кількість шардів')
+    resharding.add_argument('--source', type=int, default=SHARD_COUNT, help='Поточна кількість шардів')
+    resharding.set_defaults(func=cmd_reshard)
+
+    compare = subparsers.add_parser('pg-compare', help='Порівняти PostgresBackend із SQLiteBackend')
+    compare.add_argument('--url', help='Сервер PostgreSQL; тимчасова база створюється й видаляється на ньому')
+    compare.add_argument('--pg-bin', help='Каталог з initdb і pg_ctl для тимчасового сервера (або PG_BIN)')
+    compare.set_defaults(func=cmd_pg_compare)
+
+    args = parser.parse_args(argv)
+    if args.func in (cmd_reshard, cmd_pg_compare):
+        return args.func(args)
+
+    status = 0
+    for index in ([args.shard] if args.shard is not None else range(SHARD_COUNT)):
+        with use_shard(index):
+            init_database()
+            status = max(status, args.func(args))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
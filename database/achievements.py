@@ -0,0 +1,49 @@
+from bisect import bisect_right
+from typing import List, Tuple
+
+from config import ACHIEVEMENT_MILESTONES
+
+
+def create_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS achievements (
+            habit_id INTEGER,
+            milestone INTEGER,
+            user_id INTEGER,
+            unlocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            notified BOOLEAN DEFAULT 0,
+            PRIMARY KEY (habit_id, milestone),
+            FOREIGN KEY (habit_id) REFERENCES habits (id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_achievements_user ON achievements (user_id, notified)')
+
+
+def milestones_between(previous_streak: int, streak: int) -> List[int]:
+    return ACHIEVEMENT_MILESTONES[
+        bisect_right(ACHIEVEMENT_MILESTONES, previous_streak):bisect_right(ACHIEVEMENT_MILESTONES, streak)
+    ]
+
+
+def unlock(cursor, habit_id: int, user_id: int, previous_longest: int, longest: int, notified: bool = False):
+    milestones = milestones_between(previous_longest, longest)
+    if milestones:
+        cursor.executemany('''
+            INSERT OR IGNORE INTO achievements (habit_id, milestone, user_id, notified)
+            VALUES (?, ?, ?, ?)
+        ''', [(habit_id, milestone, user_id, notified) for milestone in milestones])
+
+
+def backfill(cursor):
+    cursor.execute('SELECT habit_id, user_id, longest_streak FROM habit_stats')
+    for habit_id, user_id, longest in cursor.fetchall():
+        unlock(cursor, habit_id, user_id, 0, longest or 0, notified=True)
+
+
+def pop_unnotified(cursor, user_id: int) -> List[Tuple[int, int]]:
+    cursor.execute('''
+        UPDATE achievements SET notified = 1
+        WHERE user_id = ? AND notified = 0
+        RETURNING habit_id, milestone
+    ''', (user_id,))
+    return sorted(cursor.fetchall())
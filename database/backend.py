@@ -0,0 +1,112 @@
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import List, Optional, Tuple
+
+from config import ITEMS_PER_PAGE
+from .models import Habit, HabitLogSeries
+
+
+class StorageBackend(ABC):
+    """Сховище користувачів, звичок, записів, досягнень та цілей.
+
+    Обробники працюють через database.repository, а він - через активний
+    бекенд. Методи повертають ті самі структури, що й database.database,
+    і при помилці логують її та віддають порожній результат."""
+
+    async def initialize(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def add_user(self, user_id: int, username: str = None) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user_timezone(self, user_id: int) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set_user_timezone(self, user_id: int, timezone: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def add_habit(self, user_id: int, name: str, cost_per_day: float = 0,
+                        frequency_per_day: int = 1) -> Optional[Habit]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user_habits(self, user_id: int) -> List[Habit]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_habit(self, user_id: int, habit_id: int) -> Optional[Habit]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_habit_details(self, user_id: int, habit_id: int) -> Optional[Tuple[Habit, dict]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user_habits_page(self, user_id: int, after_id: Optional[int] = None,
+                                   before_id: Optional[int] = None, limit: int = ITEMS_PER_PAGE) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def log_habit_activity(self, habit_id: int, user_id: int, did_habit: bool) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def log_habit_activities(self, user_id: int, entries: List[Tuple[int, int, bool]],
+                                   replace: bool = False) -> Optional[List[dict]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_habit_stats(self, habit_id: int) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user_stats(self, user_id: int) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user_total_stats(self, user_id: int) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_period_stats(self, user_id: int, start_date: str, end_date: str) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_habit_log_series(self, habit_id: int) -> HabitLogSeries:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user_achievements(self, user_id: int) -> List[Tuple[int, str, int]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def pop_new_achievements(self, user_id: int) -> List[Tuple[int, int]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user_goals(self, user_id: int) -> List[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set_habit_goal(self, user_id: int, habit_id: int, goal_days: int) -> Optional[date]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_goal_statuses(self, today: str) -> Tuple[List[Tuple[int, str, int]], int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_reminder_timezones(self) -> List[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_users_to_remind(self, timezone: str, day: str, after_user_id: int = 0,
+                                  limit: int = 1000) -> List[int]:
+        raise NotImplementedError
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import config
+
+
+class LRUCache:
+    def __init__(self, max_entries: int, ttl: float, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Значення, прочитане до запису в БД, не повинно потрапити в кеш після
+        # інвалідації свого ключа. Для цього кожна інвалідація отримує номер
+        # із _clock, а _invalidated пам'ятає останній номер для ключа; інші
+        # ключі заповнюються далі. Коли _invalidated розростається, його
+        # очищаємо й піднімаємо _floor - відкидаються лише заповнення, початі раніше
+        self._clock = 0
+        self._invalidated = {}
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def generation(self) -> int:
+        return self._clock
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, generation: int):
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation < self._floor or self._invalidated.get(key, 0) > generation:
+                return
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys: Hashable):
+        with self._lock:
+            self._clock += 1
+            for key in keys:
+                self._invalidated[key] = self._clock
+                self._data.pop(key, None)
+            if len(self._invalidated) > self.max_entries:
+                self._invalidated.clear()
+                self._floor = self._clock
+
+    def clear(self):
+        with self._lock:
+            self._clock += 1
+            self._invalidated.clear()
+            self._floor = self._clock
+            self._data.clear()
+
+    def set_enabled(self, enabled: bool):
+        self.enabled = enabled
+        self.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / requests if requests else 0.0
+            }
+
+
+# Закешовані значення спільні для всіх викликів - їх не можна змінювати
+read_cache = LRUCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL, config.CACHE_ENABLED)
+
+
+def user_habits_key(user_id: int):
+    return ('habits', user_id)
+
+
+def user_stats_key(user_id: int):
+    return ('user_stats', user_id)
+
+
+def habit_key(habit_id: int):
+    return ('habit', habit_id)
+
+
+def habit_stats_key(habit_id: int):
+    return ('habit_stats', habit_id)
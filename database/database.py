@@ -1,281 +1,660 @@
-import sqlite3
 import logging
-from datetime import datetime, date
-from typing import List, Optional
-from .models import User, Habit, HabitLog
+import sqlite3
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config import DEFAULT_TIMEZONE, DEFAULT_GOAL_DAYS, ITEMS_PER_PAGE
+from utils.helpers import get_local_today
+from .models import User, Habit, HabitLog, HabitLogSeries
+from .rows import (
+    empty_habit_stats, empty_total_stats, goal_from_row, habit_stats_from_row, habits_page_from_rows,
+    user_stats_from_rows
+)
+from .pool import get_pool
+from . import achievements
+from . import goals
+from . import stats as habit_stats
+from . import migrations
+from . import persistence
+from . import shards
+from .cache import read_cache, user_habits_key, user_stats_key, habit_key, habit_stats_key
 
 logger = logging.getLogger(__name__)
 
-def get_connection():
-    return sqlite3.connect('habits.db')
+HABIT_COLUMNS = 'h.id, h.user_id, h.name, h.cost_per_day, h.frequency_per_day, h.goal_days, h.created_at'
+
+def connection(immediate: bool = False):
+    return get_pool().connection(immediate)
 
 def init_database():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY,
-            username TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS habits (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            name TEXT NOT NULL,
-            cost_per_day REAL DEFAULT 0,
-            frequency_per_day INTEGER DEFAULT 1,
-            goal_days INTEGER DEFAULT 30,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS habit_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            habit_id INTEGER,
-            user_id INTEGER,
-            date DATE,
-            did_habit BOOLEAN,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (habit_id) REFERENCES habits (id),
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE(habit_id, date)
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_goals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            habit_id INTEGER,
-            goal_days INTEGER,
-            start_date DATE,
-            end_date DATE,
-            completed BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (habit_id) REFERENCES habits (id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    applied = migrations.run_migrations(connection)
+    if applied:
+        logger.info(f"Застосовано міграцій: {applied}")
+    with connection(immediate=True) as conn:
+        shards.reserve_id_range(conn.cursor(), shards.current_shard())
+    check_indexes()
     logger.info("База даних ініціалізована успішно")
 
+def check_indexes() -> List[tuple]:
+    # Окреме з'єднання без кешу запитів: sqlite3 повторно використовує
+    # підготовлений EXPLAIN і після зміни індексів показав би старий план
+    with closing(sqlite3.connect(get_pool().path, cached_statements=0)) as conn:
+        problems = migrations.find_unindexed_queries(conn.cursor())
+    for query, detail in problems:
+        logger.warning(f"Запит без індексу ({detail}): {query}")
+    return problems
+
 def add_user(user_id: int, username: str = None) -> bool:
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (id, username) 
-            VALUES (?, ?)
-        ''', (user_id, username))
+        with connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT OR IGNORE INTO users (id, username, timezone) 
+                VALUES (?, ?, ?)
+            ''', (user_id, username, DEFAULT_TIMEZONE))
         
-        conn.commit()
-        conn.close()
         return True
     except Exception as e:
         logger.error(f"Помилка додавання користувача: {e}")
         return False
 
-def add_habit(user_id: int, name: str, cost_per_day: float = 0, frequency_per_day: int = 1) -> Optional[Habit]:
+def _fetch_timezone(cursor, user_id: int) -> str:
+    cursor.execute('SELECT timezone FROM users WHERE id = ?', (user_id,))
+    row = cursor.fetchone()
+    return row[0] if row and row[0] else DEFAULT_TIMEZONE
+
+def get_user_timezone(user_id: int) -> str:
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO habits (user_id, name, cost_per_day, frequency_per_day)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, name, cost_per_day, frequency_per_day))
+        with connection() as conn:
+            return _fetch_timezone(conn.cursor(), user_id)
+    except Exception as e:
+        logger.error(f"Помилка отримання часового поясу: {e}")
+        return DEFAULT_TIMEZONE
+
+def set_user_timezone(user_id: int, timezone: str) -> bool:
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO users (id, timezone) VALUES (?, ?)
+                ON CONFLICT(id) DO UPDATE SET timezone = excluded.timezone
+            ''', (user_id, timezone))
+            cursor.execute('SELECT id FROM habits WHERE user_id = ?', (user_id,))
+            habit_ids = [habit_id for (habit_id,) in cursor.fetchall()]
         
-        habit_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        # Від часового поясу залежить "сьогодні" у статистиці звичок користувача
+        read_cache.invalidate(
+            user_habits_key(user_id), user_stats_key(user_id),
+            *(key for habit_id in habit_ids for key in (habit_key(habit_id), habit_stats_key(habit_id)))
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Помилка збереження часового поясу: {e}")
+        return False
+
+def add_habit(user_id: int, name: str, cost_per_day: float = 0, frequency_per_day: int = 1,
+              goal_days: int = DEFAULT_GOAL_DAYS) -> Optional[Habit]:
+    try:
+        with connection(immediate=True) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT OR IGNORE INTO users (id, timezone) VALUES (?, ?)
+            ''', (user_id, DEFAULT_TIMEZONE))
+            cursor.execute('''
+                INSERT INTO habits (user_id, name, cost_per_day, frequency_per_day, goal_days)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (user_id, name, cost_per_day, frequency_per_day, goal_days))
+            
+            habit_id = cursor.lastrowid
+            today = get_local_today(_fetch_timezone(cursor, user_id))
+            goals.create_goal(cursor, user_id, habit_id, goal_days, today)
         
+        read_cache.invalidate(user_habits_key(user_id), user_stats_key(user_id))
         return Habit(
             id=habit_id,
             user_id=user_id,
             name=name,
             cost_per_day=cost_per_day,
             frequency_per_day=frequency_per_day,
-            goal_days=30,
+            goal_days=goal_days,
             created_at=datetime.now()
         )
     except Exception as e:
         logger.error(f"Помилка додавання звички: {e}")
         return None
 
+def _habit_from_row(row) -> Habit:
+    return Habit(
+        id=row[0],
+        user_id=row[1],
+        name=row[2],
+        cost_per_day=row[3],
+        frequency_per_day=row[4],
+        goal_days=row[5],
+        created_at=datetime.fromisoformat(row[6])
+    )
+
 def get_user_habits(user_id: int) -> List[Habit]:
+    cached = read_cache.get(user_habits_key(user_id))
+    if cached is not None:
+        return cached
+    
+    generation = read_cache.generation()
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, user_id, name, cost_per_day, frequency_per_day, goal_days, created_at
-            FROM habits WHERE user_id = ?
-            ORDER BY created_at DESC
-        ''', (user_id,))
+        with connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(f'''
+                SELECT {HABIT_COLUMNS}
+                FROM habits h WHERE h.user_id = ?
+                ORDER BY h.created_at DESC
+            ''', (user_id,))
+            rows = cursor.fetchall()
         
-        habits = []
-        for row in cursor.fetchall():
-            habits.append(Habit(
-                id=row[0],
-                user_id=row[1],
-                name=row[2],
-                cost_per_day=row[3],
-                frequency_per_day=row[4],
-                goal_days=row[5],
-                created_at=datetime.fromisoformat(row[6])
-            ))
+        habits = [_habit_from_row(row) for row in rows]
         
-        conn.close()
+        read_cache.set(user_habits_key(user_id), habits, generation)
         return habits
     except Exception as e:
         logger.error(f"Помилка отримання звичок: {e}")
         return []
 
-def log_habit_activity(habit_id: int, user_id: int, did_habit: bool) -> bool:
+def get_habit(user_id: int, habit_id: int) -> Optional[Habit]:
+    habit = read_cache.get(habit_key(habit_id))
+    if habit is not None:
+        return habit if habit.user_id == user_id else None
+    
+    generation = read_cache.generation()
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {HABIT_COLUMNS} FROM habits h WHERE h.id = ?
+            ''', (habit_id,))
+            row = cursor.fetchone()
+        
+        if not row:
+            return None
         
-        today = date.today()
+        habit = _habit_from_row(row)
+        read_cache.set(habit_key(habit_id), habit, generation)
+        return habit if habit.user_id == user_id else None
+    except Exception as e:
+        logger.error(f"Помилка отримання звички: {e}")
+        return None
+
+def get_habit_details(user_id: int, habit_id: int) -> Optional[Tuple[Habit, dict]]:
+    habit = read_cache.get(habit_key(habit_id))
+    stats = read_cache.get(habit_stats_key(habit_id))
+    if habit is not None and stats is not None:
+        return (habit, stats) if habit.user_id == user_id else None
+    
+    generation = read_cache.generation()
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {HABIT_COLUMNS},
+                       s.current_streak, s.longest_streak, s.clean_days, s.total_days,
+                       s.last_log_date, u.timezone
+                FROM habits h
+                LEFT JOIN habit_stats s ON s.habit_id = h.id
+                LEFT JOIN users u ON u.id = h.user_id
+                WHERE h.id = ?
+            ''', (habit_id,))
+            row = cursor.fetchone()
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO habit_logs (habit_id, user_id, date, did_habit)
-            VALUES (?, ?, ?, ?)
-        ''', (habit_id, user_id, today, did_habit))
+        if not row:
+            return None
         
-        conn.commit()
-        conn.close()
-        return True
+        habit = _habit_from_row(row[:7])
+        stats = habit_stats_from_row(*row[7:11], habit.cost_per_day, *row[11:])
+        read_cache.set(habit_key(habit_id), habit, generation)
+        read_cache.set(habit_stats_key(habit_id), stats, generation)
+        return (habit, stats) if habit.user_id == user_id else None
+    except Exception as e:
+        logger.error(f"Помилка отримання звички: {e}")
+        return None
+
+def _log_activity(cursor, habit_id: int, user_id: int, did_habit: bool) -> Optional[dict]:
+    cursor.execute('''
+        SELECT h.cost_per_day, u.timezone
+        FROM habits h
+        LEFT JOIN users u ON u.id = h.user_id
+        WHERE h.id = ? AND h.user_id = ?
+    ''', (habit_id, user_id))
+    row = cursor.fetchone()
+    if not row:
+        logger.warning(f"Користувач {user_id} намагався записати чужу звичку {habit_id}")
+        return None
+    
+    cost_per_day, timezone = row
+    today = get_local_today(timezone).isoformat()
+    stats = habit_stats.write_log(cursor, habit_id, user_id, today, did_habit)
+    return habit_stats_from_row(
+        stats['current_streak'], stats['longest_streak'], stats['clean_days'], stats['total_days'],
+        cost_per_day, stats['last_log_date'], timezone
+    )
+
+def log_habit_activity(habit_id: int, user_id: int, did_habit: bool) -> Optional[dict]:
+    try:
+        with connection(immediate=True) as conn:
+            stats = _log_activity(conn.cursor(), habit_id, user_id, did_habit)
+        
+        if stats is not None:
+            read_cache.invalidate(habit_stats_key(habit_id), user_stats_key(user_id))
+        return stats
     except Exception as e:
         logger.error(f"Помилка запису активності: {e}")
-        return False
+        return None
 
-def get_habit_logs(habit_id: int) -> List[HabitLog]:
+# entries - (habit_id, user_id, чи зробив звичку) різних користувачів у порядку
+# натискань; одна транзакція і один коміт на весь пакет. Результат - як у
+# log_habit_activity для кожного запису, None - якщо пакет відкотився
+def log_habit_activity_batch(entries: List[Tuple[int, int, bool]]) -> Optional[List[Optional[dict]]]:
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
+        with connection(immediate=True) as conn:
+            cursor = conn.cursor()
+            results = [_log_activity(cursor, habit_id, user_id, did_habit) for habit_id, user_id, did_habit in entries]
         
-        cursor.execute('''
-            SELECT id, habit_id, user_id, date, did_habit, created_at
-            FROM habit_logs WHERE habit_id = ?
-            ORDER BY date DESC
-        ''', (habit_id,))
+        read_cache.invalidate(*(
+            key
+            for (habit_id, user_id, _), stats in zip(entries, results) if stats is not None
+            for key in (habit_stats_key(habit_id), user_stats_key(user_id))
+        ))
+        return results
+    except Exception as e:
+        logger.error(f"Помилка пакетного запису відміток: {e}")
+        return None
+
+# entries - (habit_id, скільки днів тому, чи зробив звичку); дні рахуються
+# від сьогодні за часовим поясом користувача, все пишеться однією транзакцією.
+# Без replace заповнюються лише відсутні дні: наявну відмітку (наприклад,
+# зрив) не перезаписуємо. Результат - лише звички, для яких щось записано
+def log_habit_activities(user_id: int, entries: List[Tuple[int, int, bool]],
+                         replace: bool = False) -> Optional[List[dict]]:
+    try:
+        with connection(immediate=True) as conn:
+            cursor = conn.cursor()
+            timezone = _fetch_timezone(cursor, user_id)
+            cursor.execute('''
+                SELECT id, name, cost_per_day FROM habits
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+            ''', (user_id,))
+            habits = {habit_id: (name, cost_per_day) for habit_id, name, cost_per_day in cursor.fetchall()}
+            
+            today = get_local_today(timezone)
+            results = habit_stats.write_logs(cursor, user_id, [
+                (habit_id, (today - timedelta(days=days_ago)).isoformat(), did_habit)
+                for habit_id, days_ago, did_habit in entries
+                if habit_id in habits and days_ago >= 0
+            ], replace=replace)
         
-        logs = []
-        for row in cursor.fetchall():
-            logs.append(HabitLog(
-                id=row[0],
-                habit_id=row[1],
-                user_id=row[2],
-                date=datetime.strptime(row[3], '%Y-%m-%d').date(),
-                did_habit=bool(row[4]),
-                created_at=datetime.fromisoformat(row[5])
-            ))
+        read_cache.invalidate(user_stats_key(user_id), *(habit_stats_key(habit_id) for habit_id in results))
         
-        conn.close()
-        return logs
+        updated = []
+        for habit_id, (name, cost_per_day) in habits.items():
+            if habit_id not in results:
+                continue
+            stats = results[habit_id]
+            public = habit_stats_from_row(
+                stats['current_streak'], stats['longest_streak'], stats['clean_days'], stats['total_days'],
+                cost_per_day, stats['last_log_date'], timezone
+            )
+            public.update(habit_id=habit_id, name=name, cost_per_day=cost_per_day)
+            updated.append(public)
+        return updated
+    except Exception as e:
+        logger.error(f"Помилка пакетного запису активності: {e}")
+        return None
+
+def _fetch_habit_logs(cursor, habit_id: int) -> List[HabitLog]:
+    cursor.execute('''
+        SELECT id, habit_id, user_id, date, did_habit, created_at
+        FROM habit_logs WHERE habit_id = ?
+        ORDER BY date DESC
+    ''', (habit_id,))
+    
+    from_date, from_timestamp = date.fromisoformat, datetime.fromisoformat
+    return [
+        HabitLog(log_id, log_habit_id, user_id, from_date(log_date), bool(did_habit), from_timestamp(created_at))
+        for log_id, log_habit_id, user_id, log_date, did_habit, created_at in cursor.fetchall()
+    ]
+
+def get_habit_logs(habit_id: int) -> List[HabitLog]:
+    try:
+        with connection() as conn:
+            return _fetch_habit_logs(conn.cursor(), habit_id)
     except Exception as e:
         logger.error(f"Помилка отримання логів: {e}")
         return []
 
 def get_habit_stats(habit_id: int) -> dict:
+    cached = read_cache.get(habit_stats_key(habit_id))
+    if cached is not None:
+        return cached
+    
+    generation = read_cache.generation()
     try:
-        logs = get_habit_logs(habit_id)
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT s.current_streak, s.longest_streak, s.clean_days, s.total_days, h.cost_per_day,
+                       s.last_log_date, u.timezone
+                FROM habits h
+                LEFT JOIN habit_stats s ON s.habit_id = h.id
+                LEFT JOIN users u ON u.id = h.user_id
+                WHERE h.id = ?
+            ''', (habit_id,))
+            row = cursor.fetchone()
+        
+        if not row:
+            return empty_habit_stats()
         
-        if not logs:
-            return {
-                'streak': 0,
-                'clean_days': 0,
-                'total_days': 0,
-                'money_saved': 0.0,
-                'success_rate': 0.0
-            }
-             
-        streak = 0
-        for log in logs:
-            if not log.did_habit:
-                streak += 1
-            else:
-                break
+        stats = habit_stats_from_row(*row)
+        read_cache.set(habit_stats_key(habit_id), stats, generation)
+        return stats
+    except Exception as e:
+        logger.error(f"Помилка розрахунку статистики: {e}")
+        return empty_habit_stats()
+
+def rebuild_habit_stats(habit_id: int = None) -> int:
+    try:
+        with connection(immediate=True) as conn:
+            cursor = conn.cursor()
+            if habit_id is not None:
+                habit_stats.rebuild_habit(cursor, habit_id)
+                return 1
+            habit_stats.rebuild_daily_rollup(cursor)
+            return habit_stats.rebuild_all(cursor)
+    finally:
+        read_cache.clear()
+
+def verify_habit_stats() -> List[int]:
+    with connection() as conn:
+        return habit_stats.find_mismatches(conn.cursor())
+
+def get_user_stats(user_id: int) -> dict:
+    cached = read_cache.get(user_stats_key(user_id))
+    if cached is not None:
+        return cached
+    
+    generation = read_cache.generation()
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            
+            timezone = _fetch_timezone(cursor, user_id)
+            cursor.execute('''
+                SELECT h.id, h.name, h.cost_per_day,
+                       s.current_streak, s.longest_streak, s.clean_days, s.total_days, s.last_log_date
+                FROM habits h
+                LEFT JOIN habit_stats s ON s.habit_id = h.id
+                WHERE h.user_id = ?
+                ORDER BY h.created_at DESC
+            ''', (user_id,))
+            rows = cursor.fetchall()
         
-        clean_days = sum(1 for log in logs if not log.did_habit)
-        total_days = len(logs)
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT cost_per_day FROM habits WHERE id = ?', (habit_id,))
-        cost_per_day = cursor.fetchone()[0] or 0
-        conn.close()
+        user_stats = user_stats_from_rows(rows, timezone)
+        read_cache.set(user_stats_key(user_id), user_stats, generation)
+        return user_stats
+    except Exception as e:
+        logger.error(f"Помилка отримання загальної статистики: {e}")
+        return {'habits': [], 'total': empty_total_stats()}
+
+# Сторінка звичок за ключем (created_at, id) останньої показаної звички:
+# без OFFSET, тож будь-яка сторінка читає лише свої рядки з індексу
+HABITS_PAGE_QUERY = '''
+    SELECT h.id, h.name, h.cost_per_day,
+           s.current_streak, s.longest_streak, s.clean_days, s.total_days, s.last_log_date
+    FROM habits h
+    LEFT JOIN habit_stats s ON s.habit_id = h.id
+    WHERE h.user_id = ? {condition}
+    ORDER BY h.created_at {order}, h.id {order}
+    LIMIT ?
+'''
+HABITS_AFTER = 'AND (h.created_at, h.id) < (SELECT created_at, id FROM habits WHERE id = ?)'
+HABITS_BEFORE = 'AND (h.created_at, h.id) > (SELECT created_at, id FROM habits WHERE id = ?)'
+
+def get_user_habits_page(user_id: int, after_id: Optional[int] = None,
+                         before_id: Optional[int] = None, limit: int = ITEMS_PER_PAGE) -> dict:
+    try:
+        if before_id is not None:
+            query = HABITS_PAGE_QUERY.format(condition=HABITS_BEFORE, order='ASC')
+            params = (user_id, before_id, limit + 1)
+        elif after_id is not None:
+            query = HABITS_PAGE_QUERY.format(condition=HABITS_AFTER, order='DESC')
+            params = (user_id, after_id, limit + 1)
+        else:
+            query = HABITS_PAGE_QUERY.format(condition='', order='DESC')
+            params = (user_id, limit + 1)
         
-        money_saved = clean_days * cost_per_day
-        success_rate = (clean_days / total_days * 100) if total_days > 0 else 0
+        with connection() as conn:
+            cursor = conn.cursor()
+            timezone = _fetch_timezone(cursor, user_id)
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
         
-        return {
-            'streak': streak,
-            'clean_days': clean_days,
-            'total_days': total_days,
-            'money_saved': money_saved,
-            'success_rate': success_rate
-        }
+        return habits_page_from_rows(rows, limit, after_id, before_id, timezone)
     except Exception as e:
-        logger.error(f"Помилка розрахунку статистики: {e}")
-        return {
-            'streak': 0,
-            'clean_days': 0,
-            'total_days': 0,
-            'money_saved': 0.0,
-            'success_rate': 0.0
-        }
+        logger.error(f"Помилка отримання сторінки звичок: {e}")
+        return {'habits': [], 'prev_id': None, 'next_id': None}
 
 def get_user_total_stats(user_id: int) -> dict:
+    return get_user_stats(user_id)['total']
+
+# julianday('0001-01-01') = 1721425.5, тож різниця дає date.toordinal()
+# прямо в SQLite, без розбору рядків дат у Python
+def get_habit_log_series(habit_id: int) -> HabitLogSeries:
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT CAST(julianday(date) - 1721424.5 AS INTEGER), did_habit
+                FROM habit_logs WHERE habit_id = ?
+                ORDER BY date
+            ''', (habit_id,))
+            return HabitLogSeries.from_rows(cursor)
+    except Exception as e:
+        logger.error(f"Помилка отримання історії звички: {e}")
+        return HabitLogSeries()
+
+def get_chart_file_id(cache_key: str) -> Optional[str]:
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT file_id FROM chart_files WHERE cache_key = ?', (cache_key,))
+            row = cursor.fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        logger.error(f"Помилка отримання file_id графіка: {e}")
+        return None
+
+def save_chart_file_id(habit_id: int, cache_key: str, file_id: str) -> bool:
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO chart_files (cache_key, habit_id, file_id) VALUES (?, ?, ?)
+            ''', (cache_key, habit_id, file_id))
+            # Графік з новим ключем витісняє попередні графіки звички
+            cursor.execute(
+                'DELETE FROM chart_files WHERE habit_id = ? AND cache_key != ?',
+                (habit_id, cache_key)
+            )
+        return True
+    except Exception as e:
+        logger.error(f"Помилка збереження file_id графіка: {e}")
+        return False
+
+def get_user_achievements(user_id: int) -> List[Tuple[int, str, int]]:
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT h.id, h.name, a.milestone
+                FROM achievements a
+                JOIN habits h ON h.id = a.habit_id
+                WHERE a.user_id = ?
+                ORDER BY h.created_at DESC, a.milestone
+            ''', (user_id,))
+            return cursor.fetchall()
+    except Exception as e:
+        logger.error(f"Помилка отримання досягнень: {e}")
+        return []
+
+def pop_new_achievements(user_id: int) -> List[Tuple[int, int]]:
+    try:
+        with connection() as conn:
+            return achievements.pop_unnotified(conn.cursor(), user_id)
+    except Exception as e:
+        logger.error(f"Помилка отримання нових досягнень: {e}")
+        return []
+
+def get_user_goals(user_id: int) -> List[dict]:
     try:
-        habits = get_user_habits(user_id)
+        with connection() as conn:
+            cursor = conn.cursor()
+            timezone = _fetch_timezone(cursor, user_id)
+            cursor.execute(goals.GOALS_QUERY, (user_id,))
+            rows = cursor.fetchall()
         
-        if not habits:
-            return {
-                'total_habits': 0,
-                'total_tracked_days': 0,
-                'total_clean_days': 0,
-                'total_money_saved': 0.0,
-                'average_success_rate': 0.0
-            }
+        return [goal_from_row(row, timezone) for row in rows]
+    except Exception as e:
+        logger.error(f"Помилка отримання цілей: {e}")
+        return []
+
+def set_habit_goal(user_id: int, habit_id: int, goal_days: int) -> Optional[date]:
+    try:
+        with connection(immediate=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1 FROM habits WHERE id = ? AND user_id = ?', (habit_id, user_id))
+            if not cursor.fetchone():
+                logger.warning(f"Користувач {user_id} намагався змінити ціль чужої звички {habit_id}")
+                return None
+            
+            start_date = get_local_today(_fetch_timezone(cursor, user_id))
+            goals.create_goal(cursor, user_id, habit_id, goal_days, start_date)
+            cursor.execute('UPDATE habits SET goal_days = ? WHERE id = ?', (goal_days, habit_id))
         
-        total_habits = len(habits)
-        total_tracked_days = 0
-        total_clean_days = 0
-        total_money_saved = 0.0
-        success_rates = []
+        read_cache.invalidate(habit_key(habit_id), user_habits_key(user_id))
+        return start_date + timedelta(days=goal_days - 1)
+    except Exception as e:
+        logger.error(f"Помилка встановлення цілі: {e}")
+        return None
+
+# Позначає досягнуті та прострочені цілі всіх користувачів двома UPDATE;
+# повертає (user_id, назва звички, днів) досягнутих і кількість прострочених
+def update_goal_statuses(today: str) -> Tuple[List[Tuple[int, str, int]], int]:
+    try:
+        with connection(immediate=True) as conn:
+            cursor = conn.cursor()
+            completed = goals.complete_goals(cursor, today)
+            expired = goals.expire_goals(cursor, today)
+            
+            names = {}
+            habit_ids = [habit_id for _, habit_id, _ in completed]
+            for start in range(0, len(habit_ids), 500):
+                chunk = habit_ids[start:start + 500]
+                cursor.execute(
+                    f'SELECT id, name FROM habits WHERE id IN ({", ".join("?" * len(chunk))})', chunk
+                )
+                names.update(cursor.fetchall())
         
-        for habit in habits:
-            stats = get_habit_stats(habit.id)
-            total_tracked_days += stats['total_days']
-            total_clean_days += stats['clean_days']
-            total_money_saved += stats['money_saved']
-            if stats['total_days'] > 0:
-                success_rates.append(stats['success_rate'])
+        return [(user_id, names.get(habit_id, ''), goal_days) for user_id, habit_id, goal_days in completed], expired
+    except Exception as e:
+        logger.error(f"Помилка оновлення статусів цілей: {e}")
+        return [], 0
+
+def get_period_stats(user_id: int, start_date: str, end_date: str) -> dict:
+    period = {
+        'days': [],
+        'clean_count': 0,
+        'did_count': 0,
+        'money_saved': 0.0,
+        'success_rate': 0.0
+    }
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT date, clean_count, did_count, money_saved
+                FROM user_daily_stats
+                WHERE user_id = ? AND date BETWEEN ? AND ?
+                ORDER BY date
+            ''', (user_id, start_date, end_date))
+            rows = cursor.fetchall()
         
-        average_success_rate = sum(success_rates) / len(success_rates) if success_rates else 0
+        for log_date, clean_count, did_count, money_saved in rows:
+            if not clean_count and not did_count:
+                continue
+            period['days'].append({
+                'date': log_date,
+                'clean_count': clean_count,
+                'did_count': did_count,
+                'money_saved': money_saved
+            })
+            period['clean_count'] += clean_count
+            period['did_count'] += did_count
+            period['money_saved'] += money_saved
         
-        return {
-            'total_habits': total_habits,
-            'total_tracked_days': total_tracked_days,
-            'total_clean_days': total_clean_days,
-            'total_money_saved': total_money_saved,
-            'average_success_rate': average_success_rate
-        }
+        total = period['clean_count'] + period['did_count']
+        if total > 0:
+            period['success_rate'] = period['clean_count'] / total * 100
+        return period
     except Exception as e:
-        logger.error(f"Помилка отримання загальної статистики: {e}")
-        return {
-            'total_habits': 0,
-            'total_tracked_days': 0,
-            'total_clean_days': 0,
-            'total_money_saved': 0.0,
-            'average_success_rate': 0.0
-        }
+        logger.error(f"Помилка отримання статистики за період: {e}")
+        return period
+
+def get_reminder_timezones() -> List[str]:
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(migrations.TIMEZONES_QUERY)
+            return [row[0] for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"Помилка отримання часових поясів: {e}")
+        return []
+
+def get_users_to_remind(timezone: str, day: str, after_user_id: int = 0, limit: int = 1000) -> List[int]:
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT u.id
+                FROM users u
+                WHERE u.timezone = ? AND u.id > ?
+                  AND EXISTS (SELECT 1 FROM habits h WHERE h.user_id = u.id)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM habit_logs l
+                      WHERE l.user_id = u.id AND l.date = ?
+                  )
+                ORDER BY u.id
+                LIMIT ?
+            ''', (timezone, after_user_id, day, limit))
+            return [row[0] for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"Помилка отримання користувачів для нагадування: {e}")
+        return []
+
+def load_persisted_user_data(user_id: Optional[int] = None) -> Dict[int, dict]:
+    with connection() as conn:
+        return persistence.load_user_data(conn.cursor(), user_id)
+
+def load_persisted_conversations(name: str) -> Dict[tuple, object]:
+    with connection() as conn:
+        return persistence.load_conversations(conn.cursor(), name)
+
+def save_persisted_state(user_data: Dict[int, Optional[str]],
+                         conversations: Dict[Tuple[str, str], Optional[str]]) -> bool:
+    try:
+        with connection(immediate=True) as conn:
+            persistence.write(conn.cursor(), user_data, conversations)
+        return True
+    except Exception as e:
+        logger.error(f"Помилка збереження стану бота: {e}")
+        return False
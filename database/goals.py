@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+from typing import List, Tuple
+
+# Скільки днів поспіль без звички припадає на вікно цілі: серія з habit_stats,
+# обрізана датою початку цілі
+GOAL_PROGRESS = '''
+    MIN(COALESCE(s.current_streak, 0),
+        MAX(0, CAST(julianday(s.last_log_date) - julianday(g.start_date) AS INTEGER) + 1))
+'''
+
+# Остання ціль кожної звички користувача разом із серією з habit_stats
+GOALS_QUERY = f'''
+    SELECT h.id, h.name, g.goal_days, g.start_date, g.end_date, g.completed, g.expired,
+           s.current_streak, s.last_log_date, {GOAL_PROGRESS}
+    FROM habits h
+    JOIN user_goals g ON g.id = (SELECT MAX(id) FROM user_goals WHERE habit_id = h.id)
+    LEFT JOIN habit_stats s ON s.habit_id = h.id
+    WHERE h.user_id = ?
+    ORDER BY h.created_at DESC
+'''
+
+
+def create_goal(cursor, user_id: int, habit_id: int, goal_days: int, start_date: date) -> int:
+    cursor.execute('''
+        UPDATE user_goals SET expired = 1
+        WHERE habit_id = ? AND completed = 0 AND expired = 0
+    ''', (habit_id,))
+    end_date = start_date + timedelta(days=goal_days - 1)
+    cursor.execute('''
+        INSERT INTO user_goals (user_id, habit_id, goal_days, start_date, end_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (user_id, habit_id, goal_days, start_date.isoformat(), end_date.isoformat()))
+    return cursor.lastrowid
+
+
+def backfill(cursor):
+    cursor.execute('''
+        INSERT INTO user_goals (user_id, habit_id, goal_days, start_date, end_date)
+        SELECT h.user_id, h.id, h.goal_days, date(h.created_at),
+               date(h.created_at, '+' || (h.goal_days - 1) || ' days')
+        FROM habits h
+        WHERE NOT EXISTS (SELECT 1 FROM user_goals g WHERE g.habit_id = h.id)
+    ''')
+
+
+def complete_goals(cursor, today: str) -> List[Tuple[int, int, int]]:
+    cursor.execute(f'''
+        UPDATE user_goals AS g SET completed = 1
+        FROM habit_stats s
+        WHERE s.habit_id = g.habit_id
+          AND g.end_date >= date(?, '-1 day') AND g.completed = 0 AND g.expired = 0
+          AND {GOAL_PROGRESS} >= g.goal_days
+        RETURNING user_id, habit_id, goal_days
+    ''', (today,))
+    return cursor.fetchall()
+
+
+# День запасу: у західних часових поясах останній день цілі ще триває
+def expire_goals(cursor, today: str) -> int:
+    cursor.execute('''
+        UPDATE user_goals SET expired = 1
+        WHERE end_date < date(?, '-1 day') AND completed = 0 AND expired = 0
+    ''', (today,))
+    return cursor.rowcount
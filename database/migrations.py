@@ -0,0 +1,234 @@
+import logging
+from typing import Callable, List, Tuple
+
+from config import DEFAULT_TIMEZONE
+from . import achievements
+from . import goals
+from . import persistence
+from . import stats as habit_stats
+
+logger = logging.getLogger(__name__)
+
+
+def add_column(cursor, table: str, column: str, definition: str):
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def _base_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            username TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS habits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            name TEXT NOT NULL,
+            cost_per_day REAL DEFAULT 0,
+            frequency_per_day INTEGER DEFAULT 1,
+            goal_days INTEGER DEFAULT 30,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS habit_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            habit_id INTEGER,
+            user_id INTEGER,
+            date DATE,
+            did_habit BOOLEAN,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (habit_id) REFERENCES habits (id),
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            UNIQUE(habit_id, date)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_goals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            habit_id INTEGER,
+            goal_days INTEGER,
+            start_date DATE,
+            end_date DATE,
+            completed BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (habit_id) REFERENCES habits (id)
+        )
+    ''')
+
+
+def _habit_stats_table(cursor):
+    habit_stats.create_table(cursor)
+    habit_stats.rebuild_all(cursor)
+
+
+def _core_indexes(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_habits_user_created ON habits (user_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_habit_logs_habit_date ON habit_logs (habit_id, date, did_habit)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_habit_logs_user_date ON habit_logs (user_id, date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_goals_user ON user_goals (user_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_habit_stats_user ON habit_stats (user_id)')
+
+
+def _user_timezones(cursor):
+    add_column(cursor, 'users', 'timezone', 'TEXT')
+    cursor.execute('INSERT OR IGNORE INTO users (id) SELECT DISTINCT user_id FROM habits')
+    cursor.execute('UPDATE users SET timezone = ? WHERE timezone IS NULL', (DEFAULT_TIMEZONE,))
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_timezone ON users (timezone, id)')
+    habit_stats.rebuild_all(cursor)
+
+
+def _daily_rollup(cursor):
+    habit_stats.create_daily_rollup_table(cursor)
+    habit_stats.rebuild_daily_rollup(cursor)
+
+
+def _chart_files(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chart_files (
+            cache_key TEXT PRIMARY KEY,
+            file_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _achievements(cursor):
+    achievements.create_table(cursor)
+    achievements.backfill(cursor)
+
+
+def _chart_files_habit(cursor):
+    add_column(cursor, 'chart_files', 'habit_id', 'INTEGER')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_chart_files_habit ON chart_files (habit_id)')
+    # Старі ключі рахувалися за іншою формулою і вже ніколи не збіжуться
+    cursor.execute('DELETE FROM chart_files')
+
+
+def _goal_deadlines(cursor):
+    add_column(cursor, 'user_goals', 'expired', 'BOOLEAN DEFAULT 0')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_goals_deadline ON user_goals (end_date, completed)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_goals_habit ON user_goals (habit_id)')
+    goals.backfill(cursor)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'Базові таблиці', _base_tables),
+    (2, 'Таблиця habit_stats', _habit_stats_table),
+    (3, 'Індекси для запитів по користувачу та звичці', _core_indexes),
+    (4, 'Часовий пояс користувача, серії лише з днів поспіль', _user_timezones),
+    (5, 'Щоденні підсумки користувача для тижневої та місячної статистики', _daily_rollup),
+    (6, 'Telegram file_id готових графіків', _chart_files),
+    (7, 'Досягнення за звичками', _achievements),
+    (8, 'Стан розмов та user_data бота', persistence.create_tables),
+    (9, 'Терміни цілей та цілі для наявних звичок', _goal_deadlines),
+    (10, 'Звичка графіка для очищення витіснених file_id', _chart_files_habit),
+]
+
+
+# Обхід індексу стрибками: по одному пошуку на кожен часовий пояс
+# замість читання всіх користувачів
+TIMEZONES_QUERY = '''
+    WITH RECURSIVE zones(name) AS (
+        SELECT MIN(timezone) FROM users
+        UNION ALL
+        SELECT (SELECT MIN(timezone) FROM users WHERE timezone > zones.name)
+        FROM zones WHERE zones.name IS NOT NULL
+    )
+    SELECT name FROM zones WHERE name IS NOT NULL
+'''
+
+
+# Запити з гарячого шляху, які мають обходитись без повного сканування таблиць
+HOT_QUERIES = [
+    ('SELECT id FROM habits WHERE user_id = ? ORDER BY created_at DESC', (0,)),
+    ('SELECT date, did_habit FROM habit_logs WHERE habit_id = ? ORDER BY date', (0,)),
+    ('SELECT habit_id FROM habit_logs WHERE user_id = ? AND date = ?', (0, '')),
+    ('SELECT id FROM user_goals WHERE user_id = ?', (0,)),
+    ('SELECT current_streak FROM habit_stats WHERE habit_id = ?', (0,)),
+    ('SELECT id FROM users WHERE timezone = ? AND id > ? ORDER BY id', ('', 0)),
+    (TIMEZONES_QUERY, ()),
+    ('SELECT habit_id, milestone FROM achievements WHERE user_id = ?', (0,)),
+    ('DELETE FROM chart_files WHERE habit_id = ? AND cache_key != ?', (0, '')),
+    (goals.GOALS_QUERY, (0,)),
+    ("UPDATE user_goals SET expired = 1 WHERE end_date < ? AND completed = 0 AND expired = 0", ('',)),
+    ('SELECT date, clean_count FROM user_daily_stats WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date', (0, '', '')),
+]
+
+
+def get_schema_version(cursor) -> int:
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+    return cursor.fetchone()[0]
+
+
+def run_migrations(connection) -> int:
+    applied = 0
+    for version, description, migrate in MIGRATIONS:
+        with connection(immediate=True) as conn:
+            cursor = conn.cursor()
+            if version <= get_schema_version(cursor):
+                continue
+            migrate(cursor)
+            cursor.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+        logger.info(f"Застосовано міграцію {version}: {description}")
+        applied += 1
+    return applied
+
+
+# Повне сканування - це SCAN без індексу. У плані таблиця може бути під
+# псевдонімом ("SCAN h"), а старі SQLite пишуть "SCAN TABLE x"; сканування
+# CTE та підзапитів (CO-ROUTINE, MATERIALIZE) - не таблиці, їх пропускаємо
+def _is_full_scan(detail: str, derived: set) -> bool:
+    words = detail.split()
+    if words[0] != 'SCAN' or len(words) < 2:
+        return False
+    name = words[2] if words[1] == 'TABLE' and len(words) > 2 else words[1]
+    if name in derived or name in ('SUBQUERY', 'CONSTANT'):
+        return False
+    return 'USING INDEX' not in detail and 'USING COVERING INDEX' not in detail
+
+
+def hot_queries() -> List[Tuple[str, tuple]]:
+    # Запити сторінок звичок живуть поруч із get_user_habits_page, а database
+    # сам імпортує migrations - тому беремо їх під час виклику
+    from .database import HABITS_PAGE_QUERY, HABITS_AFTER, HABITS_BEFORE
+    return HOT_QUERIES + [
+        (HABITS_PAGE_QUERY.format(condition=HABITS_AFTER, order='DESC'), (0, 0, 0)),
+        (HABITS_PAGE_QUERY.format(condition=HABITS_BEFORE, order='ASC'), (0, 0, 0)),
+    ]
+
+
+def find_unindexed_queries(cursor) -> List[Tuple[str, str]]:
+    problems = []
+    for query, params in hot_queries():
+        cursor.execute(f'EXPLAIN QUERY PLAN {query}', params)
+        details = [row[-1] for row in cursor.fetchall()]
+        derived = {
+            detail.split()[1] for detail in details
+            if detail.split()[0] in ('CO-ROUTINE', 'MATERIALIZE') and len(detail.split()) > 1
+        }
+        for detail in details:
+            if _is_full_scan(detail, derived) or 'TEMP B-TREE' in detail:
+                problems.append((' '.join(query.split()), detail))
+    return problems
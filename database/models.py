@@ -1,17 +1,30 @@
+from array import array
 from dataclasses import dataclass
 from datetime import datetime, date
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Tuple
 
 
-@dataclass
-class User:
+# Моделі незмінні та без __dict__: їх кешують і ділять між потоками,
+# а __slots__ замість dataclass(slots=True) - щоб працювало на Python 3.9
+class _Model:
+    __slots__ = ()
+
+    def __reduce__(self):
+        # frozen-клас не відновити стандартним setstate через setattr
+        return self.__class__, tuple(getattr(self, name) for name in self.__slots__)
+
+
+@dataclass(frozen=True)
+class User(_Model):
+    __slots__ = ('id', 'username', 'created_at')
     id: int
     username: Optional[str]
     created_at: datetime
 
 
-@dataclass
-class Habit:
+@dataclass(frozen=True)
+class Habit(_Model):
+    __slots__ = ('id', 'user_id', 'name', 'cost_per_day', 'frequency_per_day', 'goal_days', 'created_at')
     id: int
     user_id: int
     name: str
@@ -21,8 +34,9 @@ class Habit:
     created_at: datetime
 
 
-@dataclass
-class HabitLog:
+@dataclass(frozen=True)
+class HabitLog(_Model):
+    __slots__ = ('id', 'habit_id', 'user_id', 'date', 'did_habit', 'created_at')
     id: int
     habit_id: int
     user_id: int
@@ -31,8 +45,9 @@ class HabitLog:
     created_at: datetime
 
 
-@dataclass
-class UserGoal:
+@dataclass(frozen=True)
+class UserGoal(_Model):
+    __slots__ = ('id', 'user_id', 'habit_id', 'goal_days', 'start_date', 'end_date', 'completed', 'created_at')
     id: int
     user_id: int
     habit_id: int
@@ -41,3 +56,33 @@ class UserGoal:
     end_date: date
     completed: bool
     created_at: datetime
+
+
+class HabitLogSeries:
+    """Історія звички колонками: день як date.toordinal() та прапорець зриву."""
+    __slots__ = ('day_numbers', 'did_flags')
+
+    def __init__(self, day_numbers: Iterable[int] = (), did_flags: Iterable[int] = ()):
+        self.day_numbers = array('q', day_numbers)
+        self.did_flags = array('b', did_flags)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, int]]) -> 'HabitLogSeries':
+        series = cls()
+        for day_number, did_habit in rows:
+            series.day_numbers.append(day_number)
+            series.did_flags.append(did_habit)
+        return series
+
+    def __len__(self) -> int:
+        return len(self.day_numbers)
+
+    def __getstate__(self):
+        return self.day_numbers, self.did_flags
+
+    def __setstate__(self, state):
+        self.day_numbers, self.did_flags = state
+
+    def rows(self) -> Iterator[Tuple[str, bool]]:
+        for day_number, did_habit in zip(self.day_numbers, self.did_flags):
+            yield date.fromordinal(day_number).isoformat(), bool(did_habit)
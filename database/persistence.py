@@ -0,0 +1,53 @@
+import json
+from typing import Dict, Optional, Tuple
+
+
+def create_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS persisted_user_data (
+            user_id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS persisted_conversations (
+            name TEXT,
+            key TEXT,
+            state TEXT NOT NULL,
+            PRIMARY KEY (name, key)
+        ) WITHOUT ROWID
+    ''')
+
+
+def load_user_data(cursor, user_id: Optional[int] = None) -> Dict[int, dict]:
+    if user_id is None:
+        cursor.execute('SELECT user_id, data FROM persisted_user_data')
+    else:
+        cursor.execute('SELECT user_id, data FROM persisted_user_data WHERE user_id = ?', (user_id,))
+    return {row_user_id: json.loads(data) for row_user_id, data in cursor.fetchall()}
+
+
+def load_conversations(cursor, name: str) -> Dict[tuple, object]:
+    cursor.execute('SELECT key, state FROM persisted_conversations WHERE name = ?', (name,))
+    return {tuple(json.loads(key)): json.loads(state) for key, state in cursor.fetchall()}
+
+
+# None замість даних означає видалення запису
+def write(cursor, user_data: Dict[int, Optional[str]], conversations: Dict[Tuple[str, str], Optional[str]]):
+    cursor.executemany('''
+        INSERT INTO persisted_user_data (user_id, data) VALUES (?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = CURRENT_TIMESTAMP
+    ''', [(user_id, data) for user_id, data in user_data.items() if data is not None])
+    cursor.executemany(
+        'DELETE FROM persisted_user_data WHERE user_id = ?',
+        [(user_id,) for user_id, data in user_data.items() if data is None]
+    )
+    cursor.executemany('''
+        INSERT INTO persisted_conversations (name, key, state) VALUES (?, ?, ?)
+        ON CONFLICT(name, key) DO UPDATE SET state = excluded.state
+    ''', [(name, key, state) for (name, key), state in conversations.items() if state is not None])
+    cursor.executemany(
+        'DELETE FROM persisted_conversations WHERE name = ? AND key = ?',
+        [(name, key) for (name, key), state in conversations.items() if state is None]
+    )
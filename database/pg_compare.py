@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from config import DEFAULT_TIMEZONE, ITEMS_PER_PAGE
+from utils.helpers import get_local_today
+from .backend import StorageBackend
+from .database import init_database
+from .pool import close_pool, configure_pool
+from .repository import SQLiteBackend, shutdown_executor
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(value):
+    # Habit і HabitLogSeries порівнюємо за даними: created_at у двох базах різний
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_normalize(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if hasattr(value, 'goal_days') and hasattr(value, 'created_at'):
+        return (value.id, value.user_id, value.name, value.cost_per_day, value.frequency_per_day, value.goal_days)
+    if hasattr(value, 'day_numbers'):
+        return (list(value.day_numbers), list(value.did_flags))
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+async def run_scenario(backend: StorageBackend) -> List[Tuple[str, object]]:
+    # Однаковий набір операцій для кожного бекенду на порожній базі; id звичок
+    # в обох базах починаються з 1, тож їх можна порівнювати напряму
+    steps = []
+
+    async def step(name: str, call):
+        steps.append((name, _normalize(await call)))
+
+    today = get_local_today(DEFAULT_TIMEZONE)
+    for user_id in (1, 2, 3):
+        await step(f'add_user {user_id}', backend.add_user(user_id, f'user{user_id}'))
+    await step('set_user_timezone', backend.set_user_timezone(2, 'America/New_York'))
+    await step('get_user_timezone', backend.get_user_timezone(2))
+    await step('get_user_timezone unknown', backend.get_user_timezone(99))
+
+    first = await backend.add_habit(1, 'A', 10, 3)
+    # created_at у SQLite з точністю до секунди - порядок звичок має бути однозначним
+    await asyncio.sleep(1.1)
+    second = await backend.add_habit(1, 'B', 2.5, 1)
+    foreign = await backend.add_habit(2, 'C', 0, 1)
+    steps += [('add_habit A', _normalize(first)), ('add_habit B', _normalize(second)),
+              ('add_habit C', _normalize(foreign))]
+
+    entries = [(first.id, days_ago, days_ago % 7 == 3) for days_ago in range(40, 0, -1)]
+    entries += [(second.id, days_ago, days_ago % 4 == 0) for days_ago in range(20, 2, -1)]
+    await step('log_habit_activities', backend.log_habit_activities(1, entries))
+    await step('log_habit_activity', backend.log_habit_activity(first.id, 1, False))
+    await step('log_habit_activity rewrite', backend.log_habit_activity(first.id, 1, True))
+    await step('log_habit_activity again', backend.log_habit_activity(first.id, 1, False))
+    await step('log_habit_activity foreign', backend.log_habit_activity(foreign.id, 1, False))
+    await step('log_habit_activities existing', backend.log_habit_activities(
+        1, [(second.id, 4, False), (second.id, 1, True), (foreign.id, 0, False)]
+    ))
+    await step('log_habit_activities replace', backend.log_habit_activities(
+        1, [(second.id, 4, False), (first.id, 0, True)], replace=True
+    ))
+
+    await step('get_user_habits', backend.get_user_habits(1))
+    await step('get_habit', backend.get_habit(1, first.id))
+    await step('get_habit foreign', backend.get_habit(2, first.id))
+    await step('get_habit_details', backend.get_habit_details(1, second.id))
+    await step('get_habit_stats', backend.get_habit_stats(first.id))
+    await step('get_user_stats', backend.get_user_stats(1))
+    await step('get_user_total_stats', backend.get_user_total_stats(1))
+    await step('get_period_stats', backend.get_period_stats(
+        1, (today - timedelta(days=10)).isoformat(), today.isoformat()
+    ))
+    await step('get_habit_log_series', backend.get_habit_log_series(second.id))
+    await step('get_user_achievements', backend.get_user_achievements(1))
+    await step('pop_new_achievements', backend.pop_new_achievements(1))
+    await step('pop_new_achievements again', backend.pop_new_achievements(1))
+
+    await step('get_user_goals', backend.get_user_goals(1))
+    await step('set_habit_goal', backend.set_habit_goal(1, first.id, 7))
+    await step('set_habit_goal foreign', backend.set_habit_goal(2, first.id, 7))
+    await step('update_goal_statuses', backend.update_goal_statuses(today.isoformat()))
+    await step('update_goal_statuses later', backend.update_goal_statuses((today + timedelta(days=40)).isoformat()))
+    await step('get_user_goals after', backend.get_user_goals(1))
+
+    await step('get_reminder_timezones', backend.get_reminder_timezones())
+    await step('get_users_to_remind', backend.get_users_to_remind(DEFAULT_TIMEZONE, today.isoformat()))
+    await step('get_users_to_remind other zone', backend.get_users_to_remind('America/New_York', today.isoformat()))
+
+    for index in range(ITEMS_PER_PAGE + 2):
+        await backend.add_habit(3, f'h{index}')
+    first_page = await backend.get_user_habits_page(3)
+    next_page = await backend.get_user_habits_page(3, after_id=first_page['next_id'])
+    previous_page = await backend.get_user_habits_page(3, before_id=next_page['prev_id'])
+    steps += [('get_user_habits_page', _normalize(first_page)), ('get_user_habits_page next', _normalize(next_page)),
+              ('get_user_habits_page prev', _normalize(previous_page))]
+    return steps
+
+
+def compare_steps(expected: List[Tuple[str, object]], actual: List[Tuple[str, object]]) -> List[str]:
+    differences = []
+    for (name, sqlite_value), (_, pg_value) in zip(expected, actual):
+        if sqlite_value != pg_value:
+            differences.append(f"{name}:\n  SQLite:     {sqlite_value}\n  PostgreSQL: {pg_value}")
+    if len(expected) != len(actual):
+        differences.append(f"Різна кількість кроків: SQLite {len(expected)}, PostgreSQL {len(actual)}")
+    return differences
+
+
+def find_pg_bin(pg_bin: Optional[str] = None) -> Optional[str]:
+    for directory in (pg_bin, os.getenv('PG_BIN')):
+        if directory and os.path.exists(os.path.join(directory, 'pg_ctl')):
+            return directory
+    initdb = shutil.which('initdb')
+    return os.path.dirname(initdb) if initdb else None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def temporary_server(pg_bin: str):
+    # Окремий кластер у тимчасовому каталозі з trust-доступом лише з 127.0.0.1
+    workdir = tempfile.mkdtemp(prefix='intokui-pg-')
+    data_dir = os.path.join(workdir, 'data')
+    port = _free_port()
+    started = False
+    try:
+        _pg_tool(pg_bin, 'initdb', '-D', data_dir, '-U', 'postgres', '-A', 'trust', '--no-sync')
+        _pg_tool(pg_bin, 'pg_ctl', '-D', data_dir, '-l', os.path.join(workdir, 'server.log'), '-w',
+                 '-o', f"-p {port} -c listen_addresses=127.0.0.1 -k {workdir} -c fsync=off", 'start')
+        started = True
+        yield f'postgresql://postgres@127.0.0.1:{port}/postgres'
+    finally:
+        if started:
+            subprocess.run(
+                [os.path.join(pg_bin, 'pg_ctl'), '-D', data_dir, '-m', 'fast', '-w', 'stop'],
+                capture_output=True
+            )
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _pg_tool(pg_bin: str, tool: str, *args: str):
+    result = subprocess.run([os.path.join(pg_bin, tool), *args], capture_output=True, text=True)
+    if result.returncode != 0:
+        # Найчастіше це запуск initdb від root - тоді підійде --url
+        raise RuntimeError(f"{tool} завершився з кодом {result.returncode}: {result.stderr.strip()}")
+
+
+@asynccontextmanager
+async def temporary_database(url: str):
+    # Порівняння потребує порожньої бази, тож наявні дані на сервері не чіпаємо
+    import asyncpg
+
+    name = f'intokui_compare_{os.getpid()}'
+    admin = await asyncpg.connect(url)
+    try:
+        await admin.execute(f'DROP DATABASE IF EXISTS {name}')
+        await admin.execute(f'CREATE DATABASE {name}')
+        parts = urlsplit(url)
+        yield urlunsplit(parts._replace(path=f'/{name}'))
+    finally:
+        await admin.execute(f'DROP DATABASE IF EXISTS {name} WITH (FORCE)')
+        await admin.close()
+
+
+async def _run_sqlite() -> List[Tuple[str, object]]:
+    workdir = tempfile.mkdtemp(prefix='intokui-sqlite-')
+    try:
+        configure_pool(os.path.join(workdir, 'habits.db'))
+        init_database()
+        backend = SQLiteBackend()
+        await backend.initialize()
+        try:
+            return await run_scenario(backend)
+        finally:
+            await backend.close()
+    finally:
+        close_pool()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def _run_postgres(url: str) -> List[Tuple[str, object]]:
+    from .postgres import PostgresBackend
+
+    async with temporary_database(url) as database_url:
+        backend = PostgresBackend(database_url)
+        await backend.initialize()
+        try:
+            return await run_scenario(backend)
+        finally:
+            await backend.close()
+
+
+async def compare_backends(url: Optional[str] = None, pg_bin: Optional[str] = None) -> List[str]:
+    expected = await _run_sqlite()
+    if url:
+        actual = await _run_postgres(url)
+    else:
+        directory = find_pg_bin(pg_bin)
+        if directory is None:
+            raise FileNotFoundError("initdb і pg_ctl не знайдено: вкажіть --pg-bin, PG_BIN або --url")
+        async with temporary_server(directory) as server_url:
+            actual = await _run_postgres(server_url)
+    shutdown_executor()
+    logger.info(f"Порівняно кроків: {len(expected)}")
+    return compare_steps(expected, actual)
@@ -0,0 +1,175 @@
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+import config
+from .shards import current_shard, shard_path
+
+logger = logging.getLogger(__name__)
+
+# Фабрика з'єднань і trace-колбек для кожного пулу, зокрема створеного пізніше
+# через configure_pool; задаються через set_connection_hooks
+_connection_factory = sqlite3.Connection
+_connection_trace_callback = None
+
+
+class ConnectionPool:
+    def __init__(self, path: str, size: int = config.DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self._trace_callback = _connection_trace_callback
+        self.factory = _connection_factory
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=config.DB_BUSY_TIMEOUT / 1000,
+            check_same_thread=False,
+            factory=self.factory
+        )
+        conn.execute(f"PRAGMA journal_mode = {config.DB_JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous = {config.DB_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size = {int(config.DB_CACHE_SIZE)}")
+        conn.execute(f"PRAGMA mmap_size = {int(config.DB_MMAP_SIZE)}")
+        conn.execute(f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT)}")
+        conn.set_trace_callback(self._trace_callback)
+        return conn
+
+    def set_trace_callback(self, callback):
+        # Діє на вільні та нові з'єднання, тож викликати до початку роботи
+        self._trace_callback = callback
+        with self._idle.mutex:
+            for conn in self._idle.queue:
+                conn.set_trace_callback(callback)
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self.hits += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+                self.misses += 1
+            else:
+                self.waits += 1
+
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        return self._idle.get()
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def discard(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._created -= 1
+
+    @contextmanager
+    def connection(self, immediate: bool = False):
+        conn = self.acquire()
+        committed = False
+        try:
+            if immediate:
+                conn.execute('BEGIN IMMEDIATE')
+            yield conn
+            conn.commit()
+            committed = True
+        finally:
+            if committed:
+                self.release(conn)
+            else:
+                try:
+                    conn.rollback()
+                    self.release(conn)
+                except sqlite3.Error:
+                    self.discard(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': self.size,
+                'open': self._created,
+                'idle': self._idle.qsize(),
+                'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits
+            }
+
+
+# Пул на кожен шард; без шардування є лише шард 0 з DATABASE_FILE
+_pools: Dict[int, ConnectionPool] = {}
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    index = current_shard()
+    pool = _pools.get(index)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(index)
+            if pool is None:
+                pool = _pools[index] = ConnectionPool(shard_path(index))
+    return pool
+
+
+def configure_pool(path: str, size: int = None) -> ConnectionPool:
+    index = current_shard()
+    with _pool_lock:
+        if index in _pools:
+            _pools[index].close()
+        pool = _pools[index] = ConnectionPool(path, size or config.DB_POOL_SIZE)
+    return pool
+
+
+def set_connection_hooks(factory=sqlite3.Connection, trace_callback=None):
+    global _connection_factory, _connection_trace_callback
+    with _pool_lock:
+        _connection_factory = factory
+        _connection_trace_callback = trace_callback
+        for pool in _pools.values():
+            pool.factory = factory
+            pool.set_trace_callback(trace_callback)
+            # Вже відкриті з'єднання створені зі старою фабрикою
+            pool.close()
+
+
+def close_pool():
+    with _pool_lock:
+        for index, pool in _pools.items():
+            pool.close()
+            logger.info(f"Пул з'єднань шарду {index} закрито: {pool.stats()}")
+        _pools.clear()
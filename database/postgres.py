@@ -0,0 +1,703 @@
+import functools
+import logging
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config import DEFAULT_TIMEZONE, DEFAULT_GOAL_DAYS, ITEMS_PER_PAGE, PG_POOL_MIN, PG_POOL_MAX
+from utils.helpers import get_local_today
+from utils.metrics import record_db_call
+from .achievements import milestones_between
+from .backend import StorageBackend
+from .database import HABIT_COLUMNS
+from .rows import (
+    empty_habit_stats, empty_total_stats, goal_from_row, habit_stats_from_row, habits_page_from_rows,
+    user_stats_from_rows
+)
+from .models import Habit, HabitLogSeries
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_xact_lock: кілька процесів не створюють схему одночасно
+SCHEMA_LOCK = 0x1d70c0
+
+# Та сама схема, що й у SQLite після всіх міграцій, але без таблиць, які
+# лишаються локальними (стан розмов, file_id графіків), та без user_daily_stats:
+# статистику за період рахує сам PostgreSQL
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id BIGINT PRIMARY KEY,
+        username TEXT,
+        timezone TEXT,
+        created_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS habits (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT REFERENCES users (id),
+        name TEXT NOT NULL,
+        cost_per_day DOUBLE PRECISION DEFAULT 0,
+        frequency_per_day INTEGER DEFAULT 1,
+        goal_days INTEGER DEFAULT 30,
+        created_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS habit_logs (
+        id BIGSERIAL PRIMARY KEY,
+        habit_id BIGINT REFERENCES habits (id),
+        user_id BIGINT,
+        date DATE NOT NULL,
+        did_habit BOOLEAN NOT NULL,
+        created_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc'),
+        UNIQUE (habit_id, date)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS habit_stats (
+        habit_id BIGINT PRIMARY KEY REFERENCES habits (id),
+        user_id BIGINT,
+        current_streak INTEGER NOT NULL DEFAULT 0,
+        longest_streak INTEGER NOT NULL DEFAULT 0,
+        clean_days INTEGER NOT NULL DEFAULT 0,
+        total_days INTEGER NOT NULL DEFAULT 0,
+        last_log_date DATE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS achievements (
+        habit_id BIGINT REFERENCES habits (id),
+        milestone INTEGER,
+        user_id BIGINT,
+        unlocked_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc'),
+        notified BOOLEAN NOT NULL DEFAULT FALSE,
+        PRIMARY KEY (habit_id, milestone)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS user_goals (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT,
+        habit_id BIGINT REFERENCES habits (id),
+        goal_days INTEGER,
+        start_date DATE,
+        end_date DATE,
+        completed BOOLEAN NOT NULL DEFAULT FALSE,
+        expired BOOLEAN NOT NULL DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_users_timezone ON users (timezone, id)',
+    'CREATE INDEX IF NOT EXISTS idx_habits_user ON habits (user_id, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_habit_logs_user_date ON habit_logs (user_id, date)',
+    'CREATE INDEX IF NOT EXISTS idx_achievements_user ON achievements (user_id) WHERE NOT notified',
+    'CREATE INDEX IF NOT EXISTS idx_user_goals_habit ON user_goals (habit_id, id)',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_user_goals_deadline ON user_goals (end_date)
+    WHERE NOT completed AND NOT expired
+    ''',
+]
+
+# Підсумки звичок одним запитом: серії - це групи чистих днів, у яких
+# дата мінус номер рядка однакова. previous - найдовша серія до запису,
+# з того ж знімка, що й INSERT, тож нові досягнення видно без ще одного запиту
+REFRESH_STATS = '''
+    WITH previous AS (
+        SELECT habit_id, longest_streak FROM habit_stats WHERE habit_id = ANY($1::bigint[])
+    ),
+    runs AS (
+        SELECT habit_id, MAX(date) AS end_date, COUNT(*) AS length
+        FROM (
+            SELECT habit_id, date,
+                   date - (ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY date))::int AS run
+            FROM habit_logs
+            WHERE habit_id = ANY($1::bigint[]) AND NOT did_habit
+        ) clean
+        GROUP BY habit_id, run
+    ),
+    totals AS (
+        SELECT habit_id, COUNT(*) AS total_days,
+               COUNT(*) FILTER (WHERE NOT did_habit) AS clean_days,
+               MAX(date) AS last_log_date
+        FROM habit_logs
+        WHERE habit_id = ANY($1::bigint[])
+        GROUP BY habit_id
+    ),
+    saved AS (
+        INSERT INTO habit_stats (habit_id, user_id, current_streak, longest_streak,
+                                 clean_days, total_days, last_log_date)
+        SELECT t.habit_id, h.user_id,
+               COALESCE(MAX(r.length) FILTER (WHERE r.end_date = t.last_log_date), 0),
+               COALESCE(MAX(r.length), 0),
+               t.clean_days, t.total_days, t.last_log_date
+        FROM totals t
+        JOIN habits h ON h.id = t.habit_id
+        LEFT JOIN runs r ON r.habit_id = t.habit_id
+        GROUP BY t.habit_id, h.user_id, t.clean_days, t.total_days, t.last_log_date
+        ON CONFLICT (habit_id) DO UPDATE SET
+            current_streak = excluded.current_streak,
+            longest_streak = excluded.longest_streak,
+            clean_days = excluded.clean_days,
+            total_days = excluded.total_days,
+            last_log_date = excluded.last_log_date
+        RETURNING habit_id, current_streak, longest_streak, clean_days, total_days, last_log_date
+    )
+    SELECT s.habit_id, s.current_streak, s.longest_streak, s.clean_days, s.total_days,
+           s.last_log_date::text, COALESCE(p.longest_streak, 0)
+    FROM saved s
+    LEFT JOIN previous p ON p.habit_id = s.habit_id
+'''
+
+GOAL_PROGRESS = '''
+    LEAST(COALESCE(s.current_streak, 0), GREATEST(0, (s.last_log_date - g.start_date) + 1))
+'''
+
+GOALS_QUERY = f'''
+    SELECT h.id, h.name, g.goal_days, g.start_date::text, g.end_date::text, g.completed, g.expired,
+           s.current_streak, s.last_log_date::text, {GOAL_PROGRESS}
+    FROM habits h
+    JOIN LATERAL (
+        SELECT * FROM user_goals WHERE habit_id = h.id ORDER BY id DESC LIMIT 1
+    ) g ON TRUE
+    LEFT JOIN habit_stats s ON s.habit_id = h.id
+    WHERE h.user_id = $1
+    ORDER BY h.created_at DESC
+'''
+
+HABITS_PAGE_QUERY = '''
+    SELECT h.id, h.name, h.cost_per_day,
+           s.current_streak, s.longest_streak, s.clean_days, s.total_days, s.last_log_date::text
+    FROM habits h
+    LEFT JOIN habit_stats s ON s.habit_id = h.id
+    WHERE h.user_id = $1 {condition}
+    ORDER BY h.created_at {order}, h.id {order}
+    LIMIT ${limit}
+'''
+HABITS_AFTER = 'AND (h.created_at, h.id) < (SELECT created_at, id FROM habits WHERE id = $2)'
+HABITS_BEFORE = 'AND (h.created_at, h.id) > (SELECT created_at, id FROM habits WHERE id = $2)'
+
+TIMEZONES_QUERY = '''
+    WITH RECURSIVE zones(name) AS (
+        SELECT MIN(timezone) FROM users
+        UNION ALL
+        SELECT (SELECT MIN(timezone) FROM users WHERE timezone > zones.name)
+        FROM zones WHERE zones.name IS NOT NULL
+    )
+    SELECT name FROM zones WHERE name IS NOT NULL
+'''
+
+
+def _timed(method):
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            record_db_call(method.__name__, time.perf_counter() - started)
+    return wrapper
+
+
+async def _fetch_timezone(conn, user_id: int) -> str:
+    timezone = await conn.fetchval('SELECT timezone FROM users WHERE id = $1', user_id)
+    return timezone or DEFAULT_TIMEZONE
+
+
+async def _create_goal(conn, user_id: int, habit_id: int, goal_days: int, start_date: date):
+    await conn.execute('''
+        UPDATE user_goals SET expired = TRUE
+        WHERE habit_id = $1 AND NOT completed AND NOT expired
+    ''', habit_id)
+    await conn.execute('''
+        INSERT INTO user_goals (user_id, habit_id, goal_days, start_date, end_date)
+        VALUES ($1, $2, $3, $4, $5)
+    ''', user_id, habit_id, goal_days, start_date, start_date + timedelta(days=goal_days - 1))
+
+
+# entries - (habit_id, дата, чи зробив звичку); повертає підсумки як stats.write_logs
+async def _write_logs(conn, user_id: int, entries: List[Tuple[int, date, bool]],
+                      replace: bool = True) -> Dict[int, dict]:
+    logs = {(habit_id, log_date): did_habit for habit_id, log_date, did_habit in entries}
+    if not logs:
+        return {}
+
+    # Як stats.write_logs: з replace=False наявні відмітки не змінюються
+    conflict = '''DO UPDATE SET
+            did_habit = excluded.did_habit,
+            created_at = excluded.created_at''' if replace else 'DO NOTHING'
+    written = await conn.fetch(f'''
+        INSERT INTO habit_logs (habit_id, user_id, date, did_habit)
+        SELECT habit_id, $1, date, did_habit
+        FROM unnest($2::bigint[], $3::date[], $4::boolean[]) AS t (habit_id, date, did_habit)
+        ON CONFLICT (habit_id, date) {conflict}
+        RETURNING habit_id
+    ''', user_id, [habit_id for habit_id, _ in logs], [log_date for _, log_date in logs], list(logs.values()))
+    if not written:
+        return {}
+
+    rows = await conn.fetch(REFRESH_STATS, sorted({row[0] for row in written}))
+
+    results = {}
+    unlocked = []
+    for habit_id, current_streak, longest_streak, clean_days, total_days, last_log_date, previous_longest in rows:
+        results[habit_id] = {
+            'current_streak': current_streak,
+            'longest_streak': longest_streak,
+            'clean_days': clean_days,
+            'total_days': total_days,
+            'last_log_date': last_log_date
+        }
+        unlocked.extend((habit_id, milestone) for milestone in milestones_between(previous_longest, longest_streak))
+
+    if unlocked:
+        await conn.execute('''
+            INSERT INTO achievements (habit_id, milestone, user_id)
+            SELECT habit_id, milestone, $1
+            FROM unnest($2::bigint[], $3::int[]) AS t (habit_id, milestone)
+            ON CONFLICT DO NOTHING
+        ''', user_id, [habit_id for habit_id, _ in unlocked], [milestone for _, milestone in unlocked])
+    return results
+
+
+class PostgresBackend(StorageBackend):
+    """Дані в PostgreSQL через пул з'єднань asyncpg.
+
+    Кешу читання немає: кілька процесів пишуть в одну базу, і локальний
+    кеш кожного з них швидко застаріває."""
+
+    def __init__(self, url: str, min_size: int = PG_POOL_MIN, max_size: int = PG_POOL_MAX):
+        self.url = url
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+
+    async def initialize(self):
+        import asyncpg
+
+        self.pool = await asyncpg.create_pool(self.url, min_size=self.min_size, max_size=self.max_size)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute('SELECT pg_advisory_xact_lock($1)', SCHEMA_LOCK)
+                for statement in SCHEMA:
+                    await conn.execute(statement)
+        logger.info("База даних PostgreSQL ініціалізована успішно")
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    @_timed
+    async def add_user(self, user_id: int, username: str = None) -> bool:
+        try:
+            await self.pool.execute('''
+                INSERT INTO users (id, username, timezone) VALUES ($1, $2, $3)
+                ON CONFLICT (id) DO NOTHING
+            ''', user_id, username, DEFAULT_TIMEZONE)
+            return True
+        except Exception as e:
+            logger.error(f"Помилка додавання користувача: {e}")
+            return False
+
+    @_timed
+    async def get_user_timezone(self, user_id: int) -> str:
+        try:
+            async with self.pool.acquire() as conn:
+                return await _fetch_timezone(conn, user_id)
+        except Exception as e:
+            logger.error(f"Помилка отримання часового поясу: {e}")
+            return DEFAULT_TIMEZONE
+
+    @_timed
+    async def set_user_timezone(self, user_id: int, timezone: str) -> bool:
+        try:
+            await self.pool.execute('''
+                INSERT INTO users (id, timezone) VALUES ($1, $2)
+                ON CONFLICT (id) DO UPDATE SET timezone = excluded.timezone
+            ''', user_id, timezone)
+            return True
+        except Exception as e:
+            logger.error(f"Помилка збереження часового поясу: {e}")
+            return False
+
+    @_timed
+    async def add_habit(self, user_id: int, name: str, cost_per_day: float = 0, frequency_per_day: int = 1,
+                        goal_days: int = DEFAULT_GOAL_DAYS) -> Optional[Habit]:
+        try:
+            async with self.pool.acquire() as conn, conn.transaction():
+                await conn.execute('''
+                    INSERT INTO users (id, timezone) VALUES ($1, $2)
+                    ON CONFLICT (id) DO NOTHING
+                ''', user_id, DEFAULT_TIMEZONE)
+                row = await conn.fetchrow(f'''
+                    INSERT INTO habits AS h (user_id, name, cost_per_day, frequency_per_day, goal_days)
+                    VALUES ($1, $2, $3, $4, $5)
+                    RETURNING {HABIT_COLUMNS}
+                ''', user_id, name, cost_per_day, frequency_per_day, goal_days)
+                today = get_local_today(await _fetch_timezone(conn, user_id))
+                await _create_goal(conn, user_id, row[0], goal_days, today)
+            return Habit(*row)
+        except Exception as e:
+            logger.error(f"Помилка додавання звички: {e}")
+            return None
+
+    @_timed
+    async def get_user_habits(self, user_id: int) -> List[Habit]:
+        try:
+            rows = await self.pool.fetch(f'''
+                SELECT {HABIT_COLUMNS}
+                FROM habits h WHERE h.user_id = $1
+                ORDER BY h.created_at DESC
+            ''', user_id)
+            return [Habit(*row) for row in rows]
+        except Exception as e:
+            logger.error(f"Помилка отримання звичок: {e}")
+            return []
+
+    @_timed
+    async def get_habit(self, user_id: int, habit_id: int) -> Optional[Habit]:
+        try:
+            row = await self.pool.fetchrow(f'''
+                SELECT {HABIT_COLUMNS} FROM habits h WHERE h.id = $1 AND h.user_id = $2
+            ''', habit_id, user_id)
+            return Habit(*row) if row else None
+        except Exception as e:
+            logger.error(f"Помилка отримання звички: {e}")
+            return None
+
+    @_timed
+    async def get_habit_details(self, user_id: int, habit_id: int) -> Optional[Tuple[Habit, dict]]:
+        try:
+            row = await self.pool.fetchrow(f'''
+                SELECT {HABIT_COLUMNS},
+                       s.current_streak, s.longest_streak, s.clean_days, s.total_days,
+                       s.last_log_date::text, u.timezone
+                FROM habits h
+                LEFT JOIN habit_stats s ON s.habit_id = h.id
+                LEFT JOIN users u ON u.id = h.user_id
+                WHERE h.id = $1 AND h.user_id = $2
+            ''', habit_id, user_id)
+            if not row:
+                return None
+
+            habit = Habit(*row[:7])
+            return habit, habit_stats_from_row(*row[7:11], habit.cost_per_day, *row[11:])
+        except Exception as e:
+            logger.error(f"Помилка отримання звички: {e}")
+            return None
+
+    @_timed
+    async def get_user_habits_page(self, user_id: int, after_id: Optional[int] = None,
+                                   before_id: Optional[int] = None, limit: int = ITEMS_PER_PAGE) -> dict:
+        try:
+            if before_id is not None:
+                query = HABITS_PAGE_QUERY.format(condition=HABITS_BEFORE, order='ASC', limit=3)
+                params = (user_id, before_id, limit + 1)
+            elif after_id is not None:
+                query = HABITS_PAGE_QUERY.format(condition=HABITS_AFTER, order='DESC', limit=3)
+                params = (user_id, after_id, limit + 1)
+            else:
+                query = HABITS_PAGE_QUERY.format(condition='', order='DESC', limit=2)
+                params = (user_id, limit + 1)
+
+            async with self.pool.acquire() as conn:
+                timezone = await _fetch_timezone(conn, user_id)
+                rows = await conn.fetch(query, *params)
+
+            return habits_page_from_rows(rows, limit, after_id, before_id, timezone)
+        except Exception as e:
+            logger.error(f"Помилка отримання сторінки звичок: {e}")
+            return {'habits': [], 'prev_id': None, 'next_id': None}
+
+    @_timed
+    async def log_habit_activity(self, habit_id: int, user_id: int, did_habit: bool) -> Optional[dict]:
+        try:
+            async with self.pool.acquire() as conn, conn.transaction():
+                # Блокування рядка звички впорядковує одночасні записи тієї ж звички
+                row = await conn.fetchrow('''
+                    SELECT h.cost_per_day, u.timezone
+                    FROM habits h
+                    LEFT JOIN users u ON u.id = h.user_id
+                    WHERE h.id = $1 AND h.user_id = $2
+                    FOR UPDATE OF h
+                ''', habit_id, user_id)
+                if not row:
+                    logger.warning(f"Користувач {user_id} намагався записати чужу звичку {habit_id}")
+                    return None
+
+                cost_per_day, timezone = row
+                today = get_local_today(timezone)
+                stats = (await _write_logs(conn, user_id, [(habit_id, today, did_habit)]))[habit_id]
+
+            return habit_stats_from_row(
+                stats['current_streak'], stats['longest_streak'], stats['clean_days'], stats['total_days'],
+                cost_per_day, stats['last_log_date'], timezone
+            )
+        except Exception as e:
+            logger.error(f"Помилка запису активності: {e}")
+            return None
+
+    @_timed
+    async def log_habit_activities(self, user_id: int, entries: List[Tuple[int, int, bool]],
+                                   replace: bool = False) -> Optional[List[dict]]:
+        try:
+            async with self.pool.acquire() as conn, conn.transaction():
+                timezone = await _fetch_timezone(conn, user_id)
+                rows = await conn.fetch('''
+                    SELECT id, name, cost_per_day FROM habits
+                    WHERE user_id = $1
+                    ORDER BY created_at DESC
+                    FOR UPDATE
+                ''', user_id)
+                habits = {habit_id: (name, cost_per_day) for habit_id, name, cost_per_day in rows}
+
+                today = get_local_today(timezone)
+                results = await _write_logs(conn, user_id, [
+                    (habit_id, today - timedelta(days=days_ago), did_habit)
+                    for habit_id, days_ago, did_habit in entries
+                    if habit_id in habits and days_ago >= 0
+                ], replace=replace)
+
+            updated = []
+            for habit_id, (name, cost_per_day) in habits.items():
+                if habit_id not in results:
+                    continue
+                stats = results[habit_id]
+                public = habit_stats_from_row(
+                    stats['current_streak'], stats['longest_streak'], stats['clean_days'], stats['total_days'],
+                    cost_per_day, stats['last_log_date'], timezone
+                )
+                public.update(habit_id=habit_id, name=name, cost_per_day=cost_per_day)
+                updated.append(public)
+            return updated
+        except Exception as e:
+            logger.error(f"Помилка пакетного запису активності: {e}")
+            return None
+
+    @_timed
+    async def get_habit_stats(self, habit_id: int) -> dict:
+        try:
+            row = await self.pool.fetchrow('''
+                SELECT s.current_streak, s.longest_streak, s.clean_days, s.total_days, h.cost_per_day,
+                       s.last_log_date::text, u.timezone
+                FROM habits h
+                LEFT JOIN habit_stats s ON s.habit_id = h.id
+                LEFT JOIN users u ON u.id = h.user_id
+                WHERE h.id = $1
+            ''', habit_id)
+            return habit_stats_from_row(*row) if row else empty_habit_stats()
+        except Exception as e:
+            logger.error(f"Помилка розрахунку статистики: {e}")
+            return empty_habit_stats()
+
+    @_timed
+    async def get_user_stats(self, user_id: int) -> dict:
+        try:
+            async with self.pool.acquire() as conn:
+                timezone = await _fetch_timezone(conn, user_id)
+                rows = await conn.fetch('''
+                    SELECT h.id, h.name, h.cost_per_day,
+                           s.current_streak, s.longest_streak, s.clean_days, s.total_days,
+                           s.last_log_date::text
+                    FROM habits h
+                    LEFT JOIN habit_stats s ON s.habit_id = h.id
+                    WHERE h.user_id = $1
+                    ORDER BY h.created_at DESC
+                ''', user_id)
+            return user_stats_from_rows(rows, timezone)
+        except Exception as e:
+            logger.error(f"Помилка отримання загальної статистики: {e}")
+            return {'habits': [], 'total': empty_total_stats()}
+
+    # Підсумки не залежать від активності серій, тож їх рахує сервер
+    @_timed
+    async def get_user_total_stats(self, user_id: int) -> dict:
+        try:
+            row = await self.pool.fetchrow('''
+                SELECT COUNT(*),
+                       COALESCE(SUM(s.total_days), 0),
+                       COALESCE(SUM(s.clean_days), 0),
+                       COALESCE(SUM(s.clean_days * COALESCE(h.cost_per_day, 0)), 0),
+                       COALESCE(AVG(s.clean_days * 100.0 / s.total_days) FILTER (WHERE s.total_days > 0), 0)
+                FROM habits h
+                LEFT JOIN habit_stats s ON s.habit_id = h.id
+                WHERE h.user_id = $1
+            ''', user_id)
+            return {
+                'total_habits': row[0],
+                'total_tracked_days': row[1],
+                'total_clean_days': row[2],
+                'total_money_saved': float(row[3]),
+                'average_success_rate': float(row[4])
+            }
+        except Exception as e:
+            logger.error(f"Помилка отримання загальної статистики: {e}")
+            return empty_total_stats()
+
+    @_timed
+    async def get_period_stats(self, user_id: int, start_date: str, end_date: str) -> dict:
+        period = {
+            'days': [],
+            'clean_count': 0,
+            'did_count': 0,
+            'money_saved': 0.0,
+            'success_rate': 0.0
+        }
+        try:
+            rows = await self.pool.fetch('''
+                SELECT l.date::text,
+                       COUNT(*) FILTER (WHERE NOT l.did_habit),
+                       COUNT(*) FILTER (WHERE l.did_habit),
+                       COALESCE(SUM(COALESCE(h.cost_per_day, 0)) FILTER (WHERE NOT l.did_habit), 0)
+                FROM habit_logs l
+                JOIN habits h ON h.id = l.habit_id
+                WHERE l.user_id = $1 AND l.date BETWEEN $2 AND $3
+                GROUP BY l.date
+                ORDER BY l.date
+            ''', user_id, date.fromisoformat(start_date), date.fromisoformat(end_date))
+
+            for log_date, clean_count, did_count, money_saved in rows:
+                period['days'].append({
+                    'date': log_date,
+                    'clean_count': clean_count,
+                    'did_count': did_count,
+                    'money_saved': money_saved
+                })
+                period['clean_count'] += clean_count
+                period['did_count'] += did_count
+                period['money_saved'] += money_saved
+
+            total = period['clean_count'] + period['did_count']
+            if total > 0:
+                period['success_rate'] = period['clean_count'] / total * 100
+            return period
+        except Exception as e:
+            logger.error(f"Помилка отримання статистики за період: {e}")
+            return period
+
+    # date - '0001-01-01' + 1 дає date.toordinal() прямо на сервері
+    @_timed
+    async def get_habit_log_series(self, habit_id: int) -> HabitLogSeries:
+        try:
+            rows = await self.pool.fetch('''
+                SELECT (date - DATE '0001-01-01') + 1, did_habit::int
+                FROM habit_logs WHERE habit_id = $1
+                ORDER BY date
+            ''', habit_id)
+            return HabitLogSeries.from_rows(rows)
+        except Exception as e:
+            logger.error(f"Помилка отримання історії звички: {e}")
+            return HabitLogSeries()
+
+    @_timed
+    async def get_user_achievements(self, user_id: int) -> List[Tuple[int, str, int]]:
+        try:
+            rows = await self.pool.fetch('''
+                SELECT h.id, h.name, a.milestone
+                FROM achievements a
+                JOIN habits h ON h.id = a.habit_id
+                WHERE a.user_id = $1
+                ORDER BY h.created_at DESC, a.milestone
+            ''', user_id)
+            return [tuple(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Помилка отримання досягнень: {e}")
+            return []
+
+    @_timed
+    async def pop_new_achievements(self, user_id: int) -> List[Tuple[int, int]]:
+        try:
+            rows = await self.pool.fetch('''
+                UPDATE achievements SET notified = TRUE
+                WHERE user_id = $1 AND NOT notified
+                RETURNING habit_id, milestone
+            ''', user_id)
+            return sorted(tuple(row) for row in rows)
+        except Exception as e:
+            logger.error(f"Помилка отримання нових досягнень: {e}")
+            return []
+
+    @_timed
+    async def get_user_goals(self, user_id: int) -> List[dict]:
+        try:
+            async with self.pool.acquire() as conn:
+                timezone = await _fetch_timezone(conn, user_id)
+                rows = await conn.fetch(GOALS_QUERY, user_id)
+            return [goal_from_row(row, timezone) for row in rows]
+        except Exception as e:
+            logger.error(f"Помилка отримання цілей: {e}")
+            return []
+
+    @_timed
+    async def set_habit_goal(self, user_id: int, habit_id: int, goal_days: int) -> Optional[date]:
+        try:
+            async with self.pool.acquire() as conn, conn.transaction():
+                owned = await conn.fetchval('''
+                    SELECT 1 FROM habits WHERE id = $1 AND user_id = $2 FOR UPDATE
+                ''', habit_id, user_id)
+                if not owned:
+                    logger.warning(f"Користувач {user_id} намагався змінити ціль чужої звички {habit_id}")
+                    return None
+
+                start_date = get_local_today(await _fetch_timezone(conn, user_id))
+                await _create_goal(conn, user_id, habit_id, goal_days, start_date)
+                await conn.execute('UPDATE habits SET goal_days = $1 WHERE id = $2', goal_days, habit_id)
+
+            return start_date + timedelta(days=goal_days - 1)
+        except Exception as e:
+            logger.error(f"Помилка встановлення цілі: {e}")
+            return None
+
+    @_timed
+    async def update_goal_statuses(self, today: str) -> Tuple[List[Tuple[int, str, int]], int]:
+        try:
+            day = date.fromisoformat(today)
+            async with self.pool.acquire() as conn, conn.transaction():
+                completed = await conn.fetch(f'''
+                    UPDATE user_goals AS g SET completed = TRUE
+                    FROM habit_stats s, habits h
+                    WHERE s.habit_id = g.habit_id AND h.id = g.habit_id
+                      AND g.end_date >= $1::date - 1 AND NOT g.completed AND NOT g.expired
+                      AND {GOAL_PROGRESS} >= g.goal_days
+                    RETURNING g.user_id, h.name, g.goal_days
+                ''', day)
+                status = await conn.execute('''
+                    UPDATE user_goals SET expired = TRUE
+                    WHERE end_date < $1::date - 1 AND NOT completed AND NOT expired
+                ''', day)
+
+            return [tuple(row) for row in completed], int(status.split()[-1])
+        except Exception as e:
+            logger.error(f"Помилка оновлення статусів цілей: {e}")
+            return [], 0
+
+    @_timed
+    async def get_reminder_timezones(self) -> List[str]:
+        try:
+            return [row[0] for row in await self.pool.fetch(TIMEZONES_QUERY)]
+        except Exception as e:
+            logger.error(f"Помилка отримання часових поясів: {e}")
+            return []
+
+    @_timed
+    async def get_users_to_remind(self, timezone: str, day: str, after_user_id: int = 0,
+                                  limit: int = 1000) -> List[int]:
+        try:
+            rows = await self.pool.fetch('''
+                SELECT u.id
+                FROM users u
+                WHERE u.timezone = $1 AND u.id > $2
+                  AND EXISTS (SELECT 1 FROM habits h WHERE h.user_id = u.id)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM habit_logs l
+                      WHERE l.user_id = u.id AND l.date = $3
+                  )
+                ORDER BY u.id
+                LIMIT $4
+            ''', timezone, after_user_id, date.fromisoformat(day), limit)
+            return [row[0] for row in rows]
+        except Exception as e:
+            logger.error(f"Помилка отримання користувачів для нагадування: {e}")
+            return []
@@ -0,0 +1,353 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from config import DB_EXECUTOR_WORKERS, LOG_BUFFER_ENABLED, LOG_BUFFER_INTERVAL, LOG_BUFFER_MAX_BATCH
+from database import database as db
+from utils.metrics import collect_shared, current_update, record_db_call
+from .backend import StorageBackend
+from .models import Habit, HabitLogSeries
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=DB_EXECUTOR_WORKERS,
+            thread_name_prefix='db'
+        )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def run_db(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(get_executor(), call)
+    finally:
+        record_db_call(func.__name__, time.perf_counter() - started)
+
+
+class LogWriteBuffer:
+    """Групує відмітки звичок різних користувачів в одну транзакцію.
+
+    Кожен, хто натиснув кнопку, чекає коміту свого пакета і отримує ту саму
+    статистику, що й від log_habit_activity, тож наступні читання вже бачать
+    запис. close() дописує все, що лишилось у черзі."""
+
+    def __init__(self, interval: float = LOG_BUFFER_INTERVAL, max_batch: int = LOG_BUFFER_MAX_BATCH):
+        self.interval = interval
+        self.max_batch = max_batch
+        self._pending: List[tuple] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._full.set()
+        await self._task
+        self._task = None
+
+    async def write(self, habit_id: int, user_id: int, did_habit: bool) -> Optional[dict]:
+        if self._task is None or self._closed:
+            return await run_db(db.log_habit_activity, habit_id, user_id, did_habit)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((habit_id, user_id, did_habit, current_update(), future))
+        self._wakeup.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+
+        started = time.perf_counter()
+        try:
+            return await future
+        finally:
+            record_db_call('log_habit_activity', time.perf_counter() - started)
+
+    async def _run(self):
+        while self._pending or not self._closed:
+            await self._wakeup.wait()
+            # Перша відмітка чекає кілька мілісекунд, поки підтягнуться інші
+            if len(self._pending) < self.max_batch and not self._closed:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            if len(self._pending) < self.max_batch and not self._closed:
+                self._full.clear()
+            if not self._pending and not self._closed:
+                self._wakeup.clear()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[tuple]):
+        entries = [(habit_id, user_id, did_habit) for habit_id, user_id, did_habit, _, _ in batch]
+        try:
+            with collect_shared([metrics for *_, metrics, _ in batch]):
+                results = await run_db(db.log_habit_activity_batch, entries)
+                if results is None:
+                    # Пакет відкотився - пишемо по одній, щоб збій одного запису не зачепив інших
+                    results = [await run_db(db.log_habit_activity, *entry) for entry in entries]
+        except Exception as e:
+            logger.error(f"Помилка запису пакета відміток: {e}")
+            results = [None] * len(batch)
+
+        for (*_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class SQLiteBackend(StorageBackend):
+    """Бекенд за замовчуванням: синхронні функції database.database у пулі потоків."""
+
+    def __init__(self):
+        self.log_buffer: Optional[LogWriteBuffer] = None
+
+    async def initialize(self):
+        if LOG_BUFFER_ENABLED:
+            self.log_buffer = LogWriteBuffer()
+            self.log_buffer.start()
+
+    async def close(self):
+        if self.log_buffer is not None:
+            await self.log_buffer.close()
+            self.log_buffer = None
+
+    async def add_user(self, user_id: int, username: str = None) -> bool:
+        return await run_db(db.add_user, user_id, username)
+
+    async def add_habit(self, user_id: int, name: str, cost_per_day: float = 0, frequency_per_day: int = 1) -> Optional[Habit]:
+        return await run_db(db.add_habit, user_id, name, cost_per_day, frequency_per_day)
+
+    async def get_user_habits(self, user_id: int) -> List[Habit]:
+        return await run_db(db.get_user_habits, user_id)
+
+    async def get_habit(self, user_id: int, habit_id: int) -> Optional[Habit]:
+        return await run_db(db.get_habit, user_id, habit_id)
+
+    async def get_habit_details(self, user_id: int, habit_id: int) -> Optional[Tuple[Habit, dict]]:
+        return await run_db(db.get_habit_details, user_id, habit_id)
+
+    async def log_habit_activity(self, habit_id: int, user_id: int, did_habit: bool) -> Optional[dict]:
+        if self.log_buffer is not None:
+            return await self.log_buffer.write(habit_id, user_id, did_habit)
+        return await run_db(db.log_habit_activity, habit_id, user_id, did_habit)
+
+    async def log_habit_activities(self, user_id: int, entries: List[Tuple[int, int, bool]],
+                                   replace: bool = False) -> Optional[List[dict]]:
+        return await run_db(db.log_habit_activities, user_id, entries, replace)
+
+    async def get_habit_stats(self, habit_id: int) -> dict:
+        return await run_db(db.get_habit_stats, habit_id)
+
+    async def get_user_total_stats(self, user_id: int) -> dict:
+        return await run_db(db.get_user_total_stats, user_id)
+
+    async def get_user_stats(self, user_id: int) -> dict:
+        return await run_db(db.get_user_stats, user_id)
+
+    async def get_user_habits_page(self, user_id: int, after_id: Optional[int] = None,
+                                   before_id: Optional[int] = None) -> dict:
+        return await run_db(db.get_user_habits_page, user_id, after_id, before_id)
+
+    async def get_user_timezone(self, user_id: int) -> str:
+        return await run_db(db.get_user_timezone, user_id)
+
+    async def set_user_timezone(self, user_id: int, timezone: str) -> bool:
+        return await run_db(db.set_user_timezone, user_id, timezone)
+
+    async def get_habit_log_series(self, habit_id: int) -> HabitLogSeries:
+        return await run_db(db.get_habit_log_series, habit_id)
+
+    async def get_user_achievements(self, user_id: int) -> List[Tuple[int, str, int]]:
+        return await run_db(db.get_user_achievements, user_id)
+
+    async def pop_new_achievements(self, user_id: int) -> List[Tuple[int, int]]:
+        return await run_db(db.pop_new_achievements, user_id)
+
+    async def get_user_goals(self, user_id: int) -> List[dict]:
+        return await run_db(db.get_user_goals, user_id)
+
+    async def set_habit_goal(self, user_id: int, habit_id: int, goal_days: int) -> Optional[date]:
+        return await run_db(db.set_habit_goal, user_id, habit_id, goal_days)
+
+    async def update_goal_statuses(self, today: str) -> Tuple[List[Tuple[int, str, int]], int]:
+        return await run_db(db.update_goal_statuses, today)
+
+    async def get_period_stats(self, user_id: int, start_date: str, end_date: str) -> dict:
+        return await run_db(db.get_period_stats, user_id, start_date, end_date)
+
+    async def get_reminder_timezones(self) -> List[str]:
+        return await run_db(db.get_reminder_timezones)
+
+    async def get_users_to_remind(self, timezone: str, day: str, after_user_id: int = 0, limit: int = 1000) -> List[int]:
+        return await run_db(db.get_users_to_remind, timezone, day, after_user_id, limit)
+
+
+_backend: StorageBackend = SQLiteBackend()
+
+
+def get_backend() -> StorageBackend:
+    return _backend
+
+
+def configure_backend(url: Optional[str] = None) -> StorageBackend:
+    global _backend
+    if url and url.startswith(('postgres://', 'postgresql://')):
+        # asyncpg потрібен лише для PostgreSQL, тож імпортуємо його тут
+        from .postgres import PostgresBackend
+        _backend = PostgresBackend(url)
+    else:
+        _backend = SQLiteBackend()
+    return _backend
+
+
+async def initialize_backend():
+    await _backend.initialize()
+
+
+async def close_backend():
+    await _backend.close()
+
+
+async def add_user(user_id: int, username: str = None) -> bool:
+    return await _backend.add_user(user_id, username)
+
+
+async def add_habit(user_id: int, name: str, cost_per_day: float = 0, frequency_per_day: int = 1) -> Optional[Habit]:
+    return await _backend.add_habit(user_id, name, cost_per_day, frequency_per_day)
+
+
+async def get_user_habits(user_id: int) -> List[Habit]:
+    return await _backend.get_user_habits(user_id)
+
+
+async def get_habit(user_id: int, habit_id: int) -> Optional[Habit]:
+    return await _backend.get_habit(user_id, habit_id)
+
+
+async def get_habit_details(user_id: int, habit_id: int) -> Optional[Tuple[Habit, dict]]:
+    return await _backend.get_habit_details(user_id, habit_id)
+
+
+async def log_habit_activity(habit_id: int, user_id: int, did_habit: bool) -> Optional[dict]:
+    return await _backend.log_habit_activity(habit_id, user_id, did_habit)
+
+
+async def log_habit_activities(user_id: int, entries: List[Tuple[int, int, bool]],
+                               replace: bool = False) -> Optional[List[dict]]:
+    return await _backend.log_habit_activities(user_id, entries, replace)
+
+
+async def get_habit_stats(habit_id: int) -> dict:
+    return await _backend.get_habit_stats(habit_id)
+
+
+async def get_user_total_stats(user_id: int) -> dict:
+    return await _backend.get_user_total_stats(user_id)
+
+
+async def get_user_stats(user_id: int) -> dict:
+    return await _backend.get_user_stats(user_id)
+
+
+async def get_user_habits_page(user_id: int, after_id: Optional[int] = None,
+                               before_id: Optional[int] = None) -> dict:
+    return await _backend.get_user_habits_page(user_id, after_id, before_id)
+
+
+async def get_user_timezone(user_id: int) -> str:
+    return await _backend.get_user_timezone(user_id)
+
+
+async def set_user_timezone(user_id: int, timezone: str) -> bool:
+    return await _backend.set_user_timezone(user_id, timezone)
+
+
+async def get_habit_log_series(habit_id: int) -> HabitLogSeries:
+    return await _backend.get_habit_log_series(habit_id)
+
+
+async def get_user_achievements(user_id: int) -> List[Tuple[int, str, int]]:
+    return await _backend.get_user_achievements(user_id)
+
+
+async def pop_new_achievements(user_id: int) -> List[Tuple[int, int]]:
+    return await _backend.pop_new_achievements(user_id)
+
+
+async def get_user_goals(user_id: int) -> List[dict]:
+    return await _backend.get_user_goals(user_id)
+
+
+async def set_habit_goal(user_id: int, habit_id: int, goal_days: int) -> Optional[date]:
+    return await _backend.set_habit_goal(user_id, habit_id, goal_days)
+
+
+async def update_goal_statuses(today: str) -> Tuple[List[Tuple[int, str, int]], int]:
+    return await _backend.update_goal_statuses(today)
+
+
+async def get_period_stats(user_id: int, start_date: str, end_date: str) -> dict:
+    return await _backend.get_period_stats(user_id, start_date, end_date)
+
+
+async def get_reminder_timezones() -> List[str]:
+    return await _backend.get_reminder_timezones()
+
+
+async def get_users_to_remind(timezone: str, day: str, after_user_id: int = 0, limit: int = 1000) -> List[int]:
+    return await _backend.get_users_to_remind(timezone, day, after_user_id, limit)
+
+
+# Стан розмов та кеш графіків завжди локальні, незалежно від бекенду
+async def get_chart_file_id(cache_key: str) -> Optional[str]:
+    return await run_db(db.get_chart_file_id, cache_key)
+
+
+async def save_chart_file_id(habit_id: int, cache_key: str, file_id: str) -> bool:
+    return await run_db(db.save_chart_file_id, habit_id, cache_key, file_id)
+
+
+async def load_persisted_user_data(user_id: Optional[int] = None) -> Dict[int, dict]:
+    return await run_db(db.load_persisted_user_data, user_id)
+
+
+async def load_persisted_conversations(name: str) -> Dict[tuple, object]:
+    return await run_db(db.load_persisted_conversations, name)
+
+
+async def save_persisted_state(user_data: Dict[int, Optional[str]],
+                               conversations: Dict[Tuple[str, str], Optional[str]]) -> bool:
+    return await run_db(db.save_persisted_state, user_data, conversations)
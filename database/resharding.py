@@ -0,0 +1,92 @@
+import logging
+import os
+import sqlite3
+from typing import Dict, List
+
+from . import migrations
+from .pool import ConnectionPool
+from .shards import AUTOINCREMENT_TABLES, ID_RANGE_BITS, USER_TABLES, reserve_id_range, shard_for_user, shard_path
+
+logger = logging.getLogger(__name__)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> str:
+    return ', '.join(row[1] for row in conn.execute(f'PRAGMA main.table_info({table})'))
+
+
+def _next_block(sources: List[str]) -> int:
+    # Перший блок id, вищий за всі вже видані, - щоб нові шарди не перетнулися зі старими рядками
+    highest = 0
+    for source in sources:
+        conn = sqlite3.connect(source)
+        try:
+            highest = max(highest, conn.execute('SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence').fetchone()[0])
+            for table in AUTOINCREMENT_TABLES:
+                highest = max(highest, conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0])
+        finally:
+            conn.close()
+    return (highest >> ID_RANGE_BITS) + 1
+
+
+def _copy_shard(source: str, targets: List[str], copied: Dict[str, int]):
+    conn = sqlite3.connect(source, isolation_level=None)
+    conn.create_function(
+        'target_shard', 1, lambda user_id: shard_for_user(user_id, len(targets)), deterministic=True
+    )
+    try:
+        for index, target in enumerate(targets):
+            conn.execute('ATTACH DATABASE ? AS target', (target,))
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                for table, owner in USER_TABLES.items():
+                    columns = _columns(conn, table)
+                    cursor = conn.execute(f'''
+                        INSERT INTO target.{table} ({columns})
+                        SELECT {columns} FROM main.{table} WHERE target_shard({owner}) = ?
+                    ''', (index,))
+                    copied[table] += cursor.rowcount
+                # file_id графіків дійсні для будь-якого шарду
+                conn.execute('INSERT OR IGNORE INTO target.chart_files SELECT * FROM main.chart_files')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.execute('DETACH DATABASE target')
+    finally:
+        conn.close()
+
+
+def reshard(source_count: int, target_count: int, path: str = None) -> Dict[str, int]:
+    sources = [shard_path(index, source_count, path) for index in range(source_count)]
+    targets = [shard_path(index, target_count, path) for index in range(target_count)]
+
+    missing = [source for source in sources if not os.path.exists(source)]
+    if missing:
+        raise FileNotFoundError(', '.join(missing))
+    existing = [target for target in targets if os.path.exists(target)]
+    if existing:
+        raise FileExistsError(', '.join(existing))
+
+    for source in sources:
+        pool = ConnectionPool(source, size=1)
+        try:
+            migrations.run_migrations(pool.connection)
+        finally:
+            pool.close()
+
+    block = _next_block(sources)
+    for index, target in enumerate(targets):
+        pool = ConnectionPool(target, size=1)
+        try:
+            migrations.run_migrations(pool.connection)
+            with pool.connection(immediate=True) as conn:
+                reserve_id_range(conn.cursor(), block + index)
+        finally:
+            pool.close()
+
+    copied = {table: 0 for table in USER_TABLES}
+    for source in sources:
+        _copy_shard(source, targets, copied)
+        logger.info(f"Перенесено {source}")
+    return copied
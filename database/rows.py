@@ -0,0 +1,126 @@
+from datetime import date, timedelta
+from typing import Optional
+
+from utils.helpers import get_local_today
+
+# Перетворення рядків запитів на структури, які віддають обидва бекенди:
+# SQLite (database.database) і PostgreSQL (database.postgres)
+
+
+def empty_habit_stats() -> dict:
+    return {
+        'streak': 0,
+        'longest_streak': 0,
+        'clean_days': 0,
+        'total_days': 0,
+        'money_saved': 0.0,
+        'success_rate': 0.0,
+        'last_log_date': None
+    }
+
+
+def is_streak_active(last_log_date: Optional[str], timezone: Optional[str]) -> bool:
+    if last_log_date is None:
+        return False
+    yesterday = get_local_today(timezone) - timedelta(days=1)
+    return last_log_date >= yesterday.isoformat()
+
+
+def habit_stats_from_row(current_streak, longest_streak, clean_days, total_days, cost_per_day,
+                         last_log_date=None, timezone=None) -> dict:
+    clean_days = clean_days or 0
+    total_days = total_days or 0
+    if not is_streak_active(last_log_date, timezone):
+        current_streak = 0
+    return {
+        'streak': current_streak or 0,
+        'longest_streak': longest_streak or 0,
+        'clean_days': clean_days,
+        'total_days': total_days,
+        'money_saved': clean_days * (cost_per_day or 0),
+        'success_rate': (clean_days / total_days * 100) if total_days > 0 else 0,
+        'last_log_date': last_log_date
+    }
+
+
+def empty_total_stats() -> dict:
+    return {
+        'total_habits': 0,
+        'total_tracked_days': 0,
+        'total_clean_days': 0,
+        'total_money_saved': 0.0,
+        'average_success_rate': 0.0
+    }
+
+
+# Рядки (id, назва, вартість, серія, найдовша, чисті дні, всього днів, останній запис)
+def habit_summary_from_row(row, timezone: Optional[str]) -> dict:
+    habit_id, name, cost_per_day, current_streak, longest_streak, clean_days, total_days, last_log_date = row
+    stats = habit_stats_from_row(
+        current_streak, longest_streak, clean_days, total_days, cost_per_day, last_log_date, timezone
+    )
+    stats.update(habit_id=habit_id, name=name, cost_per_day=cost_per_day)
+    return stats
+
+
+def user_stats_from_rows(rows, timezone: Optional[str]) -> dict:
+    habits = []
+    total = empty_total_stats()
+    success_rates = []
+    
+    for row in rows:
+        stats = habit_summary_from_row(row, timezone)
+        habits.append(stats)
+        
+        total['total_tracked_days'] += stats['total_days']
+        total['total_clean_days'] += stats['clean_days']
+        total['total_money_saved'] += stats['money_saved']
+        if stats['total_days'] > 0:
+            success_rates.append(stats['success_rate'])
+    
+    total['total_habits'] = len(habits)
+    if success_rates:
+        total['average_success_rate'] = sum(success_rates) / len(success_rates)
+    return {'habits': habits, 'total': total}
+
+
+# rows - до limit + 1 рядків у порядку запиту; зайвий рядок означає, що далі є ще сторінка
+def habits_page_from_rows(rows, limit: int, after_id: Optional[int], before_id: Optional[int],
+                          timezone: Optional[str]) -> dict:
+    page = {'habits': [], 'prev_id': None, 'next_id': None}
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+    if before_id is not None:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after_id is not None, has_more
+    
+    page['habits'] = [habit_summary_from_row(row, timezone) for row in rows]
+    if rows:
+        page['prev_id'] = rows[0][0] if has_prev else None
+        page['next_id'] = rows[-1][0] if has_next else None
+    return page
+
+
+def goal_from_row(row, timezone: Optional[str]) -> dict:
+    (habit_id, name, goal_days, start_date, end_date, completed, expired,
+     current_streak, last_log_date, progress) = row
+    if completed:
+        status, progress = 'completed', goal_days
+    elif expired:
+        status = 'expired'
+    else:
+        status = 'active'
+        # Перервана серія вже не рахується, хоч habit_stats її ще пам'ятає
+        if not is_streak_active(last_log_date, timezone):
+            progress = 0
+    return {
+        'habit_id': habit_id,
+        'name': name,
+        'goal_days': goal_days,
+        'start_date': date.fromisoformat(start_date),
+        'end_date': date.fromisoformat(end_date),
+        'status': status,
+        'progress': min(progress or 0, goal_days)
+    }
@@ -0,0 +1,77 @@
+import contextvars
+import os
+import zlib
+from contextlib import contextmanager
+from typing import Optional
+
+import config
+
+# Кожен шард видає id зі свого блоку, тож рядки різних шардів можна
+# злити в один файл (reshard) без конфліктів первинних ключів
+ID_RANGE_BITS = 40
+AUTOINCREMENT_TABLES = ('habits', 'habit_logs', 'user_goals')
+
+# Таблиці з даними користувача та вираз, що дає власника рядка
+USER_TABLES = {
+    'users': 'id',
+    'habits': 'user_id',
+    'habit_logs': 'user_id',
+    'user_goals': 'user_id',
+    'habit_stats': 'user_id',
+    'user_daily_stats': 'user_id',
+    'achievements': 'user_id',
+    'persisted_user_data': 'user_id',
+    # Ключ розмови - JSON [chat_id, user_id]
+    'persisted_conversations': "json_extract(key, '$[#-1]')",
+}
+
+_process_shard = config.SHARD_INDEX
+_current: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar('db_shard', default=None)
+
+
+def shard_for_user(user_id: int, count: int = None) -> int:
+    count = count or config.SHARD_COUNT
+    if count == 1:
+        return 0
+    return zlib.crc32(str(user_id).encode()) % count
+
+
+def shard_path(index: int, count: int = None, path: str = None) -> str:
+    count = count or config.SHARD_COUNT
+    path = path or config.DATABASE_FILE
+    if count == 1:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}.shard{index}of{count}{ext}"
+
+
+def set_process_shard(index: int):
+    global _process_shard
+    _process_shard = index
+
+
+def current_shard() -> int:
+    index = _current.get()
+    return _process_shard if index is None else index
+
+
+@contextmanager
+def use_shard(index: int):
+    token = _current.set(index)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def reserve_id_range(cursor, block: int):
+    # Нові id починаються не нижче початку блоку; вже видані не чіпаємо
+    start = block << ID_RANGE_BITS
+    if not start:
+        return
+    for table in AUTOINCREMENT_TABLES:
+        cursor.execute('UPDATE sqlite_sequence SET seq = ? WHERE name = ? AND seq < ?', (start, table, start))
+        cursor.execute('''
+            INSERT INTO sqlite_sequence (name, seq)
+            SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)
+        ''', (table, start, table))
@@ -0,0 +1,298 @@
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from . import achievements
+
+# Для кожної звички зберігаємо підсумки по всій історії та окремо "базу" -
+# значення серій до останнього дня. Це дозволяє перезаписати останній день
+# (INSERT OR REPLACE за ту ж дату) без повного перерахунку.
+STATS_COLUMNS = (
+    'current_streak', 'longest_streak', 'clean_days', 'total_days',
+    'last_log_date', 'last_did_habit', 'base_streak', 'base_longest'
+)
+
+
+def create_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS habit_stats (
+            habit_id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            current_streak INTEGER DEFAULT 0,
+            longest_streak INTEGER DEFAULT 0,
+            clean_days INTEGER DEFAULT 0,
+            total_days INTEGER DEFAULT 0,
+            last_log_date DATE,
+            last_did_habit BOOLEAN,
+            base_streak INTEGER DEFAULT 0,
+            base_longest INTEGER DEFAULT 0,
+            FOREIGN KEY (habit_id) REFERENCES habits (id)
+        )
+    ''')
+
+
+def compute_stats(rows: Iterable[Tuple[str, bool]]) -> dict:
+    stats = dict.fromkeys(STATS_COLUMNS, 0)
+    stats['last_log_date'] = None
+    stats['last_did_habit'] = None
+
+    for log_date, did_habit in rows:
+        stats['base_streak'] = _carried_streak(stats, log_date)
+        stats['base_longest'] = stats['longest_streak']
+        _apply_day(stats, bool(did_habit))
+        stats['total_days'] += 1
+        stats['last_log_date'] = log_date
+
+    return stats
+
+
+def is_next_day(previous_date: Optional[str], log_date: str) -> bool:
+    if previous_date is None:
+        return False
+    return date.fromisoformat(previous_date) + timedelta(days=1) == date.fromisoformat(log_date)
+
+
+def _carried_streak(stats: dict, log_date: str) -> int:
+    if is_next_day(stats['last_log_date'], log_date):
+        return stats['current_streak']
+    return 0
+
+
+def _apply_day(stats: dict, did_habit: bool):
+    stats['current_streak'] = 0 if did_habit else stats['base_streak'] + 1
+    stats['longest_streak'] = max(stats['base_longest'], stats['current_streak'])
+    stats['last_did_habit'] = did_habit
+    if not did_habit:
+        stats['clean_days'] += 1
+
+
+def _load(cursor, habit_id: int) -> Optional[dict]:
+    cursor.execute(f'''
+        SELECT {', '.join(STATS_COLUMNS)} FROM habit_stats WHERE habit_id = ?
+    ''', (habit_id,))
+    row = cursor.fetchone()
+    return dict(zip(STATS_COLUMNS, row)) if row else None
+
+
+def _save(cursor, habit_id: int, user_id: int, stats: dict):
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO habit_stats (habit_id, user_id, {', '.join(STATS_COLUMNS)})
+        VALUES (?, ?, {', '.join('?' * len(STATS_COLUMNS))})
+    ''', (habit_id, user_id, *(stats[column] for column in STATS_COLUMNS)))
+
+
+def write_log(cursor, habit_id: int, user_id: int, log_date: str, did_habit: bool) -> dict:
+    return write_logs(cursor, user_id, [(habit_id, log_date, did_habit)])[habit_id]
+
+
+def write_logs(cursor, user_id: int, entries: Iterable[Tuple[int, str, bool]],
+               replace: bool = True) -> Dict[int, dict]:
+    # Пізніший запис за ту ж звичку й дату перекриває попередній. З replace=False
+    # наявні в базі відмітки лишаються як є, пишуться лише відсутні дні
+    logs = {(habit_id, log_date): did_habit for habit_id, log_date, did_habit in entries}
+    if not logs:
+        return {}
+    habit_ids = sorted({habit_id for habit_id, _ in logs})
+    dates = [log_date for _, log_date in logs]
+
+    cursor.execute(f'''
+        SELECT habit_id, date, did_habit FROM habit_logs
+        WHERE habit_id IN ({', '.join('?' * len(habit_ids))}) AND date BETWEEN ? AND ?
+    ''', (*habit_ids, min(dates), max(dates)))
+    previous = {(habit_id, log_date): did_habit for habit_id, log_date, did_habit in cursor.fetchall()}
+
+    if not replace:
+        logs = {key: did_habit for key, did_habit in logs.items() if key not in previous}
+        if not logs:
+            return {}
+        habit_ids = sorted({habit_id for habit_id, _ in logs})
+
+    cursor.executemany('''
+        INSERT OR REPLACE INTO habit_logs (habit_id, user_id, date, did_habit)
+        VALUES (?, ?, ?, ?)
+    ''', [(habit_id, user_id, log_date, did_habit) for (habit_id, log_date), did_habit in logs.items()])
+    _update_daily_rollup(cursor, user_id, habit_ids, [
+        (habit_id, log_date, previous.get((habit_id, log_date)), did_habit)
+        for (habit_id, log_date), did_habit in logs.items()
+    ])
+
+    results = {}
+    for habit_id in habit_ids:
+        habit_logs = [(log_date, did_habit) for (log_id, log_date), did_habit in logs.items() if log_id == habit_id]
+        stats = _load(cursor, habit_id)
+        previous_longest = stats['longest_streak'] if stats else 0
+
+        # Один запис не раніше за останній день рахуємо інкрементально,
+        # все інше (минулі дати, кілька днів одразу) - перерахунком
+        if stats is not None and len(habit_logs) == 1 and (
+                stats['last_log_date'] is None or habit_logs[0][0] >= stats['last_log_date']):
+            log_date, did_habit = habit_logs[0]
+            _advance(stats, log_date, did_habit, previous.get((habit_id, log_date)))
+            _save(cursor, habit_id, user_id, stats)
+        else:
+            stats = rebuild_habit(cursor, habit_id, user_id)
+
+        achievements.unlock(cursor, habit_id, user_id, previous_longest, stats['longest_streak'])
+        results[habit_id] = stats
+
+    return results
+
+
+def _advance(stats: dict, log_date: str, did_habit: bool, previous_did):
+    last_log_date = stats['last_log_date']
+    if last_log_date is None or log_date > last_log_date:
+        stats['base_streak'] = _carried_streak(stats, log_date)
+        stats['base_longest'] = stats['longest_streak']
+        stats['total_days'] += 1
+    elif previous_did is not None and not previous_did:
+        stats['clean_days'] -= 1
+    elif previous_did is None:
+        stats['total_days'] += 1
+
+    _apply_day(stats, bool(did_habit))
+    stats['last_log_date'] = log_date
+
+
+def _query_stats(cursor, habit_id: int) -> dict:
+    stats = dict.fromkeys(STATS_COLUMNS, 0)
+
+    cursor.execute('''
+        SELECT COUNT(*), COALESCE(SUM(NOT did_habit), 0), MAX(date)
+        FROM habit_logs WHERE habit_id = ?
+    ''', (habit_id,))
+    stats['total_days'], stats['clean_days'], last_log_date = cursor.fetchone()
+    stats['last_log_date'] = last_log_date
+    stats['last_did_habit'] = None
+    if last_log_date is None:
+        return stats
+
+    cursor.execute(
+        'SELECT did_habit FROM habit_logs WHERE habit_id = ? AND date = ?',
+        (habit_id, last_log_date)
+    )
+    last_did_habit = bool(cursor.fetchone()[0])
+    stats['last_did_habit'] = last_did_habit
+
+    # Серії чистих днів поспіль: у межах серії julianday(date) - номер рядка
+    # однаковий, тож кожна група - це одна серія без пропусків
+    cursor.execute('''
+        WITH clean AS (
+            SELECT date, julianday(date) - ROW_NUMBER() OVER (ORDER BY date) AS grp
+            FROM habit_logs
+            WHERE habit_id = ? AND did_habit = 0
+        )
+        SELECT MAX(date) AS end_date, COUNT(*) AS length
+        FROM clean
+        GROUP BY grp
+        ORDER BY end_date
+    ''', (habit_id,))
+    runs = cursor.fetchall()
+    lengths = [length for _, length in runs]
+
+    if last_did_habit:
+        previous_day = (date.fromisoformat(last_log_date) - timedelta(days=1)).isoformat()
+        stats['current_streak'] = 0
+        stats['base_streak'] = runs[-1][1] if runs and runs[-1][0] == previous_day else 0
+        stats['longest_streak'] = max(lengths, default=0)
+        stats['base_longest'] = stats['longest_streak']
+    else:
+        stats['current_streak'] = runs[-1][1]
+        stats['base_streak'] = stats['current_streak'] - 1
+        stats['longest_streak'] = max(lengths)
+        stats['base_longest'] = max(lengths[:-1] + [stats['base_streak']])
+
+    return stats
+
+
+def rebuild_habit(cursor, habit_id: int, user_id: int = None) -> dict:
+    if user_id is None:
+        cursor.execute('SELECT user_id FROM habits WHERE id = ?', (habit_id,))
+        row = cursor.fetchone()
+        user_id = row[0] if row else None
+
+    stats = _query_stats(cursor, habit_id)
+    _save(cursor, habit_id, user_id, stats)
+    return stats
+
+
+def rebuild_all(cursor) -> int:
+    cursor.execute('DELETE FROM habit_stats')
+    cursor.execute('SELECT id, user_id FROM habits')
+    habits = cursor.fetchall()
+    for habit_id, user_id in habits:
+        rebuild_habit(cursor, habit_id, user_id)
+    return len(habits)
+
+
+def find_mismatches(cursor) -> list:
+    cursor.execute('SELECT id FROM habits')
+    mismatched = []
+    for (habit_id,) in cursor.fetchall():
+        cursor.execute('''
+            SELECT date, did_habit FROM habit_logs
+            WHERE habit_id = ?
+            ORDER BY date
+        ''', (habit_id,))
+        expected = compute_stats(cursor.fetchall())
+        # Рядок з'являється лише з першим записом: без нього звичка має нульові підсумки
+        stored = _load(cursor, habit_id) or compute_stats([])
+        if stored['last_did_habit'] is not None:
+            stored['last_did_habit'] = bool(stored['last_did_habit'])
+        if stored != expected:
+            mismatched.append(habit_id)
+    return mismatched
+
+
+def create_daily_rollup_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_daily_stats (
+            user_id INTEGER,
+            date DATE,
+            clean_count INTEGER DEFAULT 0,
+            did_count INTEGER DEFAULT 0,
+            money_saved REAL DEFAULT 0,
+            PRIMARY KEY (user_id, date)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _update_daily_rollup(cursor, user_id: int, habit_ids: list, changes: Iterable[tuple]):
+    changes = [change for change in changes if change[2] is None or bool(change[2]) != bool(change[3])]
+    if not changes:
+        return
+
+    cursor.execute(f'''
+        SELECT id, cost_per_day FROM habits WHERE id IN ({', '.join('?' * len(habit_ids))})
+    ''', habit_ids)
+    costs = {habit_id: cost_per_day or 0 for habit_id, cost_per_day in cursor.fetchall()}
+
+    deltas = {}
+    for habit_id, log_date, previous_did, did_habit in changes:
+        clean_delta = (0 if did_habit else 1) - (1 if previous_did is not None and not previous_did else 0)
+        did_delta = (1 if did_habit else 0) - (1 if previous_did else 0)
+        day = deltas.setdefault(log_date, [0, 0, 0.0])
+        day[0] += clean_delta
+        day[1] += did_delta
+        day[2] += clean_delta * costs.get(habit_id, 0)
+
+    cursor.executemany('''
+        INSERT INTO user_daily_stats (user_id, date, clean_count, did_count, money_saved)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, date) DO UPDATE SET
+            clean_count = clean_count + excluded.clean_count,
+            did_count = did_count + excluded.did_count,
+            money_saved = money_saved + excluded.money_saved
+    ''', [(user_id, log_date, *day) for log_date, day in deltas.items()])
+
+
+def rebuild_daily_rollup(cursor):
+    cursor.execute('DELETE FROM user_daily_stats')
+    cursor.execute('''
+        INSERT INTO user_daily_stats (user_id, date, clean_count, did_count, money_saved)
+        SELECT l.user_id, l.date,
+               SUM(NOT l.did_habit),
+               SUM(l.did_habit),
+               SUM(CASE WHEN l.did_habit THEN 0 ELSE COALESCE(h.cost_per_day, 0) END)
+        FROM habit_logs l
+        JOIN habits h ON h.id = l.habit_id
+        GROUP BY l.user_id, l.date
+    ''')
@@ -1,45 +1,72 @@
 import logging
+from datetime import datetime, timedelta, timezone
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes, ConversationHandler
+from telegram.ext import ContextTypes, ConversationHandler, JobQueue
 
-from database.database import add_habit, get_user_habits, log_habit_activity, get_habit_stats
-from utils.messages import ADD_HABIT_MESSAGES, HABIT_MESSAGES
-from utils.keyboards import get_habits_keyboard, get_habit_actions_keyboard
+from config import HABIT_NAME_LENGTH, BACKFILL_MAX_DAYS, GOAL_OPTIONS, ITEMS_PER_PAGE
+from database.repository import (
+    add_habit, get_user_habits, get_user_habits_page, get_habit_details, log_habit_activity,
+    log_habit_activities, get_user_goals, set_habit_goal, update_goal_statuses
+)
+from utils.dispatcher import enqueue_message, PRIORITY_NORMAL
+from utils.helpers import fit_message, truncate_text
+from utils.messages import ADD_HABIT_MESSAGES, HABIT_MESSAGES, GOAL_COMPLETED_MESSAGE
+from utils.keyboards import (
+    get_habits_keyboard, get_habit_actions_keyboard, get_batch_log_keyboard, get_goals_keyboard,
+    get_goal_days_keyboard
+)
+from handlers.stats import notify_new_achievements
 
 logger = logging.getLogger(__name__)
 
 HABIT_NAME, HABIT_COST, HABIT_FREQUENCY = range(3)
 
+BATCH_LOG_KEY = 'batch_log'
+
 
 async def show_habits(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    habits = get_user_habits(user_id)
+    page = await get_user_habits_page(user_id)
     
-    if not habits:
+    if not page['habits']:
         await update.message.reply_text(
             "У вас поки немає збережених звичок.\n"
             "Використайте команду /add_habit щоб додати першу звичку!"
         )
         return
     
-    text = "Ваші шкідливі звички:\n\n"
-    
-    for habit in habits:
-        stats = get_habit_stats(habit.id)
-        text += f"• {habit.name}\n"
-        text += f"  Вартість: {habit.cost_per_day} грн/день\n"
-        text += f"  Поточна серія: {stats['streak']} днів\n"
-        text += f"  Заощаджено: {stats['money_saved']:.2f} грн\n\n"
+    await update.message.reply_text(
+        render_habits_page(page),
+        reply_markup=get_habits_keyboard(page['habits'], page['prev_id'], page['next_id'])
+    )
+
+
+async def show_habits_page(query, after_id: int = None, before_id: int = None):
+    page = await get_user_habits_page(query.from_user.id, after_id, before_id)
     
-    keyboard = get_habits_keyboard(habits)
+    if not page['habits']:
+        await query.edit_message_text("Звички не знайдено")
+        return
     
-    await update.message.reply_text(
-        text,
-        reply_markup=keyboard,
-        parse_mode='HTML'
+    await query.edit_message_text(
+        render_habits_page(page),
+        reply_markup=get_habits_keyboard(page['habits'], page['prev_id'], page['next_id'])
     )
 
 
+def render_habits_page(page: dict) -> str:
+    blocks = []
+    for habit in page['habits']:
+        blocks.append(
+            f"• {truncate_text(habit['name'], HABIT_NAME_LENGTH)}\n"
+            f"  Вартість: {habit['cost_per_day']} грн/день\n"
+            f"  Поточна серія: {habit['streak']} днів\n"
+            f"  Заощаджено: {habit['money_saved']:.2f} грн\n\n"
+        )
+    return fit_message("Ваші шкідливі звички:\n\n", blocks)
+
+
 async def add_habit_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(ADD_HABIT_MESSAGES['name'])
     return HABIT_NAME
@@ -68,7 +95,7 @@ async def get_habit_frequency(update: Update, context: ContextTypes.DEFAULT_TYPE
     try:
         frequency = int(update.message.text)
         
-        habit = add_habit(
+        habit = await add_habit(
             user_id=update.effective_user.id,
             name=context.user_data['habit_name'],
             cost_per_day=context.user_data['habit_cost'],
@@ -116,6 +143,25 @@ async def handle_habit_action(update: Update, context: ContextTypes.DEFAULT_TYPE
     elif data.startswith("clean_"):
         habit_id = int(data.replace("clean_", ""))
         await log_habit_clean(query, habit_id)
+    elif data == "logall":
+        await start_batch_log(query.from_user.id, query.edit_message_text, context, [0])
+    elif data.startswith("batch_"):
+        await handle_batch_log(query, context, data.replace("batch_", ""))
+    elif data == "goals":
+        await show_goals(query.from_user.id, query.edit_message_text)
+    elif data.startswith("goalset_"):
+        habit_id, goal_days = map(int, data.replace("goalset_", "").split("_"))
+        await save_goal(query, habit_id, goal_days)
+    elif data.startswith("goal_"):
+        habit_id = int(data.replace("goal_", ""))
+        await query.edit_message_text(
+            "Скільки днів поспіль без звички ставимо за ціль?",
+            reply_markup=get_goal_days_keyboard(habit_id, GOAL_OPTIONS)
+        )
+    elif data.startswith("page_next_"):
+        await show_habits_page(query, after_id=int(data.replace("page_next_", "")))
+    elif data.startswith("page_prev_"):
+        await show_habits_page(query, before_id=int(data.replace("page_prev_", "")))
     elif data == "add":
         await query.edit_message_text(
             "Для додавання нової звички використайте команду /add_habit"
@@ -123,16 +169,15 @@ async def handle_habit_action(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 
 async def show_habit_details(query, habit_id: int):
-    habits = get_user_habits(query.from_user.id)
-    habit = next((h for h in habits if h.id == habit_id), None)
+    details = await get_habit_details(query.from_user.id, habit_id)
     
-    if not habit:
+    if not details:
         await query.edit_message_text("Звичку не знайдено")
         return
     
-    stats = get_habit_stats(habit_id)
+    habit, stats = details
     
-    text = f"Детальна статистика: {habit.name}\n\n"
+    text = f"Детальна статистика: {truncate_text(habit.name, HABIT_NAME_LENGTH)}\n\n"
     text += f"Вартість за день: {habit.cost_per_day} грн\n"
     text += f"Частота: {habit.frequency_per_day} разів/день\n"
     text += f"Ціль: {habit.goal_days} днів\n\n"
@@ -146,17 +191,13 @@ async def show_habit_details(query, habit_id: int):
     
     keyboard = get_habit_actions_keyboard(habit_id)
     
-    await query.edit_message_text(
-        text,
-        reply_markup=keyboard,
-        parse_mode='HTML'
-    )
+    await query.edit_message_text(text, reply_markup=keyboard)
 
 
 async def log_habit_did(query, habit_id: int):
-    success = log_habit_activity(habit_id, query.from_user.id, did_habit=True)
+    stats = await log_habit_activity(habit_id, query.from_user.id, did_habit=True)
     
-    if success:
+    if stats is not None:
         await query.edit_message_text(
             "Записано, що ви зробили звичку сьогодні.\n"
             "Не засмучуйтесь! Завтра новий день - нова можливість!"
@@ -166,24 +207,186 @@ async def log_habit_did(query, habit_id: int):
 
 
 async def log_habit_clean(query, habit_id: int):
-    success = log_habit_activity(habit_id, query.from_user.id, did_habit=False)
+    stats = await log_habit_activity(habit_id, query.from_user.id, did_habit=False)
     
-    if success:
-        stats = get_habit_stats(habit_id)
+    if stats is not None:
         await query.edit_message_text(
             f"Відмінно! Ви утрималися від звички!\n"
             f"Ваша серія: {stats['streak']} днів\n"
             f"Заощаджено сьогодні: {stats['money_saved']:.2f} грн\n"
             f"Так тримати!"
         )
+        await notify_new_achievements(query.from_user.id)
     else:
         await query.edit_message_text("Помилка при збереженні даних")
 
 
 async def set_goals(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
-        "Встановлення цілей\n\n"
-        "Ця функція буде додана в наступному оновленні!\n"
-        "Поки що ваша ціль - 30 днів без кожної звички.",
-        parse_mode='HTML'
+    await show_goals(update.effective_user.id, update.message.reply_text)
+
+
+async def show_goals(user_id: int, send):
+    goals = await get_user_goals(user_id)
+    
+    if not goals:
+        await send(
+            "Ваші цілі\n\n"
+            "Цілі з'являться разом зі звичками. Додайте першу командою /add_habit"
+        )
+        return
+    
+    blocks = []
+    for goal in goals:
+        block = f"{truncate_text(goal['name'], HABIT_NAME_LENGTH)}\n"
+        if goal['status'] == 'completed':
+            block += f"  Ціль {goal['goal_days']} днів досягнута!\n\n"
+        elif goal['status'] == 'expired':
+            block += (
+                f"  Ціль {goal['goal_days']} днів не досягнута до {goal['end_date']:%d.%m.%Y}. "
+                f"Поставте нову!\n\n"
+            )
+        else:
+            block += (
+                f"  Прогрес: {goal['progress']} з {goal['goal_days']} днів, "
+                f"до {goal['end_date']:%d.%m.%Y}\n\n"
+            )
+        blocks.append(block)
+    
+    await send(fit_message("Ваші цілі\n\n", blocks), reply_markup=get_goals_keyboard(goals))
+
+
+async def save_goal(query, habit_id: int, goal_days: int):
+    if goal_days not in GOAL_OPTIONS:
+        await query.edit_message_text("Некоректна тривалість цілі")
+        return
+    
+    end_date = await set_habit_goal(query.from_user.id, habit_id, goal_days)
+    if end_date is None:
+        await query.edit_message_text("Звичку не знайдено")
+        return
+    
+    await query.edit_message_text(
+        f"Нова ціль: {goal_days} днів поспіль без звички до {end_date:%d.%m.%Y}.\n"
+        f"Прогрес можна переглянути командою /goals"
     )
+
+
+def schedule_goal_checks(job_queue: JobQueue):
+    now = datetime.now(timezone.utc)
+    next_check = now.replace(minute=30, second=0, microsecond=0)
+    if next_check <= now:
+        next_check += timedelta(hours=1)
+    job_queue.run_repeating(check_goals, interval=timedelta(hours=1), first=next_check, name="goals")
+
+
+async def check_goals(context: ContextTypes.DEFAULT_TYPE):
+    today = datetime.now(timezone.utc).date().isoformat()
+    completed, expired = await update_goal_statuses(today)
+    
+    for user_id, habit_name, goal_days in completed:
+        text = GOAL_COMPLETED_MESSAGE.format(days=goal_days, habit=habit_name)
+        await enqueue_message(user_id, text, priority=PRIORITY_NORMAL)
+    
+    if completed or expired:
+        logger.info(f"Цілей досягнуто: {len(completed)}, прострочено: {expired}")
+
+
+async def backfill_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        days = int(context.args[0]) if context.args else 1
+    except ValueError:
+        days = 0
+    
+    if not 1 <= days <= BACKFILL_MAX_DAYS:
+        await update.message.reply_text(
+            f"Вкажіть кількість днів від 1 до {BACKFILL_MAX_DAYS}, наприклад: /backfill 3"
+        )
+        return
+    
+    await start_batch_log(update.effective_user.id, update.message.reply_text, context, list(range(1, days + 1)))
+
+
+async def start_batch_log(user_id: int, send, context: ContextTypes.DEFAULT_TYPE, days: list):
+    habits = await get_user_habits(user_id)
+    
+    if not habits:
+        await send(
+            "У вас поки немає збережених звичок.\n"
+            "Використайте команду /add_habit щоб додати першу звичку!"
+        )
+        return
+    
+    context.user_data[BATCH_LOG_KEY] = {'days': days, 'did': [], 'page': 0}
+    await send(_batch_log_text(days), reply_markup=get_batch_log_keyboard(habits, []))
+
+
+def _batch_log_text(days: list) -> str:
+    if days == [0]:
+        title = "Відмітьте, як пройшов сьогоднішній день."
+    elif len(days) == 1:
+        title = "Відмітьте, як пройшов учорашній день."
+    else:
+        title = f"Заповнення пропущених днів: останні {len(days)} дн. до сьогодні."
+    # Сьогоднішні позначки можна виправити, а минулі дні лише доповнюються
+    note = "Сьогоднішні позначки буде перезаписано." if days == [0] else "Уже відмічені дні не змінюються."
+    return f"{title}\n\nНатисніть на звичку, щоб змінити позначку, потім збережіть. {note}"
+
+
+
+async def handle_batch_log(query, context: ContextTypes.DEFAULT_TYPE, action: str):
+    batch = context.user_data.get(BATCH_LOG_KEY)
+    
+    if batch is None:
+        await query.edit_message_text("Цей запис уже завершено. Відкрийте /habits, щоб почати знову.")
+        return
+    
+    if action == "cancel":
+        context.user_data.pop(BATCH_LOG_KEY, None)
+        await query.edit_message_text("Запис скасовано.")
+        return
+    
+    habits = await get_user_habits(query.from_user.id)
+    
+    if action == "save":
+        await save_batch_log(query, context, batch, habits)
+        return
+    
+    if action.startswith("page_"):
+        batch['page'] = int(action.replace("page_", ""))
+    else:
+        habit_id = int(action)
+        if habit_id in batch['did']:
+            batch['did'].remove(habit_id)
+        else:
+            batch['did'].append(habit_id)
+    # Список міг скоротитися, поки запис був відкритий
+    batch['page'] = min(batch.get('page', 0), max(0, (len(habits) - 1) // ITEMS_PER_PAGE))
+    await query.edit_message_reply_markup(
+        reply_markup=get_batch_log_keyboard(habits, batch['did'], batch['page'])
+    )
+
+
+async def save_batch_log(query, context: ContextTypes.DEFAULT_TYPE, batch: dict, habits: list):
+    entries = [
+        (habit.id, days_ago, habit.id in batch['did'])
+        for habit in habits
+        for days_ago in batch['days']
+    ]
+    updated = await log_habit_activities(query.from_user.id, entries, replace=batch['days'] == [0])
+    
+    if updated is None:
+        await query.edit_message_text("Помилка при збереженні даних")
+        return
+    
+    context.user_data.pop(BATCH_LOG_KEY, None)
+    blocks = [
+        f"• {truncate_text(stats['name'], HABIT_NAME_LENGTH)}: серія {stats['streak']} днів, "
+        f"заощаджено {stats['money_saved']:.2f} грн\n"
+        for stats in updated
+    ]
+    if not updated:
+        await query.edit_message_text("Усі ці дні вже відмічені - нічого не змінено.")
+        return
+    days = len(batch['days'])
+    await query.edit_message_text(fit_message(f"Записано звичок: {len(updated)}, днів: {days}\n\n", blocks))
+    await notify_new_achievements(query.from_user.id)
@@ -0,0 +1,54 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from telegram.ext import ContextTypes, JobQueue
+
+from config import REMINDER_HOURS, REMINDER_BATCH_SIZE
+from database.repository import get_reminder_timezones, get_users_to_remind
+from utils.dispatcher import enqueue_message, PRIORITY_LOW
+from utils.helpers import get_motivational_message, get_timezone
+from utils.messages import REMINDER_MESSAGE
+
+logger = logging.getLogger(__name__)
+
+
+def schedule_reminders(job_queue: JobQueue):
+    now = datetime.now(timezone.utc)
+    next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    job_queue.run_repeating(
+        send_reminders,
+        interval=timedelta(hours=1),
+        first=next_hour,
+        name="reminders"
+    )
+    logger.info(f"Нагадування заплановано на {REMINDER_HOURS} за місцевим часом користувачів")
+
+
+async def send_reminders(context: ContextTypes.DEFAULT_TYPE):
+    now = datetime.now(timezone.utc)
+    queued = 0
+
+    for timezone_name in await get_reminder_timezones():
+        local_now = now.astimezone(get_timezone(timezone_name))
+        if local_now.hour not in REMINDER_HOURS:
+            continue
+        queued += await _remind_timezone(timezone_name, local_now.date().isoformat())
+
+    logger.info(f"Нагадувань поставлено в чергу: {queued}")
+
+
+async def _remind_timezone(timezone_name: str, today: str) -> int:
+    queued = 0
+    after_user_id = 0
+
+    while True:
+        user_ids = await get_users_to_remind(timezone_name, today, after_user_id, REMINDER_BATCH_SIZE)
+        if not user_ids:
+            break
+        after_user_id = user_ids[-1]
+        for user_id in user_ids:
+            text = REMINDER_MESSAGE.format(motivation=get_motivational_message())
+            await enqueue_message(user_id, text, priority=PRIORITY_LOW)
+        queued += len(user_ids)
+
+    return queued
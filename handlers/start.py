@@ -4,15 +4,27 @@ from telegram.ext import ContextTypes
 
 from utils.messages import START_MESSAGE, HELP_MESSAGE
 from utils.keyboards import get_main_menu_keyboard
-from database.database import add_user
+from database.repository import add_user, get_user_timezone, set_user_timezone
+from handlers.habits import show_habits
+from handlers.stats import show_progress, show_detailed_stats
+from utils.helpers import get_local_today, is_valid_timezone
 
 logger = logging.getLogger(__name__)
 
 
+class QueryUpdate:
+    """Натискання кнопки меню у вигляді оновлення з командою для обробників команд."""
+    __slots__ = ('effective_user', 'message')
+
+    def __init__(self, query):
+        self.effective_user = query.from_user
+        self.message = query.message
+
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     
-    add_user(user.id, user.username or user.first_name)
+    await add_user(user.id, user.username or user.first_name)
     
     await update.message.reply_text(
         START_MESSAGE,
@@ -28,6 +40,31 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+async def timezone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    
+    if not context.args:
+        timezone = await get_user_timezone(user_id)
+        await update.message.reply_text(
+            f"Ваш часовий пояс: {timezone}\n"
+            f"Сьогодні у вас: {get_local_today(timezone).strftime('%d.%m.%Y')}\n\n"
+            "Щоб змінити, надішліть /timezone Europe/Warsaw"
+        )
+        return
+    
+    timezone = context.args[0]
+    if not is_valid_timezone(timezone):
+        await update.message.reply_text(
+            "Невідомий часовий пояс. Приклади: Europe/Kyiv, Europe/Warsaw, America/New_York"
+        )
+        return
+    
+    if await set_user_timezone(user_id, timezone):
+        await update.message.reply_text(f"Часовий пояс змінено на {timezone}")
+    else:
+        await update.message.reply_text("Помилка при збереженні даних")
+
+
 async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -43,33 +80,12 @@ async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def show_habits_callback(query):
-    class FakeUpdate:
-        def __init__(self, query):
-            self.effective_user = query.from_user
-            self.message = query.message
-    
-    fake_update = FakeUpdate(query)
-    from handlers.habits import show_habits
-    await show_habits(fake_update, None)
+    await show_habits(QueryUpdate(query), None)
 
 
 async def show_progress_callback(query):
-    class FakeUpdate:
-        def __init__(self, query):
-            self.effective_user = query.from_user
-            self.message = query.message
-    
-    fake_update = FakeUpdate(query)
-    from handlers.stats import show_progress
-    await show_progress(fake_update, None)
+    await show_progress(QueryUpdate(query), None)
 
 
 async def show_detailed_stats_callback(query):
-    class FakeUpdate:
-        def __init__(self, query):
-            self.effective_user = query.from_user
-            self.message = query.message
-    
-    fake_update = FakeUpdate(query)
-    from handlers.stats import show_detailed_stats
-    await show_detailed_stats(fake_update, None)
+    await show_detailed_stats(QueryUpdate(query), None)
@@ -1,42 +1,61 @@
 import logging
+from datetime import timedelta
+
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from database.database import get_user_total_stats, get_user_habits, get_habit_stats
-from utils.keyboards import get_stats_keyboard
+from config import HABIT_NAME_LENGTH, MAX_MESSAGE_LENGTH
+from database.repository import (
+    get_user_total_stats, get_user_stats, get_user_habits, get_habit_details, get_user_timezone,
+    get_period_stats, get_habit_log_series, get_chart_file_id, save_chart_file_id,
+    get_user_achievements, pop_new_achievements
+)
+from utils.charts import charts_available, get_chart_key, read_cached_chart, write_cached_chart, render_in_pool
+from utils.dispatcher import enqueue_message, get_dispatcher, PRIORITY_HIGH
+from utils.helpers import (
+    get_local_today, get_week_start, get_month_start, get_next_milestone, fit_message, message_length,
+    truncate_text
+)
+from utils.keyboards import get_stats_keyboard, get_charts_keyboard
+from utils.messages import ACHIEVEMENT_TITLES, ACHIEVEMENT_UNLOCKED_MESSAGE
 
 logger = logging.getLogger(__name__)
 
 
 async def show_progress(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    habits = get_user_habits(user_id)
+    user_stats = await get_user_stats(user_id)
     
-    if not habits:
+    if not user_stats['habits']:
         await update.message.reply_text(
             "У вас поки немає звичок для відстеження.\n"
             "Додайте першу звичку командою /add_habit"
         )
         return
     
-    text = "Ваш прогрес сьогодні:\n\n"
-    
-    for habit in habits:
-        stats = get_habit_stats(habit.id)
-        text += f"{habit.name}\n"
-        text += f"   Серія: {stats['streak']} днів\n"
-        text += f"   Заощаджено: {stats['money_saved']:.2f} грн\n\n"
+    blocks = []
+    for stats in user_stats['habits']:
+        blocks.append(
+            f"{truncate_text(stats['name'], HABIT_NAME_LENGTH)}\n"
+            f"   Серія: {stats['streak']} днів\n"
+            f"   Заощаджено: {stats['money_saved']:.2f} грн\n\n"
+        )
     
-    total_stats = get_user_total_stats(user_id)
-    text += f"Загальна економія: {total_stats['total_money_saved']:.2f} грн\n"
-    text += f"Загальний успіх: {total_stats['average_success_rate']:.1f}%"
+    total_stats = user_stats['total']
+    footer = (
+        f"Загальна економія: {total_stats['total_money_saved']:.2f} грн\n"
+        f"Загальний успіх: {total_stats['average_success_rate']:.1f}%"
+    )
     
-    await update.message.reply_text(text, parse_mode='HTML')
+    # Підсумки мають лишитися навіть тоді, коли всі звички не вміщаються
+    footer = "\n\n" + footer
+    text = fit_message("Ваш прогрес сьогодні:\n\n", blocks, MAX_MESSAGE_LENGTH - message_length(footer))
+    await update.message.reply_text(text.rstrip('\n') + footer)
 
 
 async def show_detailed_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    total_stats = get_user_total_stats(user_id)
+    total_stats = await get_user_total_stats(user_id)
     
     if total_stats['total_habits'] == 0:
         await update.message.reply_text(
@@ -84,31 +103,155 @@ async def handle_stats_action(update: Update, context: ContextTypes.DEFAULT_TYPE
         await show_achievements(query)
     elif data == "charts":
         await show_charts(query)
+    elif data.startswith("chart_"):
+        habit_id = int(data.replace("chart_", ""))
+        await send_habit_chart(query, habit_id)
+
+
+WEEKDAYS = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Нд']
 
 
 async def show_weekly_stats(query):
-    await query.edit_message_text(
-        "Статистика за тиждень\n\n"
-        "Ця функція буде додана в наступному оновленні."
-    )
+    today = get_local_today(await get_user_timezone(query.from_user.id))
+    week_start = get_week_start(today)
+    period = await get_period_stats(query.from_user.id, week_start.isoformat(), today.isoformat())
+    
+    text = "Статистика за тиждень\n\n"
+    days = {day['date']: day for day in period['days']}
+    for offset in range((today - week_start).days + 1):
+        day = week_start + timedelta(days=offset)
+        stats = days.get(day.isoformat())
+        text += f"{WEEKDAYS[day.weekday()]} {day.strftime('%d.%m')}: "
+        if stats:
+            text += f"утримались {stats['clean_count']}, зірвались {stats['did_count']}\n"
+        else:
+            text += "немає записів\n"
+    
+    text += _format_period_summary(period)
+    await query.edit_message_text(text)
 
 
 async def show_monthly_stats(query):
-    await query.edit_message_text(
-        "Статистика за місяць\n\n"
-        "Ця функція буде додана в наступному оновленні."
-    )
+    today = get_local_today(await get_user_timezone(query.from_user.id))
+    month_start = get_month_start(today)
+    period = await get_period_stats(query.from_user.id, month_start.isoformat(), today.isoformat())
+    
+    text = f"Статистика за місяць ({month_start.strftime('%m.%Y')})\n\n"
+    text += f"Днів із записами: {len(period['days'])} з {(today - month_start).days + 1}\n"
+    text += f"Повністю чистих днів: {sum(1 for day in period['days'] if day['did_count'] == 0)}\n"
+    text += _format_period_summary(period)
+    await query.edit_message_text(text)
+
+
+def _format_period_summary(period: dict) -> str:
+    if not period['days']:
+        return "\nЗа цей період ще немає записів."
+    
+    text = f"\nУтримались: {period['clean_count']} разів\n"
+    text += f"Зірвались: {period['did_count']} разів\n"
+    text += f"Заощаджено: {period['money_saved']:.2f} грн\n"
+    text += f"Рівень успіху: {period['success_rate']:.1f}%"
+    return text
 
 
 async def show_achievements(query):
-    await query.edit_message_text(
-        "Ваші досягнення\n\n"
-        "Ця функція буде додана в наступному оновленні."
-    )
+    rows = await get_user_achievements(query.from_user.id)
+    if not rows:
+        await query.edit_message_text(
+            "Ваші досягнення\n\n"
+            "Поки що немає досягнень. Перше з'явиться після першого дня без звички!"
+        )
+        return
+    
+    habits = {}
+    for habit_id, name, milestone in rows:
+        habits.setdefault(habit_id, (name, []))[1].append(milestone)
+    
+    blocks = []
+    for name, milestones in habits.values():
+        block = f"{truncate_text(name, HABIT_NAME_LENGTH)}\n"
+        for milestone in milestones:
+            block += f"  {ACHIEVEMENT_TITLES.get(milestone, '')} ({milestone} дн.)\n"
+        next_milestone = get_next_milestone(milestones[-1])
+        if next_milestone:
+            block += f"  Наступне: {ACHIEVEMENT_TITLES.get(next_milestone, '')} ({next_milestone} дн.)\n"
+        blocks.append(block + "\n")
+    
+    await query.edit_message_text(fit_message("Ваші досягнення\n\n", blocks))
+
+
+async def notify_new_achievements(user_id: int):
+    # Без диспетчера не забираємо позначки - повідомимо при наступному записі
+    if get_dispatcher() is None:
+        return
+    
+    unlocked = await pop_new_achievements(user_id)
+    if not unlocked:
+        return
+    
+    names = {habit.id: habit.name for habit in await get_user_habits(user_id)}
+    for habit_id, milestone in unlocked:
+        text = ACHIEVEMENT_UNLOCKED_MESSAGE.format(
+            title=ACHIEVEMENT_TITLES.get(milestone, ''),
+            days=milestone,
+            habit=names.get(habit_id, '')
+        )
+        await enqueue_message(user_id, text, priority=PRIORITY_HIGH)
 
 
 async def show_charts(query):
+    if not charts_available():
+        await query.edit_message_text(
+            "Графіки прогресу\n\n"
+            "Графіки недоступні: на сервері не встановлено numpy та matplotlib."
+        )
+        return
+    
+    habits = await get_user_habits(query.from_user.id)
+    if not habits:
+        await query.edit_message_text(
+            "Графіки прогресу\n\n"
+            "Додайте звичку командою /add_habit, щоб побачити графік."
+        )
+        return
+    
     await query.edit_message_text(
-        "Графіки прогресу\n\n"
-        "Ця функція буде додана в наступному оновленні."
+        "Графіки прогресу\n\nОберіть звичку:",
+        reply_markup=get_charts_keyboard(habits)
     )
+
+
+async def send_habit_chart(query, habit_id: int):
+    details = await get_habit_details(query.from_user.id, habit_id)
+    
+    if not details:
+        await query.edit_message_text("Звичку не знайдено")
+        return
+    
+    habit, stats = details
+    if not stats['total_days']:
+        await query.edit_message_text("Для цієї звички ще немає записів")
+        return
+    
+    cache_key = get_chart_key(habit_id, stats)
+    caption = f"{habit.name}: {stats['clean_days']} чистих днів, заощаджено {stats['money_saved']:.2f} грн"
+    
+    file_id = await get_chart_file_id(cache_key)
+    if file_id:
+        await query.message.reply_photo(file_id, caption=caption)
+        return
+    
+    image = read_cached_chart(habit_id, cache_key)
+    if image is None:
+        series = await get_habit_log_series(habit_id)
+        try:
+            image = await render_in_pool(habit.name, habit.cost_per_day, series.day_numbers, series.did_flags)
+        except Exception as e:
+            logger.error(f"Помилка побудови графіка: {e}")
+            await query.edit_message_text("Не вдалося побудувати графік")
+            return
+        write_cached_chart(habit_id, cache_key, image)
+    
+    message = await query.message.reply_photo(image, caption=caption)
+    if message and message.photo:
+        await save_chart_file_id(habit_id, cache_key, message.photo[-1].file_id)
@@ -1,11 +1,9 @@
+import asyncio
 import logging
 import os
 from dotenv import load_dotenv
 
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ConversationHandler, MessageHandler, filters
-
-from database.database import init_database
-from handlers import start, habits, stats
+import config
 
 load_dotenv()
 
@@ -16,6 +14,9 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+
 def main():
     token = os.getenv('BOT_TOKEN')
     if not token:
@@ -28,32 +29,48 @@ def main():
         logger.error("Замініть BOT_TOKEN на реальний токен від @BotFather")
         return
 
-    init_database()
+    if config.SHARD_COUNT > 1:
+        if not config.WEBHOOK_URL:
+            logger.error("Шардований режим (SHARD_COUNT > 1) працює лише з WEBHOOK_URL")
+            return
+        # Фронтенду потрібні лише Bot і tornado: обробники й база
+        # завантажуються тільки в процесах шардів
+        from utils.cluster import run_cluster
+        run_cluster(token, run_worker, ALLOWED_UPDATES)
+        return
 
-    application = Application.builder().token(token).build()
-    application.add_handler(CommandHandler("start", start.start_command))
-    application.add_handler(CommandHandler("help", start.help_command))
-    application.add_handler(CommandHandler("habits", habits.show_habits))
-    application.add_handler(CommandHandler("progress", stats.show_progress))
-    application.add_handler(CommandHandler("stats", stats.show_detailed_stats))
-    application.add_handler(CommandHandler("goals", habits.set_goals))
-    add_habit_conv = ConversationHandler(
-        entry_points=[CommandHandler("add_habit", habits.add_habit_start)],
-        states={
-            habits.HABIT_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, habits.get_habit_name)],
-            habits.HABIT_COST: [MessageHandler(filters.TEXT & ~filters.COMMAND, habits.get_habit_cost)],
-            habits.HABIT_FREQUENCY: [MessageHandler(filters.TEXT & ~filters.COMMAND, habits.get_habit_frequency)],
-        },
-        fallbacks=[CommandHandler("cancel", habits.cancel_add_habit)],
-    )
-    application.add_handler(add_habit_conv)
-    application.add_handler(CallbackQueryHandler(start.handle_main_menu, pattern="^main_"))
-    application.add_handler(CallbackQueryHandler(habits.handle_habit_action, pattern="^habit_"))
-    application.add_handler(CallbackQueryHandler(stats.handle_stats_action, pattern="^stats_"))
+    from bot import build_application
+    from database.database import init_database
+    init_database()
+    application = build_application(token)
 
     logger.info("Бот запущено успішно!")
     
-    application.run_polling(allowed_updates=["message", "callback_query"])
+    if config.WEBHOOK_URL:
+        logger.info(f"Режим webhook: {config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}/{config.WEBHOOK_PATH}")
+        application.run_webhook(
+            listen=config.WEBHOOK_LISTEN,
+            port=config.WEBHOOK_PORT,
+            url_path=config.WEBHOOK_PATH,
+            webhook_url=f"{config.WEBHOOK_URL.rstrip('/')}/{config.WEBHOOK_PATH}",
+            secret_token=config.WEBHOOK_SECRET_TOKEN,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=ALLOWED_UPDATES
+        )
+    else:
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
+
+
+def run_worker(token: str, index: int):
+    from bot import build_application
+    from database.database import init_database
+    from database.shards import set_process_shard
+    from utils.cluster import serve_worker
+
+    set_process_shard(index)
+    init_database()
+    logger.info(f"Процес шарду {index} запущено")
+    asyncio.run(serve_worker(build_application(token, updater=False), index))
 
 
 if __name__ == '__main__':
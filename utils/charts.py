@@ -0,0 +1,139 @@
+import asyncio
+import functools
+import hashlib
+import importlib.util
+import io
+import logging
+import os
+from typing import Optional, Sequence
+
+from config import CHART_CACHE_DIR, CHART_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Змінюйте при зміні вигляду графіків, щоб не віддавати старі картинки з кешу
+CHART_VERSION = 1
+HEATMAP_WEEKS = 53
+EPOCH_ORDINAL = 719163
+
+_pool = None
+
+
+@functools.lru_cache(maxsize=None)
+def charts_available() -> bool:
+    return all(importlib.util.find_spec(name) for name in ('numpy', 'matplotlib'))
+
+
+def get_chart_key(habit_id: int, stats: dict) -> str:
+    # Запис за минулу дату не змінює last_log_date, тому ключ враховує й
+    # лічильники днів: будь-який новий день або зміна відмітки їх зсуває
+    raw = (
+        f"{CHART_VERSION}:{habit_id}:{stats['last_log_date'] or '-'}:"
+        f"{stats['total_days']}:{stats['clean_days']}:{stats['longest_streak']}"
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _cache_path(habit_id: int, key: str) -> str:
+    return os.path.join(CHART_CACHE_DIR, str(habit_id), f"{key}.png")
+
+
+def read_cached_chart(habit_id: int, key: str) -> Optional[bytes]:
+    try:
+        with open(_cache_path(habit_id, key), 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_cached_chart(habit_id: int, key: str, image: bytes):
+    path = _cache_path(habit_id, key)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(image)
+    os.replace(tmp_path, path)
+
+    # Для звички актуальний лише графік з останнім ключем
+    for name in os.listdir(directory):
+        if name != os.path.basename(path) and not name.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def render_habit_chart(name: str, cost_per_day: float, day_numbers: Sequence[int], did_flags: Sequence[int]) -> bytes:
+    import numpy as np
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import ListedColormap
+
+    days = np.asarray(day_numbers, dtype=np.int64)
+    flags = np.asarray(did_flags, dtype=np.int8)
+    order = np.argsort(days)
+    days, flags = days[order], flags[order]
+
+    figure, (heatmap_axis, savings_axis) = plt.subplots(
+        2, 1, figsize=(10, 6), gridspec_kw={'height_ratios': [1, 1.4]}
+    )
+    figure.suptitle(name)
+
+    # Календар: стовпці - тижні, рядки - дні тижня (ординал 1 - понеділок)
+    recent = days >= days[-1] - HEATMAP_WEEKS * 7 + 1
+    recent_days, recent_flags = days[recent], flags[recent]
+    first_monday = recent_days[0] - (recent_days[0] - 1) % 7
+    offsets = recent_days - first_monday
+    grid = np.full((7, offsets[-1] // 7 + 1), np.nan)
+    grid[offsets % 7, offsets // 7] = recent_flags
+
+    colormap = ListedColormap(['#43a047', '#e53935'])
+    colormap.set_bad('#eeeeee')
+    heatmap_axis.imshow(np.ma.masked_invalid(grid), cmap=colormap, vmin=0, vmax=1, aspect='auto')
+    heatmap_axis.set_yticks(range(7))
+    heatmap_axis.set_yticklabels(['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Нд'], fontsize=7)
+    heatmap_axis.set_xticks([])
+    heatmap_axis.set_title('Зелений - утримались, червоний - зірвались', fontsize=9)
+
+    dates = (days - EPOCH_ORDINAL).astype('datetime64[D]')
+    savings = np.cumsum((1 - flags) * float(cost_per_day or 0))
+    savings_axis.plot(dates, savings, color='#1e88e5')
+    savings_axis.fill_between(dates, savings, alpha=0.15, color='#1e88e5')
+    savings_axis.set_ylabel('Заощаджено, грн')
+    savings_axis.grid(alpha=0.3)
+    figure.autofmt_xdate()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+    plt.close(figure)
+    return buffer.getvalue()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # Пул процесів і multiprocessing потрібні лише з першим графіком
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        _pool = ProcessPoolExecutor(
+            max_workers=CHART_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _pool
+
+
+async def render_in_pool(name: str, cost_per_day: float, day_numbers: Sequence[int], did_flags: Sequence[int]) -> bytes:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_pool(), render_habit_chart, name, cost_per_day, day_numbers, did_flags
+    )
+
+
+def shutdown_chart_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import signal
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+import tornado.web
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from telegram import Bot, Update
+
+import config
+from database.shards import shard_for_user
+
+# telegram.ext потрібен лише процесам шардів, фронтенд його не завантажує
+if TYPE_CHECKING:
+    from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def worker_url(index: int) -> str:
+    return f"http://{config.WORKER_LISTEN}:{config.WORKER_PORT_BASE + index}/{config.WORKER_PATH}"
+
+
+def get_update_user_id(data: dict) -> Optional[int]:
+    # Той самий ключ, що й у get_ordering_key: відправник, інакше чат
+    for value in data.values():
+        if not isinstance(value, dict):
+            continue
+        sender = value.get('from') or value.get('user')
+        if isinstance(sender, dict) and 'id' in sender:
+            return sender['id']
+        chat = value.get('chat')
+        if isinstance(chat, dict) and 'id' in chat:
+            return chat['id']
+    return None
+
+
+class FrontendHandler(tornado.web.RequestHandler):
+    """Приймає webhook від Telegram і передає оновлення процесу шарду користувача."""
+
+    def initialize(self, client: AsyncHTTPClient):
+        self.client = client
+
+    async def post(self):
+        if config.WEBHOOK_SECRET_TOKEN and self.request.headers.get(SECRET_HEADER) != config.WEBHOOK_SECRET_TOKEN:
+            raise tornado.web.HTTPError(403)
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            raise tornado.web.HTTPError(400)
+
+        user_id = get_update_user_id(data)
+        index = shard_for_user(user_id) if user_id is not None else 0
+        # Відповідаємо Telegram лише після того, як шард обробив оновлення:
+        # якщо шард недоступний або впав, Telegram повторить його пізніше
+        try:
+            response = await self.client.fetch(
+                worker_url(index), method='POST', body=self.request.body,
+                headers={'Content-Type': 'application/json'}, raise_error=False
+            )
+            code = response.code
+        except OSError as e:
+            code = e
+        if code != 200:
+            logger.warning(f"Шард {index} не прийняв оновлення: {code}")
+            raise tornado.web.HTTPError(503)
+
+
+class WorkerHandler(tornado.web.RequestHandler):
+    def initialize(self, bot_application: 'Application'):
+        self.bot_application = bot_application
+
+    async def post(self):
+        try:
+            update = Update.de_json(json.loads(self.request.body), self.bot_application.bot)
+        except ValueError:
+            raise tornado.web.HTTPError(400)
+        # Не кладемо в update_queue: 200 має означати, що обробник уже відпрацював.
+        # Процесор оновлень зберігає чергу користувача й ліміт одночасних обробок
+        application = self.bot_application
+        await application.update_processor.process_update(update, application.process_update(update))
+
+
+def _stop_event() -> asyncio.Event:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    return stop
+
+
+async def serve_worker(application: 'Application', index: int):
+    # Той самий життєвий цикл, що й у run_webhook, але без set_webhook:
+    # вебхук належить фронтенду, а процес слухає лише локальний порт
+    stop = _stop_event()
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+
+    server = HTTPServer(tornado.web.Application([
+        (rf"/{config.WORKER_PATH}", WorkerHandler, {'bot_application': application})
+    ]))
+    server.listen(config.WORKER_PORT_BASE + index, config.WORKER_LISTEN)
+    logger.info(f"Шард {index} приймає оновлення на {worker_url(index)}")
+
+    try:
+        await stop.wait()
+    finally:
+        server.stop()
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+async def _serve_frontend(token: str, processes: List[multiprocessing.Process], allowed_updates: List[str]):
+    stop = _stop_event()
+    async with Bot(token) as bot:
+        await bot.set_webhook(
+            url=f"{config.WEBHOOK_URL.rstrip('/')}/{config.WEBHOOK_PATH}",
+            secret_token=config.WEBHOOK_SECRET_TOKEN,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=allowed_updates
+        )
+
+    client = AsyncHTTPClient()
+    server = HTTPServer(tornado.web.Application([
+        (rf"/{config.WEBHOOK_PATH}", FrontendHandler, {'client': client})
+    ]))
+    server.listen(config.WEBHOOK_PORT, config.WEBHOOK_LISTEN)
+    logger.info(f"Фронтенд webhook на {config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}, шардів: {len(processes)}")
+
+    try:
+        while not stop.is_set():
+            dead = [process.name for process in processes if not process.is_alive()]
+            if dead:
+                logger.error(f"Процеси зупинились: {', '.join(dead)}")
+                break
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        server.stop()
+        client.close()
+
+
+def run_cluster(token: str, worker: Callable[[str, int], None], allowed_updates: List[str]):
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=worker, args=(token, index), name=f"shard-{index}")
+        for index in range(config.SHARD_COUNT)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        asyncio.run(_serve_frontend(token, processes, allowed_updates))
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=30)
@@ -0,0 +1,253 @@
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+
+from config import (
+    DISPATCHER_GLOBAL_RATE, DISPATCHER_PER_CHAT_RATE, DISPATCHER_MAX_IN_FLIGHT,
+    DISPATCHER_MAX_QUEUE, DISPATCHER_MAX_ATTEMPTS
+)
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+@dataclass(order=True)
+class OutgoingMessage:
+    priority: int
+    seq: int
+    chat_id: int = field(compare=False)
+    text: str = field(compare=False)
+    kwargs: dict = field(compare=False, default_factory=dict)
+    attempts: int = field(compare=False, default=0)
+    enqueued_at: float = field(compare=False, default_factory=time.monotonic)
+
+
+class MessageDispatcher:
+    """Черга вихідних повідомлень, що не потребують миттєвої відповіді
+    (нагадування, оголошення, досягнення): пріоритети, ліміти Telegram
+    глобально та на чат, повтори після RetryAfter."""
+
+    def __init__(self, bot, global_rate: float = DISPATCHER_GLOBAL_RATE,
+                 per_chat_rate: float = DISPATCHER_PER_CHAT_RATE,
+                 max_in_flight: int = DISPATCHER_MAX_IN_FLIGHT,
+                 max_queue: int = DISPATCHER_MAX_QUEUE):
+        self.bot = bot
+        self.per_chat_rate = per_chat_rate
+        self._global_bucket = TokenBucket(global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._max_queue = max_queue
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._max_in_flight = max_in_flight
+        self._paused_until = 0.0
+        self._seq = itertools.count()
+        self._worker: Optional[asyncio.Task] = None
+        self._tasks = set()
+        self._delayed = 0
+        self._pending = 0
+        self.metrics = {
+            'enqueued': 0,
+            'sent': 0,
+            'failed': 0,
+            'retried': 0,
+            'retry_after': 0,
+            'total_latency': 0.0
+        }
+
+    async def start(self):
+        if self._worker is not None:
+            return
+        self._queue = asyncio.PriorityQueue(self._max_queue)
+        self._in_flight = asyncio.Semaphore(self._max_in_flight)
+        self._worker = asyncio.create_task(self._run(), name='message_dispatcher')
+
+    async def stop(self, timeout: float = 10):
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Диспетчер зупинено з {self._queue.qsize()} повідомленнями в черзі, "
+                f"{self._delayed} відкладеними та {len(self._tasks) - self._delayed} в дорозі"
+            )
+        # Відкладені повтори й надсилання, що не встигли за timeout, скасовуємо
+        # і чекаємо, щоб жодна задача не пережила зупинку бота
+        tasks = [self._worker, *self._tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = None
+
+    async def _drain(self):
+        while self._pending:
+            await asyncio.sleep(0.05)
+
+    async def enqueue(self, chat_id: int, text: str, priority: int = PRIORITY_NORMAL, **kwargs):
+        if self._queue is None:
+            raise RuntimeError("Диспетчер повідомлень не запущено")
+        message = OutgoingMessage(priority, next(self._seq), chat_id, text, kwargs)
+        await self._queue.put(message)
+        self._pending += 1
+        self.metrics['enqueued'] += 1
+
+    def _requeue_later(self, message: OutgoingMessage, delay: float):
+        self._delayed += 1
+
+        async def put():
+            try:
+                await asyncio.sleep(delay)
+                await self._queue.put(message)
+            finally:
+                self._delayed -= 1
+
+        task = asyncio.create_task(put())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items()
+                    if not value.is_full(now)
+                }
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, 1)
+        return bucket
+
+    async def _run(self):
+        while True:
+            message = await self._queue.get()
+            now = time.monotonic()
+
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                now = time.monotonic()
+
+            chat_delay = self._chat_bucket(message.chat_id, now).delay(now)
+            if chat_delay > 0:
+                self._requeue_later(message, chat_delay)
+                continue
+
+            global_delay = self._global_bucket.delay(now)
+            if global_delay > 0:
+                await asyncio.sleep(global_delay)
+                now = time.monotonic()
+
+            self._global_bucket.consume(now)
+            self._chat_bucket(message.chat_id, now).consume(now)
+
+            await self._in_flight.acquire()
+            task = asyncio.create_task(self._send(message))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, message: OutgoingMessage):
+        try:
+            message.attempts += 1
+            await self.bot.send_message(chat_id=message.chat_id, text=message.text, **message.kwargs)
+            self.metrics['sent'] += 1
+            self.metrics['total_latency'] += time.monotonic() - message.enqueued_at
+            self._pending -= 1
+        except RetryAfter as e:
+            self.metrics['retry_after'] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            logger.warning(f"Telegram просить зачекати {e.retry_after} с")
+            self._retry(message, e.retry_after, e)
+        except (Forbidden, BadRequest) as e:
+            self._fail(message)
+            logger.debug(f"Повідомлення для {message.chat_id} відхилено: {e}")
+        except NetworkError as e:
+            self._retry(message, 2 ** message.attempts, e)
+        except TelegramError as e:
+            self._fail(message)
+            logger.warning(f"Помилка надсилання для {message.chat_id}: {e}")
+        finally:
+            self._in_flight.release()
+
+    def _fail(self, message: OutgoingMessage):
+        self.metrics['failed'] += 1
+        self._pending -= 1
+
+    def _retry(self, message: OutgoingMessage, delay: float, error: Exception = None):
+        if message.attempts >= DISPATCHER_MAX_ATTEMPTS:
+            self._fail(message)
+            logger.warning(f"Не вдалося надіслати повідомлення {message.chat_id}: {error}")
+            return
+        self.metrics['retried'] += 1
+        self._requeue_later(message, delay)
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        total_latency = stats.pop('total_latency')
+        stats['average_latency'] = total_latency / stats['sent'] if stats['sent'] else 0.0
+        stats['queued'] = self._queue.qsize() if self._queue else 0
+        stats['delayed'] = self._delayed
+        stats['pending'] = self._pending
+        stats['in_flight'] = self._max_in_flight - self._in_flight._value if self._in_flight else 0
+        return stats
+
+
+_dispatcher: Optional[MessageDispatcher] = None
+
+
+async def start_dispatcher(bot, **kwargs) -> MessageDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = MessageDispatcher(bot, **kwargs)
+        await _dispatcher.start()
+    return _dispatcher
+
+
+async def stop_dispatcher():
+    global _dispatcher
+    if _dispatcher is not None:
+        await _dispatcher.stop()
+        logger.info(f"Диспетчер повідомлень зупинено: {_dispatcher.stats()}")
+        _dispatcher = None
+
+
+def get_dispatcher() -> Optional[MessageDispatcher]:
+    return _dispatcher
+
+
+async def enqueue_message(chat_id: int, text: str, priority: int = PRIORITY_NORMAL, **kwargs):
+    if _dispatcher is None:
+        raise RuntimeError("Диспетчер повідомлень не запущено")
+    await _dispatcher.enqueue(chat_id, text, priority, **kwargs)
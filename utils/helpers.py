@@ -1,4 +1,6 @@
-from datetime import datetime, timedelta
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import random
 from utils.messages import MOTIVATIONAL_MESSAGES
 
@@ -45,10 +47,15 @@ def format_duration(days):
 def get_achievement_level(streak):
     from config import ACHIEVEMENT_MILESTONES
     
-    for milestone in reversed(ACHIEVEMENT_MILESTONES):
-        if streak >= milestone:
-            return milestone
-    return 0
+    index = bisect_right(ACHIEVEMENT_MILESTONES, streak)
+    return ACHIEVEMENT_MILESTONES[index - 1] if index else 0
+
+
+def get_next_milestone(level):
+    from config import ACHIEVEMENT_MILESTONES
+    
+    index = bisect_right(ACHIEVEMENT_MILESTONES, level)
+    return ACHIEVEMENT_MILESTONES[index] if index < len(ACHIEVEMENT_MILESTONES) else None
 
 
 def format_money(amount):
@@ -60,12 +67,64 @@ def is_today(date):
     return date.date() == today
 
 
-def get_week_start():
-    today = datetime.now()
+def get_timezone(name=None):
+    from config import DEFAULT_TIMEZONE
+    
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def is_valid_timezone(name):
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+
+def get_local_today(timezone_name=None) -> date:
+    return datetime.now(get_timezone(timezone_name)).date()
+
+
+def get_week_start(today=None):
+    if isinstance(today, date) and not isinstance(today, datetime):
+        return today - timedelta(days=today.weekday())
+    today = today or datetime.now()
     start = today - timedelta(days=today.weekday())
     return start.replace(hour=0, minute=0, second=0, microsecond=0)
 
 
-def get_month_start():
-    today = datetime.now()
+def get_month_start(today=None):
+    if isinstance(today, date) and not isinstance(today, datetime):
+        return today.replace(day=1)
+    today = today or datetime.now()
     return today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def message_length(text):
+    # Telegram рахує довжину повідомлення в UTF-16 одиницях
+    return len(text.encode('utf-16-le')) // 2
+
+
+def truncate_text(text, max_length):
+    if message_length(text) <= max_length:
+        return text
+    encoded = text.encode('utf-16-le')[:(max_length - 1) * 2]
+    return encoded.decode('utf-16-le', errors='ignore') + "…"
+
+
+def fit_message(header, blocks, limit=None):
+    from config import MAX_MESSAGE_LENGTH
+    
+    limit = limit or MAX_MESSAGE_LENGTH
+    text = truncate_text(header, limit)
+    for block in blocks:
+        room = limit - message_length(text)
+        if message_length(block) > room:
+            if room > 1:
+                text += truncate_text(block, room)
+            break
+        text += block
+    return text
@@ -1,6 +1,10 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from typing import List
+from typing import List, Optional
+from config import ITEMS_PER_PAGE
 from database.models import Habit
+from utils.helpers import truncate_text
+
+BUTTON_TEXT_LENGTH = 64
 
 
 def get_main_menu_keyboard():
@@ -12,17 +16,28 @@ def get_main_menu_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
-def get_habits_keyboard(habits: List[Habit]):
+def get_habits_keyboard(habits: List[dict], prev_id: Optional[int] = None, next_id: Optional[int] = None):
     keyboard = []
     
     for habit in habits:
         keyboard.append([
             InlineKeyboardButton(
-                f"{habit.name}", 
-                callback_data=f"habit_view_{habit.id}"
+                truncate_text(habit['name'], BUTTON_TEXT_LENGTH),
+                callback_data=f"habit_view_{habit['habit_id']}"
             )
         ])
     
+    navigation = []
+    if prev_id is not None:
+        navigation.append(InlineKeyboardButton("Попередні", callback_data=f"habit_page_prev_{prev_id}"))
+    if next_id is not None:
+        navigation.append(InlineKeyboardButton("Наступні", callback_data=f"habit_page_next_{next_id}"))
+    if navigation:
+        keyboard.append(navigation)
+    
+    keyboard.append([
+        InlineKeyboardButton("Відмітити всі", callback_data="habit_logall")
+    ])
     keyboard.append([
         InlineKeyboardButton("Додати звичку", callback_data="habit_add")
     ])
@@ -42,6 +57,57 @@ def get_habit_actions_keyboard(habit_id: int):
     return InlineKeyboardMarkup(keyboard)
 
 
+def get_batch_log_keyboard(habits: List[Habit], did_ids: List[int], page: int = 0):
+    keyboard = []
+    start = page * ITEMS_PER_PAGE
+    
+    for habit in habits[start:start + ITEMS_PER_PAGE]:
+        status = "зірвався" if habit.id in did_ids else "утримався"
+        keyboard.append([
+            InlineKeyboardButton(
+                f"{truncate_text(habit.name, BUTTON_TEXT_LENGTH)}: {status}",
+                callback_data=f"habit_batch_{habit.id}"
+            )
+        ])
+    
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("Попередні", callback_data=f"habit_batch_page_{page - 1}"))
+    if start + ITEMS_PER_PAGE < len(habits):
+        navigation.append(InlineKeyboardButton("Наступні", callback_data=f"habit_batch_page_{page + 1}"))
+    if navigation:
+        keyboard.append(navigation)
+    
+    keyboard.append([
+        InlineKeyboardButton("Зберегти", callback_data="habit_batch_save"),
+        InlineKeyboardButton("Скасувати", callback_data="habit_batch_cancel")
+    ])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def get_goals_keyboard(goals: List[dict]):
+    keyboard = [
+        [InlineKeyboardButton(
+            f"Нова ціль: {truncate_text(goal['name'], BUTTON_TEXT_LENGTH)}",
+            callback_data=f"habit_goal_{goal['habit_id']}"
+        )]
+        for goal in goals
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+
+def get_goal_days_keyboard(habit_id: int, options: List[int]):
+    keyboard = [
+        [
+            InlineKeyboardButton(f"{days} дн.", callback_data=f"habit_goalset_{habit_id}_{days}")
+            for days in options[start:start + 4]
+        ]
+        for start in range(0, len(options), 4)
+    ]
+    keyboard.append([InlineKeyboardButton("Назад", callback_data="habit_goals")])
+    return InlineKeyboardMarkup(keyboard)
+
+
 def get_stats_keyboard():
     keyboard = [
         [
@@ -54,6 +120,14 @@ def get_stats_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+def get_charts_keyboard(habits: List[Habit]):
+    keyboard = [
+        [InlineKeyboardButton(truncate_text(habit.name, BUTTON_TEXT_LENGTH), callback_data=f"stats_chart_{habit.id}")]
+        for habit in habits
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+
 def get_confirmation_keyboard(action: str, habit_id: int = None):
     callback_data = f"confirm_{action}"
     if habit_id:
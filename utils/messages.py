@@ -21,6 +21,8 @@ HELP_MESSAGE = """
 /progress - Показати поточний прогрес
 /stats - Детальна статистика
 /goals - Встановити цілі
+/backfill - Заповнити пропущені дні
+/timezone - Ваш часовий пояс
 /help - Ця довідка
 
 <b>🚭 Підтримувані типи звичок:</b>
@@ -52,6 +54,36 @@ HABIT_MESSAGES = {
     'error': "Виникла помилка. Спробуйте ще раз."
 }
 
+ACHIEVEMENT_TITLES = {
+    1: "Перші кроки",
+    3: "Впевнений старт",
+    7: "Тиждень сили волі",
+    14: "Формування звички",
+    30: "Місяць перемоги",
+    60: "Діамантова воля",
+    90: "Король/Королева самоконтролю",
+    180: "Пів року свободи",
+    365: "Зміна життя"
+}
+
+ACHIEVEMENT_UNLOCKED_MESSAGE = (
+    "Нове досягнення!\n\n"
+    "{title} - {days} днів без звички \"{habit}\".\n"
+    "Так тримати!"
+)
+
+GOAL_COMPLETED_MESSAGE = (
+    "Ціль досягнута!\n\n"
+    "{days} днів без звички \"{habit}\".\n"
+    "Поставте нову ціль командою /goals"
+)
+
+REMINDER_MESSAGE = (
+    "Ви ще не відмітили свої звички сьогодні.\n"
+    "{motivation}\n\n"
+    "Відкрийте /habits щоб записати прогрес."
+)
+
 MOTIVATIONAL_MESSAGES = [
     "Кожен день без шкідливої звички - це крок до кращого здоров'я!",
     "Ви сильніші за свої звички!",
@@ -0,0 +1,372 @@
+import asyncio
+import bisect
+import contextlib
+import contextvars
+import functools
+import io
+import logging
+import random
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from telegram.ext import ConversationHandler
+from telegram.request import HTTPXRequest
+
+import config
+
+if TYPE_CHECKING:
+    import pstats
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000, 5000)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        # Верхня межа кошика, в який потрапляє квантиль - для логів цього досить
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class UpdateMetrics:
+    __slots__ = ('queries', 'rows', 'db_time', 'api_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.db_time = 0.0
+        self.api_time = 0.0
+
+
+# Лічильники поточного оновлення; run_db копіює контекст у потоки БД,
+# тож запити з пулу потоків потрапляють у той самий об'єкт
+_current: contextvars.ContextVar[Optional[UpdateMetrics]] = contextvars.ContextVar('update_metrics', default=None)
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, str, str], Histogram] = {}
+_errors: Dict[str, int] = {}
+
+
+def _observe(metric: str, label: str, value: str, amount: float, buckets: Sequence[float] = LATENCY_BUCKETS):
+    key = (metric, label, value)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram(buckets)
+        histogram.observe(amount)
+
+
+def current_update() -> Optional[UpdateMetrics]:
+    return _current.get()
+
+
+@contextlib.contextmanager
+def collect_shared(targets: Sequence[Optional[UpdateMetrics]]):
+    # Спільна робота (наприклад, пакет буфера відміток) виконується поза
+    # контекстом оновлень; її запити й рядки ділимо порівну між оновленнями,
+    # що в неї потрапили, тож на оновлення може припадати дробова частка
+    shared = UpdateMetrics()
+    token = _current.set(shared)
+    try:
+        yield shared
+    finally:
+        _current.reset(token)
+        targets = [metrics for metrics in targets if metrics is not None]
+        for metrics in targets:
+            metrics.queries += shared.queries / len(targets)
+            metrics.rows += shared.rows / len(targets)
+
+
+def record_db_call(function: str, elapsed: float):
+    _observe('intokui_db_call_seconds', 'function', function, elapsed)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.db_time += elapsed
+
+
+def record_api_call(method: str, elapsed: float):
+    _observe('intokui_api_call_seconds', 'method', method, elapsed)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.api_time += elapsed
+
+
+def _on_query(statement: str):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.queries += 1
+
+
+def _add_rows(count: int):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.rows += count
+
+
+class CountingCursor(sqlite3.Cursor):
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            _add_rows(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = super().fetchmany(*args, **kwargs)
+        _add_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _add_rows(len(rows))
+        return rows
+
+
+class CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+    # Вбудовані conn.execute* створюють звичайний курсор в обхід cursor()
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters, /):
+        return self.cursor().executemany(sql, parameters)
+
+
+def install_db_hooks():
+    # Діє на всі пули, зокрема ті, що configure_pool створить пізніше
+    from database.pool import set_connection_hooks
+
+    set_connection_hooks(CountingConnection, _on_query)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        finally:
+            record_api_call(url.rsplit('/', 1)[-1], time.perf_counter() - started)
+
+
+class SamplingProfiler:
+    """Профілює потік циклу подій, поки виконується випадково обране оновлення.
+
+    Це зріз часу всього процесу, а не одного оновлення: поки оновлення чекає
+    на await, у профіль потрапляють інші корутини. Запити до БД у пулі потоків
+    сюди не потрапляють - їх видно в метриках intokui_db_call_seconds."""
+
+    def __init__(self):
+        self.rate = 0.0
+        self._stats: Optional['pstats.Stats'] = None
+        self._active = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def start(self, rate: float = config.PROFILE_SAMPLE_RATE):
+        self.rate = min(max(rate, 0.0), 1.0)
+        self._stats = None
+        logger.info(f"Профілювання увімкнено для {self.rate:.1%} оновлень")
+
+    def stop(self, limit: int = 40) -> str:
+        self.rate = 0.0
+        if self._stats is None:
+            return "Жодного оновлення не профільовано\n"
+        output = io.StringIO()
+        output.write(
+            "Зріз часу потоку циклу подій під час вибраних оновлень: включає інші "
+            "корутини, що працювали паралельно, і не включає потоки БД\n\n"
+        )
+        self._stats.stream = output
+        self._stats.sort_stats('cumulative').print_stats(limit)
+        self._stats = None
+        return output.getvalue()
+
+    def should_sample(self) -> bool:
+        # Один профайлер на потік: паралельні оновлення не профілюємо
+        return self.rate > 0 and not self._active and random.random() < self.rate
+
+    async def run(self, coroutine):
+        # cProfile і pstats потрібні лише після /profile/start
+        import cProfile
+        import pstats
+
+        profile = cProfile.Profile()
+        self._active = True
+        profile.enable()
+        try:
+            return await coroutine
+        finally:
+            profile.disable()
+            self._active = False
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+
+
+profiler = SamplingProfiler()
+
+
+def instrument(callback, name: str = None):
+    name = name or getattr(callback, '__name__', repr(callback))
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        metrics = UpdateMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            if profiler.should_sample():
+                return await profiler.run(callback(update, context))
+            return await callback(update, context)
+        except Exception:
+            with _lock:
+                _errors[name] = _errors.get(name, 0) + 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            _observe('intokui_handler_seconds', 'handler', name, elapsed)
+            _observe('intokui_update_db_queries', 'handler', name, metrics.queries, COUNT_BUCKETS)
+            _observe('intokui_update_db_rows', 'handler', name, metrics.rows, COUNT_BUCKETS)
+            _observe('intokui_update_db_seconds', 'handler', name, metrics.db_time)
+            _observe('intokui_update_api_seconds', 'handler', name, metrics.api_time)
+
+    return wrapper
+
+
+def _instrument_handler(handler):
+    if isinstance(handler, ConversationHandler):
+        for inner in handler.entry_points + handler.fallbacks:
+            _instrument_handler(inner)
+        for handlers in handler.states.values():
+            for inner in handlers:
+                _instrument_handler(inner)
+    elif hasattr(handler, 'callback'):
+        handler.callback = instrument(handler.callback)
+
+
+def instrument_application(application):
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            _instrument_handler(handler)
+
+
+def render_prometheus() -> str:
+    lines = []
+    with _lock:
+        snapshot = {key: (list(h.buckets), list(h.counts), h.count, h.sum) for key, h in _histograms.items()}
+        errors = dict(_errors)
+
+    declared = set()
+    for (metric, label, value), (buckets, counts, count, total) in sorted(snapshot.items()):
+        if metric not in declared:
+            lines.append(f"# TYPE {metric} histogram")
+            declared.add(metric)
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{metric}_bucket{{{label}="{value}",le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{label}="{value}",le="+Inf"}} {count}')
+        lines.append(f'{metric}_sum{{{label}="{value}"}} {total}')
+        lines.append(f'{metric}_count{{{label}="{value}"}} {count}')
+
+    lines.append("# TYPE intokui_handler_errors_total counter")
+    for name, count in sorted(errors.items()):
+        lines.append(f'intokui_handler_errors_total{{handler="{name}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def summary_lines() -> list:
+    with _lock:
+        handlers = {
+            value: histogram for (metric, _, value), histogram in _histograms.items()
+            if metric == 'intokui_handler_seconds'
+        }
+        per_update = {
+            (metric, value): histogram.sum / histogram.count
+            for (metric, _, value), histogram in _histograms.items()
+            if metric != 'intokui_handler_seconds' and histogram.count
+        }
+
+    lines = []
+    for name, histogram in sorted(handlers.items(), key=lambda item: -item[1].sum):
+        lines.append(
+            f"{name}: {histogram.count} викл., p50 <= {histogram.quantile(0.5) * 1000:.0f} мс, "
+            f"p99 <= {histogram.quantile(0.99) * 1000:.0f} мс, "
+            f"запитів {per_update.get(('intokui_update_db_queries', name), 0):.1f}, "
+            f"рядків {per_update.get(('intokui_update_db_rows', name), 0):.1f}, "
+            f"БД {per_update.get(('intokui_update_db_seconds', name), 0) * 1000:.1f} мс, "
+            f"API {per_update.get(('intokui_update_api_seconds', name), 0) * 1000:.1f} мс"
+        )
+    return lines
+
+
+async def log_summary(context):
+    for line in summary_lines():
+        logger.info(f"Метрики: {line}")
+
+
+async def _handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        while (await reader.readline()).strip():
+            pass
+        path = urlsplit(request_line[1]) if len(request_line) > 1 else urlsplit('/')
+        params = parse_qs(path.query)
+
+        status = '200 OK'
+        if path.path == '/metrics':
+            body = render_prometheus()
+        elif path.path == '/profile/start':
+            profiler.start(float(params.get('rate', [config.PROFILE_SAMPLE_RATE])[0]))
+            body = f"Профілювання увімкнено: {profiler.rate}\n"
+        elif path.path == '/profile/stop':
+            body = profiler.stop()
+        else:
+            status, body = '404 Not Found', 'Not found\n'
+
+        payload = body.encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode('latin-1') + payload
+        )
+        await writer.drain()
+    except (ConnectionError, ValueError) as e:
+        logger.debug(f"Помилка запиту метрик: {e}")
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str = config.METRICS_LISTEN, port: int = config.METRICS_PORT):
+    server = await asyncio.start_server(_handle_http, host, port)
+    logger.info(f"Метрики доступні на http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from config import PERSISTENCE_FLUSH_DELAY, PERSISTENCE_UPDATE_INTERVAL, PERSISTENCE_REFRESH
+from database.repository import load_persisted_user_data, load_persisted_conversations, save_persisted_state
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePersistence(BasePersistence):
+    """Зберігає user_data та стани розмов у тій самій базі SQLite.
+
+    Application передає зміни раз на update_interval, а всі виклики одного
+    такого проходу збираються й пишуться однією транзакцією."""
+
+    def __init__(self, update_interval: float = PERSISTENCE_UPDATE_INTERVAL,
+                 flush_delay: float = PERSISTENCE_FLUSH_DELAY, refresh: bool = PERSISTENCE_REFRESH):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.flush_delay = flush_delay
+        self.refresh = refresh
+        self._user_data: Dict[int, Optional[str]] = {}
+        self._conversations: Dict[Tuple[str, str], Optional[str]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # Записи йдуть у потоці пулу і можуть тривати після скасування задачі,
+        # тож пишемо строго по черзі: новіший стан завжди комітиться останнім
+        self._write_lock = asyncio.Lock()
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        # Скасування під час запису не повинно покинути його на півдорозі
+        await asyncio.shield(self._write())
+
+    async def _write(self):
+        async with self._write_lock:
+            if not self._user_data and not self._conversations:
+                return
+            user_data, self._user_data = self._user_data, {}
+            conversations, self._conversations = self._conversations, {}
+            if not await save_persisted_state(user_data, conversations):
+                # Не губимо зміни: повернемо їх, якщо новіших ще не було
+                for user_id, data in user_data.items():
+                    self._user_data.setdefault(user_id, data)
+                for key, state in conversations.items():
+                    self._conversations.setdefault(key, state)
+
+    async def flush(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        # Якщо відкладений запис уже йде, замок дочекається його завершення
+        await self._write()
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        return await load_persisted_user_data()
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._user_data[user_id] = json.dumps(data, ensure_ascii=False) if data else None
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._user_data[user_id] = None
+        self._schedule_flush()
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        # Підхоплюємо зміни іншого процесу; свої незбережені зміни важливіші
+        if not self.refresh or user_id in self._user_data:
+            return
+        stored = (await load_persisted_user_data(user_id)).get(user_id)
+        if stored is not None and stored != user_data:
+            user_data.clear()
+            user_data.update(stored)
+
+    async def get_conversations(self, name: str) -> dict:
+        return await load_persisted_conversations(name)
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        state = None if new_state is None else json.dumps(new_state)
+        self._conversations[(name, json.dumps(list(key)))] = state
+        self._schedule_flush()
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_callback_data(self, data) -> None:
+        pass
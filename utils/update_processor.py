@@ -0,0 +1,68 @@
+import asyncio
+import sys
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+def get_ordering_key(update: object) -> Optional[int]:
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user:
+        return update.effective_user.id
+    if update.effective_chat:
+        return update.effective_chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Обробляє оновлення різних користувачів паралельно, а оновлення одного
+    користувача - строго по черзі, щоб його записи не змагалися між собою.
+
+    Семафор базового класу береться ще до черги користувача, тож оновлення,
+    що чекають свого користувача, займали б спільні місця. Тому йому віддаємо
+    необмежену межу, а ліміт max_concurrent_updates діє лише на обробники,
+    які вже виконуються."""
+
+    __slots__ = ('_locks', '_limit', '_running')
+
+    def __init__(self, max_concurrent_updates: int):
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        # Базовий клас будує семафор із max_concurrent_updates: поки він
+        # створюється, межа необмежена, далі властивість повертає справжній ліміт
+        self._limit = sys.maxsize
+        super().__init__(max_concurrent_updates)
+        self._limit = max_concurrent_updates
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._locks: Dict[int, list] = {}
+
+    @property
+    def max_concurrent_updates(self) -> int:
+        return self._limit
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = get_ordering_key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self._running:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._locks.clear()